@@ -590,6 +590,19 @@ const createCliente = async (req, res) => {
     });
 
   } catch (err) {
+    // Índice único uk_telefono_normalizado (migración 009): otro principal con el mismo
+    // teléfono se creó entre la búsqueda de duplicados y el INSERT
+    if (err.code === 'ER_DUP_ENTRY') {
+      const porTelefono = String(err.message).includes('uk_telefono_normalizado');
+      console.warn(`⚠️ createCliente: clave duplicada (${err.message})`);
+      return res.status(409).json({
+        success: false,
+        message: porTelefono
+          ? 'Ya existe un cliente principal con este teléfono; vuelva a intentarlo para registrarlo como duplicado'
+          : 'Ya existe un cliente con estos datos',
+        error: err.message
+      });
+    }
     console.error('❌ Error createCliente:', err);
     console.error('❌ Stack:', err.stack);
     console.error('❌ SQL Error Code:', err.code);
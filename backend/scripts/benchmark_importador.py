@@ -0,0 +1,215 @@
+"""
+Benchmark del importador de clientes con datos sintéticos
+
+- duplicados: costo de la verificación de duplicados antes/después del índice en memoria
+- workers: escalado de la importación paralela con 1/2/4/8 workers
+
+Uso:
+    python backend/scripts/benchmark_importador.py duplicados --filas 50000 --password ****
+    python backend/scripts/benchmark_importador.py --database albru_pruebas workers --filas 100000
+
+El benchmark 'duplicados' es de solo lectura: genera teléfonos sintéticos (una parte
+tomada de clientes existentes con otro formato, el resto aleatorios) y no escribe en la BD.
+
+El benchmark 'workers' SÍ escribe: inserta clientes sintéticos (nombre
+BENCHMARK_IMPORTADOR, teléfonos 80XXXXXXX) y los borra al terminar cada corrida.
+Usarlo contra una base de pruebas.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import mysql.connector
+
+from importar_csv_clientes import ImportadorCSV
+
+log_dir = Path(__file__).parent / "logs"
+log_dir.mkdir(exist_ok=True)
+
+
+def conectar(args) -> ImportadorCSV:
+    """Crear un importador conectado sin pasar por la interfaz gráfica"""
+    importador = ImportadorCSV()
+    importador.config_bd = {
+        'host': args.host,
+        'port': args.port,
+        'user': args.user,
+        'password': args.password,
+        'database': args.database,
+        'charset': 'utf8mb4',
+        'use_unicode': True
+    }
+    importador.conn = mysql.connector.connect(**importador.config_bd)
+    importador.cursor = importador.conn.cursor(dictionary=True)
+    importador.cargar_esquema()
+    return importador
+
+
+def generar_telefonos(existentes: list, filas: int, proporcion_existentes: float,
+                      semilla: int) -> list:
+    """Generar teléfonos sintéticos mezclando existentes (reformateados) y nuevos"""
+    rnd = random.Random(semilla)
+    telefonos = []
+    for _ in range(filas):
+        if existentes and rnd.random() < proporcion_existentes:
+            tel = ImportadorCSV.normalizar_telefono(rnd.choice(existentes))
+            # Reformatear como llegan en los CSV: "923 718 973" o "923-718-973"
+            if len(tel) == 9 and rnd.random() < 0.5:
+                sep = rnd.choice([' ', '-'])
+                tel = sep.join([tel[:3], tel[3:6], tel[6:]])
+        else:
+            tel = '9' + ''.join(rnd.choice('0123456789') for _ in range(8))
+        telefonos.append(tel)
+    return telefonos
+
+
+def benchmark_duplicados(args) -> dict:
+    """Comparar SELECT por fila vs índice en memoria"""
+    importador = conectar(args)
+    try:
+        importador.cursor.execute("SELECT telefono FROM clientes")
+        existentes = [r['telefono'] for r in importador.cursor.fetchall() if r['telefono']]
+        telefonos = generar_telefonos(existentes, args.filas, args.existentes, args.semilla)
+
+        # Antes: un SELECT con REPLACE() por fila (se mide una muestra y se extrapola)
+        muestra = telefonos[:min(args.muestra, len(telefonos))]
+        importador.indice_telefonos = None
+        inicio = time.perf_counter()
+        for tel in muestra:
+            importador.verificar_duplicado(tel)
+        t_muestra = time.perf_counter() - inicio
+        t_antes = t_muestra / max(len(muestra), 1) * len(telefonos)
+
+        # Después: carga única del índice + búsquedas en memoria
+        inicio = time.perf_counter()
+        importador.cargar_indice_telefonos()
+        t_carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        encontrados = sum(1 for tel in telefonos if importador.verificar_duplicado(tel))
+        t_busqueda = time.perf_counter() - inicio
+
+        return {
+            'benchmark': 'duplicados',
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'clientes_en_bd': len(existentes),
+            'filas_sinteticas': len(telefonos),
+            'duplicados_encontrados': encontrados,
+            'antes': {
+                'muestra_filas': len(muestra),
+                'muestra_seg': round(t_muestra, 3),
+                'estimado_total_seg': round(t_antes, 1),
+            },
+            'despues': {
+                'carga_indice_seg': round(t_carga, 3),
+                'busquedas_seg': round(t_busqueda, 3),
+                'total_seg': round(t_carga + t_busqueda, 3),
+            },
+            'aceleracion': round(t_antes / max(t_carga + t_busqueda, 1e-9), 1),
+        }
+    finally:
+        importador.desconectar_bd()
+
+
+MARCA_BENCHMARK = 'BENCHMARK_IMPORTADOR'
+
+
+def generar_csv_sintetico(filas: int, semilla: int) -> str:
+    """Escribir un CSV temporal de clientes sintéticos (teléfonos 80XXXXXXX únicos)"""
+    rnd = random.Random(semilla)
+    telefonos = rnd.sample(range(10_000_000), filas)
+    descriptor, ruta = tempfile.mkstemp(prefix='benchmark_clientes_', suffix='.csv')
+    with os.fdopen(descriptor, 'w', encoding='utf-8', newline='') as f:
+        f.write('telefono;nombre;dni;campana;fecha_ultimo_contacto\n')
+        for tel in telefonos:
+            f.write(f"80{tel:07d};{MARCA_BENCHMARK};{rnd.randint(10_000_000, 99_999_999)};"
+                    f"{rnd.choice(['HOGAR', 'MOVIL', 'EMPRESAS'])};"
+                    f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025\n")
+    return ruta
+
+
+def borrar_sinteticos(importador: ImportadorCSV) -> int:
+    importador.cursor.execute("DELETE FROM clientes WHERE nombre = %s", (MARCA_BENCHMARK,))
+    borrados = importador.cursor.rowcount
+    importador.conn.commit()
+    return borrados
+
+
+def benchmark_workers(args) -> dict:
+    """Medir la importación (modo insertar) con distinta cantidad de workers"""
+    ruta = generar_csv_sintetico(args.filas, args.semilla)
+    importador = conectar(args)
+    corridas = {}
+    try:
+        borrar_sinteticos(importador)
+        for workers in args.workers:
+            inicio = time.perf_counter()
+            resultados = importador.importar_csv(ruta, modo='insertar', workers=workers)
+            segundos = time.perf_counter() - inicio
+            corridas[workers] = {
+                'segundos': round(segundos, 2),
+                'filas_por_seg': round(args.filas / max(segundos, 1e-9)),
+                'resultados': resultados,
+            }
+            borrar_sinteticos(importador)
+    finally:
+        importador.desconectar_bd()
+        os.remove(ruta)
+
+    base = corridas[args.workers[0]]['segundos']
+    for corrida in corridas.values():
+        corrida['aceleracion'] = round(base / max(corrida['segundos'], 1e-9), 2)
+
+    return {
+        'benchmark': 'workers',
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'filas_sinteticas': args.filas,
+        'cpu_count': os.cpu_count(),
+        'corridas': corridas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del importador de clientes")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=3308)
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--database', default='albru')
+    sub = parser.add_subparsers(dest='benchmark', required=True)
+
+    p_dup = sub.add_parser('duplicados', help="Verificación de duplicados por teléfono")
+    p_dup.add_argument('--filas', type=int, default=50000, help="Filas sintéticas del CSV")
+    p_dup.add_argument('--muestra', type=int, default=500,
+                       help="Filas medidas con el método anterior (se extrapola)")
+    p_dup.add_argument('--existentes', type=float, default=0.3,
+                       help="Proporción de teléfonos que ya existen en la BD")
+    p_dup.add_argument('--semilla', type=int, default=42)
+
+    p_workers = sub.add_parser('workers', help="Escalado de la importación paralela (ESCRIBE en la BD)")
+    p_workers.add_argument('--filas', type=int, default=100000, help="Filas sintéticas del CSV")
+    p_workers.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                           help="Cantidades de workers a medir (la primera es la base)")
+    p_workers.add_argument('--semilla', type=int, default=42)
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'duplicados':
+        resultado = benchmark_duplicados(args)
+    elif args.benchmark == 'workers':
+        resultado = benchmark_workers(args)
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    salida = log_dir / f"benchmark_{args.benchmark}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"📄 Resultado guardado en: {salida}")
+
+
+if __name__ == "__main__":
+    main()
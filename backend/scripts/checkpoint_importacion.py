@@ -0,0 +1,86 @@
+"""
+Checkpoints de importación para reanudar un archivo que falló a mitad de camino
+Compartido por importar_csv_clientes.py e importar_csv_historial.py
+
+Después de cada lote confirmado se guarda un JSON con el hash del contenido del
+archivo, el modo, la siguiente fila a procesar (y en CSV, el byte donde empieza)
+y los contadores acumulados. Al reanudar, el lector hace seek a ese byte: solo
+se repite el lote que estaba en curso cuando se cortó la importación.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointImportacion:
+    """Checkpoint (archivo JSON) de la importación de un archivo"""
+
+    def __init__(self, archivo_path: str, tabla: str, modo: str, directorio: Path):
+        self.archivo_path = archivo_path
+        self.tabla = tabla
+        self.modo = modo
+        self.hash = self.hash_archivo(archivo_path)
+        directorio.mkdir(parents=True, exist_ok=True)
+        # Un checkpoint por contenido de archivo y tabla destino
+        self.ruta = directorio / f"{tabla}_{self.hash[:16]}.json"
+
+    @staticmethod
+    def hash_archivo(archivo_path: str) -> str:
+        """SHA-256 del contenido del archivo (leído por bloques)"""
+        sha = hashlib.sha256()
+        with open(archivo_path, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    def existe(self) -> bool:
+        return self.ruta.exists()
+
+    def cargar(self) -> Optional[Dict]:
+        """Leer el checkpoint del archivo (None si no hay)"""
+        if not self.ruta.exists():
+            return None
+
+        with open(self.ruta, encoding='utf-8') as f:
+            estado = json.load(f)
+
+        if estado['hash'] != self.hash:
+            return None
+        if estado['modo'] != self.modo:
+            raise ValueError(
+                f"El checkpoint de este archivo es del modo '{estado['modo']}', "
+                f"no '{self.modo}'. Reanuda con el mismo modo o importa sin reanudar"
+            )
+
+        logger.info(f"⏯️ Reanudando desde la fila {estado['siguiente_fila'] + 2} "
+                    f"(checkpoint del {estado['actualizado']})")
+        return estado
+
+    def guardar(self, siguiente_fila: int, resultados: Dict, posicion_byte: Optional[int] = None):
+        """Registrar un lote confirmado (escritura atómica: archivo temporal + replace)"""
+        estado = {
+            'archivo': os.path.abspath(self.archivo_path),
+            'hash': self.hash,
+            'tabla': self.tabla,
+            'modo': self.modo,
+            'siguiente_fila': siguiente_fila,
+            'posicion_byte': posicion_byte,
+            'resultados': resultados,
+            'actualizado': datetime.now().isoformat(timespec='seconds'),
+        }
+        temporal = self.ruta.with_suffix('.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=2, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
+
+    def eliminar(self):
+        """Borrar el checkpoint al terminar la importación completa"""
+        if self.ruta.exists():
+            self.ruta.unlink()
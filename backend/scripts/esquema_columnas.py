@@ -0,0 +1,77 @@
+"""
+Esquema de las tablas destino leído de information_schema
+Compartido por importar_csv_clientes.py e importar_csv_historial.py
+
+Al conectar, cada importador lee una sola vez las columnas de su tabla
+(tipo, longitud, generadas) y con eso configura el LimpiadorColumnas: el tipo
+de limpieza de cada columna sale de la BD en lugar de listas fijas en el
+script, las columnas del archivo que no existen en la tabla se descartan y
+los textos se recortan al largo de su VARCHAR.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class EsquemaTabla:
+    """Columnas de una tabla MySQL según information_schema.COLUMNS"""
+
+    TIPOS_FECHA = {'date', 'datetime', 'timestamp'}
+    TIPOS_ENTERO = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint'}
+    TIPOS_NUMERO = {'decimal', 'numeric', 'float', 'double'}
+    TIPOS_TEXTO_LIMITADO = {'char', 'varchar', 'tinytext', 'text', 'mediumtext'}
+
+    def __init__(self, tabla: str, columnas: Dict[str, Dict]):
+        self.tabla = tabla
+        self.columnas = columnas
+
+    @classmethod
+    def leer(cls, cursor, tabla: str) -> Optional['EsquemaTabla']:
+        """Leer las columnas de la tabla en la BD actual (None si la tabla no existe)"""
+        cursor.execute("""
+            SELECT COLUMN_NAME AS columna, DATA_TYPE AS tipo, COLUMN_TYPE AS tipo_completo,
+                   CHARACTER_MAXIMUM_LENGTH AS longitud, EXTRA AS extra
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+            ORDER BY ORDINAL_POSITION
+        """, (tabla,))
+        filas = cursor.fetchall()
+        if not filas:
+            logger.warning(f"⚠️ No se encontró el esquema de '{tabla}': se usan los tipos por defecto del script")
+            return None
+
+        esquema = cls(tabla, {fila['columna']: fila for fila in filas})
+        logger.info(f"🧩 Esquema de '{tabla}': {len(esquema.columnas)} columnas")
+        return esquema
+
+    def tipo_limpieza(self, columna: str) -> str:
+        """Tipo de limpieza del LimpiadorColumnas según el tipo MySQL de la columna"""
+        info = self.columnas[columna]
+        tipo = (info['tipo'] or '').lower()
+        if tipo in self.TIPOS_FECHA:
+            return 'fecha'
+        if tipo == 'tinyint' and (info['tipo_completo'] or '').lower().startswith('tinyint(1)'):
+            # BOOLEAN en MySQL es TINYINT(1)
+            return 'boolean'
+        if tipo in self.TIPOS_ENTERO:
+            return 'entero'
+        if tipo in self.TIPOS_NUMERO:
+            return 'numero'
+        return 'texto'
+
+    def escribibles(self) -> List[str]:
+        """Columnas que se pueden escribir (las generadas se descartan)"""
+        return [columna for columna, info in self.columnas.items()
+                if 'GENERATED' not in (info['extra'] or '').upper()]
+
+    def tipos(self) -> Dict[str, str]:
+        return {columna: self.tipo_limpieza(columna) for columna in self.escribibles()}
+
+    def longitudes(self) -> Dict[str, int]:
+        """Largo máximo (en caracteres) de las columnas de texto"""
+        return {columna: int(self.columnas[columna]['longitud'])
+                for columna in self.escribibles()
+                if (self.columnas[columna]['tipo'] or '').lower() in self.TIPOS_TEXTO_LIMITADO
+                and self.columnas[columna]['longitud']}
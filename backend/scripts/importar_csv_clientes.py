@@ -11,47 +11,1061 @@ import mysql.connector
 from mysql.connector import Error
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+import argparse
 import os
+import pickle
+import tempfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import logging
 from typing import Dict, List, Tuple
 from pathlib import Path
 
-# Configurar logging
-log_dir = Path(__file__).parent / "logs"
-log_dir.mkdir(exist_ok=True)
-log_file = log_dir / f"import_clientes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+from checkpoint_importacion import CheckpointImportacion
+from esquema_columnas import EsquemaTabla
+from lector_archivos import LectorArchivo
+from limpieza_columnas import LimpiadorColumnas
+from registro_importacion import RegistroFilas, cola_para_workers, configurar_logging, iniciar_worker
+from sentencias_preparadas import CacheSentencias, trozos
+from sesion_masiva import SesionMasiva
+from tarea_importacion import MedidorVelocidad, TareaImportacion
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+log_dir = Path(__file__).parent / "logs"
+# Archivos de log y de rechazos: los define main() con configurar_logging (no al importar el módulo)
+log_file = rechazos_file = None
 
 logger = logging.getLogger(__name__)
 
 
+class EscritorClientes:
+    """
+    Escritor por lotes para la tabla clientes
+    
+    Acumula las filas ya resueltas y las envía agrupadas por firma de columnas:
+    los INSERT como INSERT multi-fila y los UPDATE como un UPDATE ... JOIN contra
+    una tabla derivada con los valores de cada id.
+    Si un lote falla se reintenta fila por fila para no perder el conteo por fila.
+    
+    Las sentencias se ejecutan como sentencias preparadas cacheadas por forma
+    (columnas + filas), con cada grupo partido por sentencias_preparadas.trozos.
+    """
+    
+    def __init__(self, importador: 'ImportadorCSV', tamano_batch: int = 500):
+        self.importador = importador
+        self.tamano_batch = tamano_batch
+        self.sentencias = CacheSentencias(importador.conn)
+        self.inserts = []  # (indice, telefono, datos)
+        self.updates = []  # (indice, telefono, cliente_id, datos)
+        self.upserts = []  # (indice, telefono, datos)
+        self.ids_actualizados = set()  # ids (update) o teléfonos (upsert) con escritura pendiente
+    
+    @property
+    def pendientes(self) -> int:
+        return len(self.inserts) + len(self.updates) + len(self.upserts)
+    
+    def agregar_insert(self, indice: int, telefono: str, datos: Dict):
+        """Encolar un INSERT; el cliente queda en el índice con id pendiente"""
+        self.inserts.append((indice, telefono, datos))
+        self.importador.registrar_en_indice(telefono, None, datos)
+        if self.pendientes >= self.tamano_batch:
+            self.flush()
+    
+    def agregar_update(self, indice: int, telefono: str, cliente_id: int, datos: Dict):
+        """Encolar un UPDATE sobre un cliente existente"""
+        if cliente_id in self.ids_actualizados:
+            # Los grupos por firma no conservan el orden entre filas: un segundo UPDATE
+            # del mismo cliente podría aplicarse antes que el primero
+            self.flush()
+        self.ids_actualizados.add(cliente_id)
+        self.updates.append((indice, telefono, cliente_id, datos))
+        self.importador.registrar_en_indice(telefono, cliente_id, datos)
+        if self.pendientes >= self.tamano_batch:
+            self.flush()
+    
+    def agregar_upsert(self, indice: int, telefono: str, datos: Dict):
+        """Encolar una fila para INSERT ... ON DUPLICATE KEY UPDATE (modo upsert)"""
+        clave = self.importador.normalizar_telefono(telefono)
+        if clave in self.ids_actualizados:
+            # Mismo motivo que en agregar_update: conservar el orden de las repeticiones
+            self.flush()
+        self.ids_actualizados.add(clave)
+        self.upserts.append((indice, telefono, datos))
+        if self.pendientes >= self.tamano_batch:
+            self.flush()
+    
+    def flush(self):
+        """Enviar a la BD todo lo pendiente (sin commit)"""
+        inserts, self.inserts = self.inserts, []
+        updates, self.updates = self.updates, []
+        upserts, self.upserts = self.upserts, []
+        self.ids_actualizados = set()
+        if inserts:
+            self._escribir_inserts(inserts)
+        if updates:
+            self._escribir_updates(updates)
+        if upserts:
+            self._escribir_upserts(upserts)
+    
+    @staticmethod
+    def _agrupar(filas: List, firma) -> Dict[Tuple[str, ...], List]:
+        grupos = {}
+        for fila in filas:
+            grupos.setdefault(firma(fila), []).append(fila)
+        return grupos
+    
+    @staticmethod
+    def _placeholders(num_columnas: int, num_filas: int) -> str:
+        fila = '(' + ', '.join(['%s'] * num_columnas) + ')'
+        return ', '.join([fila] * num_filas)
+    
+    @staticmethod
+    def _query_insert(columnas: Tuple[str, ...], num_filas: int) -> str:
+        return (f"INSERT INTO clientes ({', '.join(columnas)}) "
+                f"VALUES {EscritorClientes._placeholders(len(columnas), num_filas)}")
+    
+    def cerrar(self):
+        """Cerrar las sentencias preparadas de la importación"""
+        self.sentencias.cerrar()
+    
+    def _escribir_inserts(self, inserts: List):
+        importador = self.importador
+        grupos = self._agrupar(
+            inserts,
+            lambda f: tuple(col for col, valor in f[2].items() if valor is not None)
+        )
+        
+        for columnas, grupo_completo in grupos.items():
+            for grupo in trozos(grupo_completo):
+                self._insertar_trozo(columnas, grupo)
+    
+    def _insertar_trozo(self, columnas: Tuple[str, ...], grupo: List):
+        importador = self.importador
+        valores = [datos[col] for _, _, datos in grupo for col in columnas]
+        try:
+            cursor = self.sentencias.ejecutar(('INSERT', columnas, len(grupo)),
+                                              lambda: self._query_insert(columnas, len(grupo)), valores)
+            primer_id = cursor.lastrowid
+        except Error as e:
+            logger.warning(f"⚠️ Lote de {len(grupo)} INSERT falló ({e}), reintentando fila por fila")
+            self._insertar_fila_por_fila(columnas, grupo)
+            return
+        
+        self._resolver_ids_insertados(grupo, primer_id)
+        importador.resultados['insertados'] += len(grupo)
+        for indice, telefono, _ in grupo:
+            importador.registro.detalle('insertado', "✅ Fila %s: Cliente insertado (tel: %s)",
+                                        indice + 2, telefono)
+    
+    def _resolver_ids_insertados(self, grupo: List, primer_id: int):
+        """Completar en el índice los ids generados por un INSERT multi-fila"""
+        importador = self.importador
+        if importador.indice_telefonos is None:
+            return
+        
+        telefonos = [telefono for _, telefono, _ in grupo]
+        importador.cursor.execute(
+            f"SELECT id, telefono FROM clientes "
+            f"WHERE id >= %s AND telefono IN ({', '.join(['%s'] * len(telefonos))})",
+            [primer_id] + telefonos
+        )
+        ids = {}
+        for registro in importador.cursor.fetchall():
+            ids[importador.normalizar_telefono(registro['telefono'])] = registro['id']
+        
+        for _, telefono, datos in grupo:
+            cliente_id = ids.get(importador.normalizar_telefono(telefono))
+            if cliente_id is not None:
+                importador.registrar_en_indice(telefono, cliente_id, datos)
+    
+    def _insertar_fila_por_fila(self, columnas: Tuple[str, ...], grupo: List):
+        importador = self.importador
+        for indice, telefono, datos in grupo:
+            try:
+                cursor = self.sentencias.ejecutar(('INSERT', columnas, 1),
+                                                  lambda: self._query_insert(columnas, 1),
+                                                  [datos[col] for col in columnas])
+                importador.registrar_en_indice(telefono, cursor.lastrowid, datos)
+                importador.resultados['insertados'] += 1
+                importador.registro.detalle('insertado', "✅ Fila %s: Cliente insertado (tel: %s)",
+                                            indice + 2, telefono)
+            except Error as e:
+                importador.quitar_pendiente_del_indice(telefono)
+                importador.resultados['errores'] += 1
+                importador.registro.rechazo(indice + 2, 'error_sql', datos,
+                                            "❌ Fila %s: Error SQL - %s", indice + 2, e, nivel=logging.ERROR)
+    
+    def _escribir_updates(self, updates: List):
+        importador = self.importador
+        grupos = self._agrupar(
+            updates,
+            lambda f: tuple(col for col in f[3] if col != 'id')
+        )
+        
+        for columnas, grupo_completo in grupos.items():
+            for grupo in trozos(grupo_completo):
+                self._actualizar_trozo(columnas, grupo)
+    
+    @staticmethod
+    def _query_update_multiple(columnas: Tuple[str, ...], num_filas: int) -> str:
+        """
+        UPDATE de varias filas en una sentencia: JOIN por id contra las filas del lote
+
+        A diferencia de INSERT ... ON DUPLICATE KEY UPDATE, un id que ya no existe
+        no inserta un cliente nuevo (simplemente no se actualiza) y no se evalúan
+        las columnas NOT NULL que no vienen en el lote.
+        """
+        primera = ', '.join(['CAST(%s AS UNSIGNED) AS id'] + [f"%s AS {col}" for col in columnas])
+        siguientes = ', '.join(['%s'] * (len(columnas) + 1))
+        filas = ' UNION ALL '.join([f"SELECT {primera}"] + [f"SELECT {siguientes}"] * (num_filas - 1))
+        asignaciones = ', '.join(f"c.{col} = v.{col}" for col in columnas)
+        return (f"UPDATE clientes c JOIN ({filas}) v ON v.id = c.id "
+                f"SET {asignaciones}, c.updated_at = NOW()")
+    
+    def _actualizar_trozo(self, columnas: Tuple[str, ...], grupo: List):
+        importador = self.importador
+        valores = []
+        for _, _, cliente_id, datos in grupo:
+            valores.append(cliente_id)
+            valores.extend(datos[col] for col in columnas)
+        try:
+            self.sentencias.ejecutar(('UPDATE', columnas, len(grupo)),
+                                     lambda: self._query_update_multiple(columnas, len(grupo)), valores)
+        except Error as e:
+            logger.warning(f"⚠️ Lote de {len(grupo)} UPDATE falló ({e}), reintentando fila por fila")
+            self._actualizar_fila_por_fila(columnas, grupo)
+            return
+        
+        importador.resultados['actualizados'] += len(grupo)
+        for indice, _, cliente_id, _ in grupo:
+            importador.registro.detalle('actualizado', "♻️ Fila %s: Cliente actualizado (ID: %s)",
+                                        indice + 2, cliente_id)
+    
+    @staticmethod
+    def _query_update(columnas: Tuple[str, ...]) -> str:
+        sets = ', '.join(f"{col} = %s" for col in columnas)
+        return f"UPDATE clientes SET {sets}, updated_at = NOW() WHERE id = %s"
+    
+    def _actualizar_fila_por_fila(self, columnas: Tuple[str, ...], grupo: List):
+        importador = self.importador
+        for indice, _, cliente_id, datos in grupo:
+            try:
+                self.sentencias.ejecutar(('UPDATE', columnas, 1), lambda: self._query_update(columnas),
+                                         [datos[col] for col in columnas] + [cliente_id])
+                importador.resultados['actualizados'] += 1
+                importador.registro.detalle('actualizado', "♻️ Fila %s: Cliente actualizado (ID: %s)",
+                                            indice + 2, cliente_id)
+            except Error as e:
+                importador.resultados['errores'] += 1
+                importador.registro.rechazo(indice + 2, 'error_sql', datos,
+                                            "❌ Fila %s: Error SQL - %s", indice + 2, e, nivel=logging.ERROR)
+    
+    @staticmethod
+    def _query_upsert(columnas: Tuple[str, ...], num_filas: int) -> str:
+        asignaciones = ', '.join(f"{col} = VALUES({col})" for col in columnas)
+        return (f"INSERT INTO clientes ({', '.join(columnas)}) "
+                f"VALUES {EscritorClientes._placeholders(len(columnas), num_filas)} "
+                f"ON DUPLICATE KEY UPDATE {asignaciones}, updated_at = NOW()")
+    
+    def _escribir_upserts(self, upserts: List):
+        """
+        Escribir filas dejando que MySQL decida insertar vs actualizar
+        
+        La clave es el índice único uk_telefono_normalizado (migración 009).
+        MySQL reporta 1 fila afectada por cada INSERT y 2 por cada UPDATE, así que
+        con N filas en la sentencia: actualizados = afectadas - N.
+        """
+        importador = self.importador
+        grupos = self._agrupar(
+            upserts,
+            lambda f: tuple(col for col, valor in f[2].items() if valor is not None)
+        )
+        
+        for columnas, grupo_completo in grupos.items():
+            for grupo in trozos(grupo_completo):
+                self._upsert_trozo(columnas, grupo)
+    
+    def _upsert_trozo(self, columnas: Tuple[str, ...], grupo: List):
+        importador = self.importador
+        valores = [datos[col] for _, _, datos in grupo for col in columnas]
+        try:
+            cursor = self.sentencias.ejecutar(('UPSERT', columnas, len(grupo)),
+                                              lambda: self._query_upsert(columnas, len(grupo)), valores)
+        except Error as e:
+            logger.warning(f"⚠️ Lote de {len(grupo)} UPSERT falló ({e}), reintentando fila por fila")
+            self._upsert_fila_por_fila(columnas, grupo)
+            return
+        
+        actualizados = min(max(cursor.rowcount - len(grupo), 0), len(grupo))
+        importador.resultados['actualizados'] += actualizados
+        importador.resultados['insertados'] += len(grupo) - actualizados
+        logger.info(f"🔀 Upsert de {len(grupo)} filas: "
+                    f"{len(grupo) - actualizados} insertadas, {actualizados} actualizadas")
+    
+    def _upsert_fila_por_fila(self, columnas: Tuple[str, ...], grupo: List):
+        importador = self.importador
+        for indice, telefono, datos in grupo:
+            try:
+                cursor = self.sentencias.ejecutar(('UPSERT', columnas, 1),
+                                                  lambda: self._query_upsert(columnas, 1),
+                                                  [datos[col] for col in columnas])
+                if cursor.rowcount == 1:
+                    importador.resultados['insertados'] += 1
+                    importador.registro.detalle('insertado', "✅ Fila %s: Cliente insertado (tel: %s)",
+                                                indice + 2, telefono)
+                else:
+                    importador.resultados['actualizados'] += 1
+                    importador.registro.detalle('actualizado', "♻️ Fila %s: Cliente actualizado (tel: %s)",
+                                                indice + 2, telefono)
+            except Error as e:
+                importador.resultados['errores'] += 1
+                importador.registro.rechazo(indice + 2, 'error_sql', datos,
+                                            "❌ Fila %s: Error SQL - %s", indice + 2, e, nivel=logging.ERROR)
+
+
+class CargaMasivaClientes:
+    """
+    Ruta rápida para archivos muy grandes (LOAD DATA LOCAL INFILE + SQL por conjuntos)
+    
+    1. Limpia el archivo lote por lote y escribe cada lote en un TSV temporal a medida
+       que se lee (en memoria solo hay un lote, no el archivo completo).
+    2. Carga el TSV en la tabla temporal clientes_staging_filas y la colapsa en MySQL a
+       una fila por teléfono normalizado (clientes_staging), con los contadores por
+       fila (válidas, inválidas) que necesita el resumen.
+    3. Resuelve los clientes existentes con un JOIN sobre el índice único
+       telefono_normalizado y calcula los mismos contadores que el importador fila por
+       fila con un SELECT agregado.
+    4. Aplica los cambios con un INSERT ... SELECT y un UPDATE ... JOIN.
+    
+    La simulación (PlanImportacion) usa los pasos 1 a 3 y no aplica nada.
+    """
+    
+    TABLA_STAGING = 'clientes_staging'
+    TABLA_FILAS = 'clientes_staging_filas'
+    
+    def __init__(self, importador: 'ImportadorCSV'):
+        self.importador = importador
+    
+    def columnas_clientes(self) -> Dict[str, Dict]:
+        """Columnas escribibles de clientes con su default y nulabilidad"""
+        cursor = self.importador.cursor
+        cursor.execute("""
+            SELECT COLUMN_NAME AS columna, COLUMN_DEFAULT AS defecto,
+                   IS_NULLABLE AS nulable, EXTRA AS extra
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'clientes'
+            ORDER BY ORDINAL_POSITION
+        """)
+        return {
+            fila['columna']: fila for fila in cursor.fetchall()
+            if 'GENERATED' not in (fila['extra'] or '').upper()
+            and 'auto_increment' not in (fila['extra'] or '').lower()
+        }
+    
+    @staticmethod
+    def lineas_tsv(df: pd.DataFrame, columnas: List[str]) -> pd.Series:
+        """Líneas TSV del DataFrame en el formato por defecto de LOAD DATA"""
+        partes = []
+        for col in columnas:
+            serie = df[col]
+            nulos = serie.isna()
+            texto = serie.astype(object).where(~nulos, '').astype(str)
+            texto = (texto.str.replace('\\', '\\\\', regex=False)
+                          .str.replace('\t', '\\t', regex=False)
+                          .str.replace('\n', '\\n', regex=False)
+                          .str.replace('\r', '\\r', regex=False))
+            partes.append(texto.where(~nulos, '\\N'))
+        
+        return partes[0].str.cat(partes[1:], sep='\t') if len(partes) > 1 else partes[0]
+    
+    def escribir_filas(self, lotes, columnas_bd: Dict[str, Dict], progreso) -> Tuple[str, List[str], int, int]:
+        """
+        Limpiar cada lote y agregarlo al TSV de staging en cuanto se lee
+        
+        Cada fila lleva su posición en el archivo, su teléfono normalizado y si es
+        válida (sin un campo requerido su INSERT/UPDATE fallaría); las filas sin
+        teléfono solo se cuentan.
+        
+        Returns:
+            (ruta del TSV, columnas de clientes escritas, filas leídas, filas sin teléfono)
+        """
+        importador = self.importador
+        columnas = None
+        filas = 0
+        sin_telefono = 0
+        
+        descriptor, ruta = tempfile.mkstemp(prefix='clientes_staging_', suffix='.tsv')
+        try:
+            with os.fdopen(descriptor, 'w', encoding='utf-8', newline='\n') as f:
+                for lote in lotes:
+                    limpio = importador.limpiador.limpiar(lote)
+                    if columnas is None:
+                        columnas = [col for col in limpio.columns if col in columnas_bd]
+                        descartadas = [col for col in limpio.columns if col not in columnas_bd and col != 'id']
+                        if descartadas:
+                            logger.warning(f"⚠️ Columnas ignoradas (no existen en clientes): {', '.join(descartadas)}")
+                    
+                    df = limpio[columnas].copy()
+                    df['fila'] = range(filas, filas + len(df))
+                    filas += len(df)
+                    
+                    con_telefono = df['telefono'].notna()
+                    sin_telefono += int((~con_telefono).sum())
+                    df = df[con_telefono]
+                    if df.empty:
+                        continue
+                    
+                    df['tel_norm'] = df['telefono'].astype(str).str.replace(' ', '', regex=False) \
+                                                               .str.replace('-', '', regex=False)
+                    df['valida'] = df[importador.COLUMNAS_REQUERIDAS].notna().all(axis=1).astype(int)
+                    
+                    for linea in self.lineas_tsv(df, ['fila', 'tel_norm', 'valida'] + columnas):
+                        f.write(linea)
+                        f.write('\n')
+                    progreso(filas)
+        except BaseException:
+            os.remove(ruta)
+            raise
+        
+        return ruta, columnas or [], filas, sin_telefono
+    
+    def cargar_staging(self, ruta: str, columnas: List[str], modo: str):
+        """
+        Cargar las filas del TSV con LOAD DATA LOCAL INFILE y colapsarlas por teléfono
+        
+        En modo insertar cada columna toma el valor de la primera fila válida del
+        teléfono; en los demás modos, el último valor no nulo de sus filas válidas. Se calcula con funciones de ventana en una sola
+        lectura de clientes_staging_filas (una tabla temporal no puede aparecer dos
+        veces en la misma sentencia).
+        """
+        cursor = self.importador.cursor
+        filas = self.TABLA_FILAS
+        tabla = self.TABLA_STAGING
+        
+        for temporal in (filas, tabla):
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {temporal}")
+            cursor.execute(f"CREATE TEMPORARY TABLE {temporal} SELECT {', '.join(columnas)} FROM clientes LIMIT 0")
+        cursor.execute(f"""
+            ALTER TABLE {filas}
+            ADD COLUMN fila INT NOT NULL,
+            ADD COLUMN tel_norm VARCHAR(20) NOT NULL,
+            ADD COLUMN valida TINYINT NOT NULL,
+            ADD PRIMARY KEY (fila)
+        """)
+        cursor.execute(f"""
+            ALTER TABLE {tabla}
+            ADD COLUMN tel_norm VARCHAR(20) NOT NULL,
+            ADD COLUMN primera_fila INT NOT NULL,
+            ADD COLUMN n_validas INT NOT NULL,
+            ADD COLUMN n_invalidas INT NOT NULL,
+            ADD COLUMN n_invalidas_antes INT NOT NULL,
+            ADD COLUMN cliente_id INT NULL,
+            ADD PRIMARY KEY (tel_norm)
+        """)
+        
+        columnas_tsv = ['fila', 'tel_norm', 'valida'] + columnas
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE {filas}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            ({', '.join(columnas_tsv)})
+        """, (Path(ruta).as_posix(),))
+        cargadas = cursor.rowcount
+        advertencias = cursor.warning_count
+        logger.info(f"📥 Staging cargado: {cargadas} filas")
+        if advertencias:
+            logger.warning(f"⚠️ LOAD DATA reportó {advertencias} advertencias de conversión")
+        
+        if modo == 'insertar':
+            ventanas = {col: "PARTITION BY tel_norm ORDER BY valida DESC, fila" for col in columnas}
+        else:
+            ventanas = {col: f"PARTITION BY tel_norm ORDER BY (valida AND {col} IS NOT NULL) DESC, fila DESC"
+                        for col in columnas}
+        valores = ', '.join(f"FIRST_VALUE(IF(valida, {col}, NULL)) OVER ({ventanas[col]}) AS {col}"
+                            for col in columnas)
+        cursor.execute(f"""
+            INSERT INTO {tabla} (tel_norm, primera_fila, n_validas, n_invalidas, n_invalidas_antes,
+                                 {', '.join(columnas)})
+            SELECT tel_norm, MIN(fila), SUM(valida), SUM(1 - valida),
+                   SUM(valida = 0 AND (primera_valida IS NULL OR fila < primera_valida)),
+                   {', '.join(f"MAX({col})" for col in columnas)}
+            FROM (
+                SELECT tel_norm, fila, valida,
+                       MIN(IF(valida, fila, NULL)) OVER (PARTITION BY tel_norm) AS primera_valida,
+                       {valores}
+                FROM {filas}
+            ) f
+            GROUP BY tel_norm
+        """)
+        logger.info(f"📥 Colapsado a {cursor.rowcount} teléfonos distintos")
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {filas}")
+    
+    def tiene_telefono_normalizado(self) -> bool:
+        """Si clientes ya tiene la columna telefono_normalizado (migración 009)"""
+        cursor = self.importador.cursor
+        cursor.execute("""
+            SELECT COUNT(*) AS total
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = 'clientes'
+              AND COLUMN_NAME = 'telefono_normalizado'
+        """)
+        return bool(cursor.fetchone()['total'])
+    
+    def clasificar(self, modo: str) -> Dict:
+        """Resolver clientes existentes y calcular los contadores por fila"""
+        cursor = self.importador.cursor
+        tabla = self.TABLA_STAGING
+        
+        if self.tiene_telefono_normalizado():
+            # Búsqueda por el índice único: solo los teléfonos del archivo, no toda la tabla
+            cursor.execute(f"""
+                UPDATE {tabla} s
+                JOIN clientes c ON c.telefono_normalizado = s.tel_norm
+                SET s.cliente_id = c.id
+            """)
+        else:
+            logger.warning("⚠️ clientes no tiene telefono_normalizado: se normaliza la tabla completa "
+                           "(aplica database/migrations/009_telefono_normalizado.sql)")
+            cursor.execute(f"""
+                UPDATE {tabla} s
+                JOIN (
+                    SELECT REPLACE(REPLACE(telefono, ' ', ''), '-', '') AS tel, MIN(id) AS id
+                    FROM clientes
+                    GROUP BY tel
+                ) c ON c.tel = s.tel_norm
+                SET s.cliente_id = c.id
+            """)
+        
+        if modo == 'insertar':
+            sql = """
+                SUM(IF(cliente_id IS NULL AND n_validas > 0, 1, 0)) AS insertados,
+                0 AS actualizados,
+                SUM(IF(cliente_id IS NULL, n_invalidas_antes, 0)) AS errores,
+                SUM(IF(cliente_id IS NULL,
+                       n_validas + n_invalidas - n_invalidas_antes - IF(n_validas > 0, 1, 0),
+                       n_validas + n_invalidas)) AS duplicados
+            """
+        elif modo == 'actualizar':
+            sql = """
+                0 AS insertados,
+                SUM(IF(cliente_id IS NOT NULL, n_validas, 0)) AS actualizados,
+                SUM(IF(cliente_id IS NOT NULL, n_invalidas, 0)) AS errores,
+                0 AS duplicados
+            """
+        else:
+            sql = """
+                SUM(IF(cliente_id IS NULL AND n_validas > 0, 1, 0)) AS insertados,
+                SUM(IF(cliente_id IS NULL, GREATEST(n_validas - 1, 0), n_validas)) AS actualizados,
+                SUM(n_invalidas) AS errores,
+                0 AS duplicados
+            """
+        cursor.execute(f"SELECT {sql} FROM {tabla}")
+        fila = cursor.fetchone()
+        return {clave: int(fila[clave] or 0) for clave in ('insertados', 'actualizados', 'errores', 'duplicados')}
+    
+    def aplicar(self, modo: str, columnas: List[str], columnas_bd: Dict[str, Dict]):
+        """Aplicar los cambios con un INSERT ... SELECT y un UPDATE ... JOIN"""
+        cursor = self.importador.cursor
+        tabla = self.TABLA_STAGING
+        
+        if modo in ('insertar', 'sobrescribir'):
+            # Columnas nulas toman el default de la BD, igual que el INSERT fila por fila
+            selects = []
+            parametros = []
+            for col in columnas:
+                defecto = columnas_bd[col]['defecto']
+                if defecto is None:
+                    selects.append(f"s.{col}")
+                elif str(defecto).upper().startswith('CURRENT_TIMESTAMP'):
+                    selects.append(f"IFNULL(s.{col}, CURRENT_TIMESTAMP)")
+                else:
+                    selects.append(f"IFNULL(s.{col}, %s)")
+                    parametros.append(defecto)
+            cursor.execute(f"""
+                INSERT INTO clientes ({', '.join(columnas)})
+                SELECT {', '.join(selects)}
+                FROM {tabla} s
+                WHERE s.cliente_id IS NULL AND s.n_validas > 0
+                ORDER BY s.primera_fila
+            """, parametros)
+            logger.info(f"✅ Clientes insertados: {cursor.rowcount}")
+        
+        if modo in ('actualizar', 'sobrescribir'):
+            sets = ', '.join(f"c.{col} = COALESCE(s.{col}, c.{col})" for col in columnas)
+            cursor.execute(f"""
+                UPDATE clientes c
+                JOIN {tabla} s ON s.cliente_id = c.id
+                SET {sets}, c.updated_at = NOW()
+                WHERE s.n_validas > 0
+            """)
+            logger.info(f"♻️ Clientes actualizados: {cursor.rowcount}")
+    
+    def importar(self, lector: LectorArchivo, modo: str, callback=None) -> Tuple[Dict, int]:
+        """
+        Ejecutar la ruta rápida completa sobre el archivo
+        
+        Returns:
+            (resultados, filas leídas)
+        """
+        if modo == 'upsert':
+            modo = 'sobrescribir'
+        total_estimado = max(lector.total_estimado(), 1)
+        
+        def progreso(fraccion: float, filas: int, total: int):
+            if callback:
+                callback(fraccion * 100, filas, total)
+        
+        columnas_bd = self.columnas_clientes()
+        ruta, columnas, total_filas, sin_telefono = self.escribir_filas(
+            lector, columnas_bd,
+            lambda filas: progreso(0.25 * min(filas / total_estimado, 1), filas, max(filas, total_estimado))
+        )
+        if not columnas:
+            os.remove(ruta)
+            return {'insertados': 0, 'actualizados': 0, 'errores': 0, 'duplicados': 0}, total_filas
+        try:
+            self.cargar_staging(ruta, columnas, modo)
+        finally:
+            os.remove(ruta)
+        progreso(0.5, total_filas, total_filas)
+        
+        resultados = self.clasificar(modo)
+        resultados['errores'] += sin_telefono
+        progreso(0.75, total_filas, total_filas)
+        
+        self.aplicar(modo, columnas, columnas_bd)
+        self.importador.cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {self.TABLA_STAGING}")
+        progreso(1.0, total_filas, total_filas)
+        
+        return resultados, total_filas
+
+
+class PlanImportacion:
+    """
+    Simulación (dry-run) de una importación: lee y limpia el archivo lote por lote
+    y no escribe nada en clientes
+    
+    Usa los mismos pasos que CargaMasivaClientes hasta antes de aplicar: el TSV de
+    staging, el colapso por teléfono en MySQL (tablas temporales de la sesión) y
+    los contadores de clasificar. Después compara, por páginas, los valores finales
+    de cada cliente existente con los de la BD para listar los cambios columna por
+    columna.
+    """
+    
+    # Clientes de staging comparados por consulta para calcular los cambios
+    TAMANO_CONSULTA = 1000
+    
+    COLUMNAS_DETALLE = ['cliente_id', 'telefono', 'columna', 'valor_actual', 'valor_nuevo']
+    
+    def __init__(self, importador: 'ImportadorCSV'):
+        self.importador = importador
+    
+    def paginas_existentes(self, columnas: List[str]):
+        """
+        Clientes de staging que se actualizarían, con sus valores actuales
+        (páginas de TAMANO_CONSULTA filas, recorridas por tel_norm)
+        """
+        cursor = self.importador.cursor
+        tabla = CargaMasivaClientes.TABLA_STAGING
+        valores = ', '.join([f"s.{col}" for col in columnas] +
+                            [f"c.{col} AS {col}__actual" for col in columnas])
+        ultimo = None
+        while True:
+            cursor.execute(f"""
+                SELECT s.tel_norm, s.cliente_id, {valores}
+                FROM {tabla} s
+                JOIN clientes c ON c.id = s.cliente_id
+                WHERE s.n_validas > 0 AND (%s IS NULL OR s.tel_norm > %s)
+                ORDER BY s.tel_norm
+                LIMIT {self.TAMANO_CONSULTA}
+            """, (ultimo, ultimo))
+            filas = cursor.fetchall()
+            if not filas:
+                return
+            ultimo = filas[-1]['tel_norm']
+            yield pd.DataFrame(filas)
+    
+    def normalizar(self, serie: pd.Series, columna: str) -> pd.Series:
+        """Llevar valores de la BD y del archivo a una forma comparable"""
+        tipo = self.importador.limpiador.tipo_columna(columna)
+        if tipo == 'fecha':
+            return pd.to_datetime(serie, errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+        if tipo in ('numero', 'boolean'):
+            return pd.to_numeric(serie, errors='coerce')
+        return serie.astype('string').str.strip()
+    
+    def cambios(self, pagina: pd.DataFrame, columnas: List[str]) -> pd.DataFrame:
+        """Cambios columna por columna en una página de clientes existentes"""
+        detalle = []
+        for col in columnas:
+            nuevo = pagina[col]
+            actual = pagina[f"{col}__actual"]
+            nuevo_norm = self.normalizar(nuevo, col)
+            actual_norm = self.normalizar(actual, col)
+            # Solo cuentan valores no nulos del archivo (los nulos no se escriben)
+            distinto = nuevo.notna() & (actual_norm.isna() | (nuevo_norm != actual_norm).fillna(True))
+            if distinto.any():
+                detalle.append(pd.DataFrame({
+                    'cliente_id': pagina['cliente_id'][distinto].values,
+                    'telefono': pagina['telefono'][distinto].values,
+                    'columna': col,
+                    'valor_actual': actual[distinto].values,
+                    'valor_nuevo': nuevo[distinto].values,
+                }))
+        
+        if not detalle:
+            return pd.DataFrame(columns=self.COLUMNAS_DETALLE)
+        return pd.concat(detalle, ignore_index=True).sort_values(['cliente_id', 'columna'])
+    
+    def simular(self, lector: LectorArchivo, modo: str, archivo_detalle: Path) -> Tuple[Dict, int]:
+        """
+        Simular la importación del archivo y guardar el detalle de cambios
+        
+        Requiere una conexión con LOAD DATA LOCAL (conectar_bd con carga_masiva=True).
+        
+        Returns:
+            (plan con contadores y cambios por columna, filas leídas)
+        """
+        if modo == 'upsert':
+            modo = 'sobrescribir'
+        carga = CargaMasivaClientes(self.importador)
+        plan = {'insertados': 0, 'actualizados': 0, 'errores': 0, 'duplicados': 0,
+                'clientes_con_cambios': 0, 'cambios_por_columna': {}}
+        pd.DataFrame(columns=self.COLUMNAS_DETALLE).to_csv(archivo_detalle, sep=';', index=False, encoding='utf-8')
+        
+        columnas_bd = carga.columnas_clientes()
+        ruta, columnas, total_filas, sin_telefono = carga.escribir_filas(lector, columnas_bd, lambda filas: None)
+        if not columnas:
+            os.remove(ruta)
+            return plan, total_filas
+        try:
+            try:
+                carga.cargar_staging(ruta, columnas, modo)
+            finally:
+                os.remove(ruta)
+            
+            plan.update(carga.clasificar(modo))
+            plan['errores'] += sin_telefono
+            
+            if modo != 'insertar':
+                cambios_por_columna = {}
+                for pagina in self.paginas_existentes(columnas):
+                    detalle = self.cambios(pagina, columnas)
+                    if detalle.empty:
+                        continue
+                    detalle.to_csv(archivo_detalle, sep=';', index=False, encoding='utf-8',
+                                   mode='a', header=False)
+                    # Cada cliente está en una sola fila de staging (una por teléfono)
+                    plan['clientes_con_cambios'] += int(detalle['cliente_id'].nunique())
+                    for col, n in detalle['columna'].value_counts().items():
+                        cambios_por_columna[col] = cambios_por_columna.get(col, 0) + int(n)
+                plan['cambios_por_columna'] = dict(
+                    sorted(cambios_por_columna.items(), key=lambda par: par[1], reverse=True)
+                )
+        finally:
+            self.importador.cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {carga.TABLA_STAGING}")
+        
+        return plan, total_filas
+
+
+class ColapsadorDuplicados:
+    """
+    Colapsar los teléfonos repetidos dentro del archivo antes de escribir en la BD
+    
+    Una pasada previa (solo la columna telefono) cuenta cada teléfono normalizado
+    en todo el archivo y guarda la primera y la última fila donde aparece. Durante
+    la importación, de cada teléfono repetido se envía una sola fila según la regla:
+    
+    - 'ultimo':   gana la última aparición
+    - 'primero':  gana la primera aparición
+    - 'combinar': una fila con el último valor no nulo de cada columna
+    
+    Las filas colapsadas se registran en logs/duplicados_clientes_YYYYMMDD_HHMMSS.csv.
+    """
+    
+    REGLAS = ('ultimo', 'primero', 'combinar')
+    
+    def __init__(self, importador: 'ImportadorCSV', regla: str):
+        if regla not in self.REGLAS:
+            raise ValueError(f"Regla de duplicados desconocida: '{regla}' (usa {', '.join(self.REGLAS)})")
+        self.importador = importador
+        self.regla = regla
+        # Teléfono normalizado → fila (índice) de la primera y la última aparición, solo repetidos
+        self.repetidos = set()
+        self.primera = {}
+        self.ultima = {}
+        # Teléfono normalizado → valores combinados hasta ahora (regla 'combinar')
+        self.combinados = {}
+        self.colapsadas = 0
+        self.reporte = log_dir / f"duplicados_clientes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        self.reporte_iniciado = False
+    
+    def normalizar(self, telefonos: pd.Series) -> pd.Series:
+        """Teléfono limpio y normalizado (mismo valor que después se importa)"""
+        texto = LimpiadorColumnas.a_texto(telefonos)
+        longitud = self.importador.limpiador.longitudes.get('telefono')
+        if longitud:
+            texto = texto.str.slice(0, longitud)
+        return texto.str.replace(' ', '', regex=False).str.replace('-', '', regex=False)
+    
+    def analizar(self, archivo_path: str, separador: str, tamano_lote: int):
+        """Pasada previa: ubicar la primera y la última aparición de cada teléfono"""
+        conteo = {}
+        primera = {}
+        ultima = {}
+        lector = LectorArchivo(archivo_path, separador, tamano_lote, solo_columnas=['telefono'])
+        for lote in lector:
+            telefonos = self.normalizar(lote['telefono']).dropna()
+            if telefonos.empty:
+                continue
+            posiciones = pd.Series(telefonos.index, index=telefonos.values)
+            grupos = posiciones.groupby(level=0, sort=False)
+            for telefono, n, desde, hasta in zip(grupos.size().index, grupos.size().values,
+                                                 grupos.min().values, grupos.max().values):
+                conteo[telefono] = conteo.get(telefono, 0) + int(n)
+                primera.setdefault(telefono, int(desde))
+                ultima[telefono] = int(hasta)
+        
+        repetidos = [telefono for telefono, n in conteo.items() if n > 1]
+        self.repetidos = set(repetidos)
+        self.primera = {telefono: primera[telefono] for telefono in repetidos}
+        self.ultima = {telefono: ultima[telefono] for telefono in repetidos}
+        logger.info(f"🧬 Teléfonos repetidos en el archivo: {len(repetidos)} "
+                    f"({sum(conteo[t] for t in repetidos) - len(repetidos)} filas a colapsar, regla: {self.regla})")
+    
+    def aplicar(self, limpio: pd.DataFrame) -> pd.DataFrame:
+        """Quitar del lote ya limpio las filas colapsadas (y combinar valores si corresponde)"""
+        if not self.repetidos:
+            return limpio
+        
+        telefonos = self.normalizar(limpio['telefono'])
+        repetido = telefonos.isin(self.repetidos)
+        if not repetido.any():
+            return limpio
+        
+        posicion = pd.Series(limpio.index, index=limpio.index)
+        if self.regla == 'primero':
+            ganadora = telefonos.map(self.primera)
+        else:
+            ganadora = telefonos.map(self.ultima)
+        colapsada = repetido & (posicion != ganadora)
+        
+        if self.regla == 'combinar':
+            limpio = self.combinar(limpio, telefonos, repetido, posicion == ganadora)
+        
+        if colapsada.any():
+            self.registrar(limpio.index[colapsada], telefonos[colapsada], ganadora[colapsada])
+        return limpio[~colapsada]
+    
+    def combinar(self, limpio: pd.DataFrame, telefonos: pd.Series, repetido: pd.Series,
+                 es_ganadora: pd.Series) -> pd.DataFrame:
+        """Acumular el último valor no nulo por columna y volcarlo en la fila ganadora"""
+        # groupby().last() se salta los nulos: último valor no nulo de cada columna en el lote
+        parciales = limpio[repetido].groupby(telefonos[repetido], sort=False).last()
+        for telefono, valores in zip(parciales.index, parciales.to_dict('records')):
+            combinado = self.combinados.setdefault(telefono, {})
+            combinado.update({col: valor for col, valor in valores.items()
+                              if valor is not None and not pd.isna(valor)})
+        
+        limpio = limpio.copy()
+        for indice in limpio.index[repetido & es_ganadora]:
+            combinado = self.combinados.pop(telefonos[indice])
+            columnas = list(combinado)
+            limpio.loc[indice, columnas] = pd.Series(combinado, dtype=object)[columnas].values
+        return limpio
+    
+    def registrar(self, indices: pd.Index, telefonos: pd.Series, ganadoras: pd.Series):
+        """Agregar las filas colapsadas al reporte CSV"""
+        self.colapsadas += len(indices)
+        reporte = pd.DataFrame({
+            'fila': indices + 2,
+            'telefono_normalizado': telefonos.values,
+            'fila_conservada': ganadoras.values.astype(int) + 2,
+            'regla': self.regla,
+        })
+        reporte.to_csv(self.reporte, sep=';', index=False, encoding='utf-8',
+                       mode='a' if self.reporte_iniciado else 'w', header=not self.reporte_iniciado)
+        self.reporte_iniciado = True
+    
+    def resumen(self):
+        if self.colapsadas:
+            logger.info(f"🧬 Filas colapsadas por teléfono repetido: {self.colapsadas} "
+                        f"(regla: {self.regla}, detalle: {self.reporte})")
+
+
+def importar_particion(ruta: str, particion: int, workers: int, config_bd: Dict,
+                       modo: str, tamano_batch: int, archivo_path: str) -> Tuple[Dict, Dict]:
+    """
+    Worker de la importación paralela (se ejecuta en otro proceso)
+    
+    Abre su propia conexión, indexa solo los teléfonos de su partición y procesa
+    los lotes ya limpios de su archivo con su propio EscritorClientes,
+    confirmando cada lote. Sus registros llegan al log del proceso principal
+    por la cola de iniciar_worker().
+    
+    Returns:
+        (resultados, contadores de eventos por fila)
+    """
+    importador = ImportadorCSV()
+    importador.registro.reiniciar(archivo_path)
+    importador.conn = mysql.connector.connect(**config_bd)
+    importador.cursor = importador.conn.cursor(dictionary=True)
+    try:
+        importador.cargar_indice_telefonos(particion=(particion, workers))
+        importador.escritor = EscritorClientes(importador, tamano_batch)
+        
+        with open(ruta, 'rb') as f:
+            while True:
+                try:
+                    lote = pickle.load(f)
+                except EOFError:
+                    break
+                for indice, fila in LimpiadorColumnas.iterar_filas(lote):
+                    importador.procesar_fila(fila, indice, modo)
+                importador.escritor.flush()
+                importador.conn.commit()
+        
+        logger.info(f"🧵 Partición {particion + 1}/{workers} terminada: {importador.resultados} "
+                    f"({importador.escritor.sentencias.formas_distintas} formas de sentencia)")
+        return importador.resultados, dict(importador.registro.contadores)
+    
+    except Exception:
+        importador.conn.rollback()
+        raise
+    finally:
+        if importador.escritor:
+            importador.escritor.cerrar()
+        importador.desconectar_bd()
+
+
+class ImportacionParalela:
+    """
+    Importación en paralelo con varios procesos y conexiones
+    
+    Las filas limpias se reparten por hash del teléfono normalizado, así un mismo
+    teléfono nunca queda en dos particiones (la verificación de duplicados y el
+    orden de las repeticiones siguen siendo correctos dentro de cada worker).
+    Cada partición se guarda en un archivo temporal y la procesa un worker de
+    ProcessPoolExecutor con su propia conexión MySQL y su propio escritor.
+    """
+    
+    def __init__(self, importador: 'ImportadorCSV', workers: int):
+        self.importador = importador
+        self.workers = workers
+    
+    def repartir(self, lector: LectorArchivo, directorio: str) -> Tuple[List[str], int]:
+        """
+        Limpiar el archivo lote por lote y repartir las filas en archivos por partición
+        
+        Returns:
+            (rutas de las particiones, filas leídas)
+        """
+        importador = self.importador
+        rutas = [os.path.join(directorio, f"particion_{i}.pkl") for i in range(self.workers)]
+        archivos = [open(ruta, 'wb') for ruta in rutas]
+        leidas = 0
+        try:
+            for lote in lector:
+                limpio = importador.limpiador.limpiar(lote)
+                leidas += len(limpio)
+                if importador.colapsador:
+                    limpio = importador.colapsador.aplicar(limpio)
+                
+                sin_telefono = limpio['telefono'].isna()
+                for indice, fila in LimpiadorColumnas.iterar_filas(limpio[sin_telefono]):
+                    importador.registro.rechazo(indice + 2, 'sin_telefono', fila,
+                                                "⚠️ Fila %s: Sin teléfono, omitida", indice + 2)
+                importador.resultados['errores'] += int(sin_telefono.sum())
+                
+                limpio = limpio[~sin_telefono]
+                particiones = limpio['telefono'].map(
+                    lambda tel: importador.particion_telefono(importador.normalizar_telefono(tel), self.workers)
+                )
+                for particion, grupo in limpio.groupby(particiones, sort=False):
+                    pickle.dump(grupo, archivos[particion], protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            for archivo in archivos:
+                archivo.close()
+        
+        return rutas, leidas
+    
+    def importar(self, lector: LectorArchivo, modo: str, tamano_batch: int,
+                 callback=None) -> Tuple[Dict, int]:
+        """
+        Ejecutar la importación paralela y combinar los resultados
+        
+        Returns:
+            (resultados combinados, filas leídas)
+        """
+        importador = self.importador
+        if modo == 'upsert':
+            # Los INSERT ... ON DUPLICATE KEY concurrentes sobre uk_telefono_normalizado
+            # pueden bloquearse entre sí (deadlock) y revertir lotes completos
+            raise ValueError("El modo 'upsert' no admite workers paralelos")
+        if not importador.config_bd:
+            raise ValueError("La importación paralela requiere conectar con conectar_bd()")
+        
+        with tempfile.TemporaryDirectory(prefix='importacion_clientes_') as directorio:
+            rutas, leidas = self.repartir(lector, directorio)
+            logger.info(f"🧵 Archivo repartido en {self.workers} particiones, iniciando workers")
+            
+            with cola_para_workers() as cola, \
+                    ProcessPoolExecutor(max_workers=self.workers, initializer=iniciar_worker,
+                                        initargs=(cola,)) as executor:
+                futuros = [
+                    executor.submit(importar_particion, ruta, particion, self.workers,
+                                    importador.config_bd, modo, tamano_batch, lector.archivo_path)
+                    for particion, ruta in enumerate(rutas)
+                ]
+                
+                terminados = 0
+                for futuro in as_completed(futuros):
+                    resultados, contadores = futuro.result()
+                    for clave, valor in resultados.items():
+                        importador.resultados[clave] += valor
+                    importador.registro.contadores.update(contadores)
+                    terminados += 1
+                    if callback:
+                        callback(terminados / self.workers * 100,
+                                 int(leidas * terminados / self.workers), leidas)
+        
+        return importador.resultados, leidas
+
+
 class ImportadorCSV:
     """Clase para importar CSVs de clientes a MySQL"""
     
     # Mapeo de columnas CSV a columnas de BD
     COLUMNAS_REQUERIDAS = ['telefono', 'nombre']
     
+    # Tipos por defecto: al conectar se reemplazan por los del esquema de la tabla
     COLUMNAS_FECHA = [
         'ultima_fecha_gestion', 'fecha_ultimo_contacto', 'created_at', 
         'updated_at', 'fecha_nacimiento', 'fecha_wizard_completado',
         'derivado_at', 'opened_at', 'last_activity', 'returned_at'
     ]
     
-    COLUMNAS_NUMERO = ['precio_plan', 'wizard_completado']
+    COLUMNAS_NUMERO = ['precio_plan']
+    
+    COLUMNAS_BOOLEAN = ['wizard_completado']
     
     def __init__(self):
         """Inicializar conexión a BD"""
         self.conn = None
         self.cursor = None
+        self.config_bd = None
+        self.limpiador = LimpiadorColumnas(self.COLUMNAS_FECHA, self.COLUMNAS_NUMERO,
+                                           self.COLUMNAS_BOOLEAN)
+        self.registro = RegistroFilas('clientes', logger)
+        self.cancelada = False
+        self.colapsador = None
+        self.sesion = None
+        # Índice en memoria: teléfono normalizado → [(id, nombre, dni, asesor_asignado)]
+        self.indice_telefonos = None
+        self.escritor = None
         self.resultados = {
             'insertados': 0,
             'actualizados': 0,
@@ -60,20 +1074,24 @@ class ImportadorCSV:
         }
         
     def conectar_bd(self, host='localhost', port=3308, user='root', 
-                    password='', database='albru'):
-        """Conectar a la base de datos MySQL"""
+                    password='', database='albru', carga_masiva: bool = False):
+        """Conectar a la base de datos MySQL (carga_masiva habilita LOAD DATA LOCAL)"""
         try:
-            self.conn = mysql.connector.connect(
-                host=host,
-                port=port,
-                user=user,
-                password=password,
-                database=database,
-                charset='utf8mb4',
-                use_unicode=True
-            )
+            # Se guarda para que los workers paralelos abran sus propias conexiones
+            self.config_bd = {
+                'host': host,
+                'port': port,
+                'user': user,
+                'password': password,
+                'database': database,
+                'charset': 'utf8mb4',
+                'use_unicode': True,
+                'allow_local_infile': carga_masiva
+            }
+            self.conn = mysql.connector.connect(**self.config_bd)
             self.cursor = self.conn.cursor(dictionary=True)
             logger.info(f"✅ Conectado a BD: {database} en {host}:{port}")
+            self.cargar_esquema()
             return True
         except Error as e:
             logger.error(f"❌ Error al conectar a BD: {e}")
@@ -81,6 +1099,12 @@ class ImportadorCSV:
                                f"No se pudo conectar a la base de datos:\n{str(e)}")
             return False
     
+    def cargar_esquema(self):
+        """Leer una vez las columnas de clientes y configurar el plan de conversión"""
+        esquema = EsquemaTabla.leer(self.cursor, 'clientes')
+        if esquema:
+            self.limpiador.configurar_esquema(esquema.tipos(), esquema.longitudes())
+    
     def desconectar_bd(self):
         """Cerrar conexión a BD"""
         if self.cursor:
@@ -89,104 +1113,149 @@ class ImportadorCSV:
             self.conn.close()
         logger.info("🔌 Desconectado de BD")
     
-    def leer_archivo(self, archivo_path: str, separador: str = ';') -> pd.DataFrame:
-        """Leer archivo CSV o XLSX con pandas"""
+    def leer_archivo(self, archivo_path: str, separador: str = ';',
+                     tamano_lote: int = 1000) -> LectorArchivo:
+        """Abrir archivo CSV o XLSX para leerlo por lotes (sin cargarlo completo)"""
         try:
-            # Detectar extensión del archivo
-            extension = archivo_path.lower().split('.')[-1]
-            
-            if extension == 'xlsx' or extension == 'xls':
-                # Leer Excel
-                df = pd.read_excel(archivo_path, engine='openpyxl')
-                logger.info(f"✅ Excel leído correctamente")
-            else:
-                # Leer CSV con diferentes encodings
-                encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-                df = None
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(archivo_path, sep=separador, encoding=encoding)
-                        logger.info(f"✅ CSV leído con encoding: {encoding}")
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                
-                if df is None:
-                    raise ValueError("No se pudo leer el archivo con ningún encoding conocido")
+            lector = LectorArchivo(archivo_path, separador, tamano_lote)
+            logger.info(f"📊 Archivo abierto: ~{lector.total_estimado()} filas, lotes de {tamano_lote}")
             
-            logger.info(f"📊 Archivo cargado: {len(df)} filas, {len(df.columns)} columnas")
-            logger.info(f"📋 Columnas encontradas: {', '.join(df.columns.tolist())}")
+            # Validar columnas requeridas y compilar el plan de conversión del encabezado
+            # (antes de procesar cualquier fila)
+            lector.validar_columnas(self.COLUMNAS_REQUERIDAS)
+            self.limpiador.reiniciar()
+            self.limpiador.validar_encabezado(lector.columnas, self.COLUMNAS_REQUERIDAS)
             
-            # Validar columnas requeridas
-            columnas_faltantes = [col for col in self.COLUMNAS_REQUERIDAS 
-                                 if col not in df.columns]
-            if columnas_faltantes:
-                raise ValueError(f"Columnas requeridas faltantes: {', '.join(columnas_faltantes)}")
-            
-            return df
+            return lector
         
         except Exception as e:
             logger.error(f"❌ Error al leer archivo: {e}")
             raise
     
-    def limpiar_valor(self, valor, tipo_columna: str = 'texto'):
-        """Limpiar y convertir valores según el tipo de columna"""
-        # Manejar valores nulos/vacíos
-        if pd.isna(valor) or valor == '' or valor == 'NULL' or valor is None:
-            return None
+    @staticmethod
+    def normalizar_telefono(telefono) -> str:
+        """Normalizar teléfono (sin espacios ni guiones) para comparar duplicados"""
+        return str(telefono).replace(' ', '').replace('-', '')
+    
+    @staticmethod
+    def particion_telefono(telefono_normalizado: str, workers: int) -> int:
+        """Partición (estable entre procesos) de un teléfono normalizado"""
+        return zlib.crc32(telefono_normalizado.encode('utf-8')) % workers
+    
+    def cargar_indice_telefonos(self, particion: Tuple[int, int] = None) -> int:
+        """
+        Cargar una sola vez el índice teléfono normalizado → cliente
         
-        # Convertir a string y limpiar espacios
-        valor_str = str(valor).strip()
+        Evita el SELECT con REPLACE() por fila, que no puede usar idx_telefono
+        y obliga a recorrer toda la tabla clientes en cada verificación.
         
-        if tipo_columna == 'fecha':
-            return self.convertir_fecha(valor_str)
-        elif tipo_columna == 'numero':
-            try:
-                return float(valor_str) if valor_str else None
-            except ValueError:
-                return None
-        elif tipo_columna == 'boolean':
-            if valor_str.upper() in ['SI', 'SÍ', 'YES', '1', 'TRUE']:
-                return 1
-            elif valor_str.upper() in ['NO', '0', 'FALSE']:
-                return 0
-            return None
-        else:
-            # Texto: reemplazar valores vacíos por None
-            return valor_str if valor_str and valor_str.upper() != 'NULL' else None
+        Args:
+            particion: (número, total de workers) para indexar solo los teléfonos
+                       de esa partición (importación paralela)
+        
+        Returns:
+            Cantidad de clientes indexados
+        """
+        self.indice_telefonos = {}
+        filtro = ''
+        parametros = ()
+        if particion:
+            # Misma partición que particion_telefono (CRC32 de MySQL = zlib.crc32 sobre UTF-8):
+            # cada worker recibe solo sus teléfonos en lugar de leer y descartar toda la tabla
+            filtro = "WHERE MOD(CRC32(REPLACE(REPLACE(telefono, ' ', ''), '-', '')), %s) = %s"
+            parametros = (particion[1], particion[0])
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT id, nombre, telefono, dni, asesor_asignado
+                FROM clientes
+                {filtro}
+                ORDER BY id
+            """, parametros)
+            total = 0
+            for cliente_id, nombre, telefono, dni, asesor_asignado in cursor:
+                if not telefono:
+                    continue
+                self.indice_telefonos.setdefault(self.normalizar_telefono(telefono), []).append(
+                    (cliente_id, nombre, dni, asesor_asignado)
+                )
+                total += 1
+        finally:
+            cursor.close()
+        
+        logger.info(f"📇 Índice de teléfonos cargado: {total} clientes, "
+                    f"{len(self.indice_telefonos)} teléfonos distintos")
+        return total
     
-    def convertir_fecha(self, fecha_str: str):
-        """Convertir string de fecha a formato MySQL (YYYY-MM-DD HH:MM:SS)"""
-        if not fecha_str or fecha_str.upper() == 'NULL':
-            return None
+    def verificar_soporte_upsert(self):
+        """Verificar que exista la columna telefono_normalizado (migración 009)"""
+        self.cursor.execute("""
+            SELECT COUNT(*) AS total
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = 'clientes'
+              AND COLUMN_NAME = 'telefono_normalizado'
+              AND NON_UNIQUE = 0
+        """)
+        if not self.cursor.fetchone()['total']:
+            raise ValueError(
+                "El modo 'upsert' requiere la columna clientes.telefono_normalizado con índice único. "
+                "Aplica database/migrations/009_telefono_normalizado.sql"
+            )
+    
+    def registrar_en_indice(self, telefono: str, cliente_id: int, datos: Dict):
+        """Agregar o refrescar un cliente en el índice tras un INSERT/UPDATE"""
+        if self.indice_telefonos is None:
+            return
         
-        # Formatos comunes de fecha
-        formatos = [
-            '%Y/%m/%d',           # 2025/01/15
-            '%Y-%m-%d',           # 2025-01-15
-            '%d/%m/%Y',           # 15/01/2025
-            '%d-%m-%Y',           # 15-01-2025
-            '%Y/%m/%d %H:%M:%S',  # 2025/01/15 14:30:00
-            '%Y-%m-%d %H:%M:%S',  # 2025-01-15 14:30:00
-        ]
-        
-        for formato in formatos:
-            try:
-                dt = datetime.strptime(fecha_str, formato)
-                return dt.strftime('%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                continue
+        registro = (cliente_id, datos.get('nombre'), datos.get('dni'),
+                    datos.get('asesor_asignado'))
+        registros = self.indice_telefonos.setdefault(self.normalizar_telefono(telefono), [])
+        for i, existente in enumerate(registros):
+            # Un id None es un INSERT encolado que aún no tiene id asignado
+            if existente[0] == cliente_id or (existente[0] is None and cliente_id is not None):
+                registros[i] = registro
+                return
+        registros.append(registro)
+    
+    def quitar_pendiente_del_indice(self, telefono: str):
+        """Quitar del índice un INSERT encolado que finalmente falló"""
+        if self.indice_telefonos is None:
+            return
         
-        logger.warning(f"⚠️ No se pudo convertir fecha: {fecha_str}")
-        return None
+        clave = self.normalizar_telefono(telefono)
+        registros = [r for r in self.indice_telefonos.get(clave, []) if r[0] is not None]
+        if registros:
+            self.indice_telefonos[clave] = registros
+        else:
+            self.indice_telefonos.pop(clave, None)
     
     def verificar_duplicado(self, telefono: str, cliente_id: int = None) -> Dict:
         """Verificar si existe un cliente con el mismo teléfono"""
-        try:
-            # Limpiar teléfono (quitar espacios)
-            telefono_limpio = telefono.replace(' ', '').replace('-', '')
+        # Limpiar teléfono (quitar espacios)
+        telefono_limpio = self.normalizar_telefono(telefono)
+        
+        if self.indice_telefonos is not None:
+            # Resolver desde el índice en memoria (sin ir a la BD)
+            excluir = None
+            if cliente_id:
+                try:
+                    excluir = int(float(cliente_id))
+                except (TypeError, ValueError):
+                    excluir = None
             
+            for id_existente, nombre, dni, asesor_asignado in self.indice_telefonos.get(telefono_limpio, ()):
+                if excluir is None or id_existente != excluir:
+                    return {
+                        'id': id_existente,
+                        'nombre': nombre,
+                        'telefono': telefono,
+                        'dni': dni,
+                        'asesor_asignado': asesor_asignado
+                    }
+            return None
+        
+        try:
             # Buscar por teléfono (con o sin espacios)
             query = """
                 SELECT id, nombre, telefono, dni, asesor_asignado 
@@ -208,156 +1277,234 @@ class ImportadorCSV:
             logger.error(f"❌ Error al verificar duplicado: {e}")
             return None
     
-    def construir_insert_query(self, datos: Dict) -> Tuple[str, List]:
-        """Construir query INSERT con los datos del cliente"""
-        columnas = []
-        valores = []
-        placeholders = []
-        
-        for columna, valor in datos.items():
-            if valor is not None:  # Solo incluir valores no nulos
-                columnas.append(columna)
-                valores.append(valor)
-                placeholders.append('%s')
-        
-        query = f"""
-            INSERT INTO clientes ({', '.join(columnas)})
-            VALUES ({', '.join(placeholders)})
-        """
-        
-        return query, valores
-    
-    def construir_update_query(self, datos: Dict, cliente_id: int) -> Tuple[str, List]:
-        """Construir query UPDATE con los datos del cliente"""
-        sets = []
-        valores = []
-        
-        for columna, valor in datos.items():
-            if columna != 'id':  # No actualizar el ID
-                sets.append(f"{columna} = %s")
-                valores.append(valor)
-        
-        valores.append(cliente_id)  # ID para el WHERE
-        
-        query = f"""
-            UPDATE clientes 
-            SET {', '.join(sets)}, updated_at = NOW()
-            WHERE id = %s
-        """
-        
-        return query, valores
-    
-    def procesar_fila(self, fila: pd.Series, indice: int, 
+    def procesar_fila(self, fila: Dict, indice: int, 
                       modo: str = 'insertar') -> bool:
-        """Procesar una fila del CSV e insertar/actualizar en BD"""
+        """Procesar una fila ya limpia del CSV e insertar/actualizar en BD"""
         try:
-            # Extraer datos y limpiar
-            datos = {}
-            
-            for columna in fila.index:
-                valor = fila[columna]
-                
-                # Determinar tipo de columna
-                if columna in self.COLUMNAS_FECHA:
-                    tipo = 'fecha'
-                elif columna in self.COLUMNAS_NUMERO:
-                    tipo = 'numero'
-                elif columna == 'wizard_completado':
-                    tipo = 'boolean'
-                else:
-                    tipo = 'texto'
-                
-                # Limpiar valor
-                valor_limpio = self.limpiar_valor(valor, tipo)
-                
-                # Agregar a datos si no es None o si es una columna importante
-                if valor_limpio is not None or columna in self.COLUMNAS_REQUERIDAS:
-                    datos[columna] = valor_limpio
+            # Agregar a datos si no es None o si es una columna importante
+            datos = {columna: valor for columna, valor in fila.items()
+                     if valor is not None or columna in self.COLUMNAS_REQUERIDAS}
             
             # Validar teléfono
             if not datos.get('telefono'):
-                logger.warning(f"⚠️ Fila {indice + 2}: Sin teléfono, omitida")
+                self.registro.rechazo(indice + 2, 'sin_telefono', fila,
+                                      "⚠️ Fila %s: Sin teléfono, omitida", indice + 2)
                 self.resultados['errores'] += 1
                 return False
             
             telefono = datos['telefono']
             cliente_id = datos.get('id')
             
+            if modo == 'upsert':
+                # MySQL resuelve insertar vs actualizar con uk_telefono_normalizado
+                datos.pop('id', None)
+                self.escritor.agregar_upsert(indice, telefono, datos)
+                return True
+            
             # Verificar duplicados
             duplicado = self.verificar_duplicado(telefono, cliente_id)
             
-            if modo == 'actualizar' and duplicado:
-                # Modo actualizar: UPDATE
-                query, valores = self.construir_update_query(datos, duplicado['id'])
-                self.cursor.execute(query, valores)
-                self.resultados['actualizados'] += 1
-                logger.info(f"♻️ Fila {indice + 2}: Cliente actualizado (ID: {duplicado['id']})")
+            if duplicado and duplicado['id'] is None and modo in ('actualizar', 'sobrescribir'):
+                # Repetido de un INSERT aún encolado: escribirlo para conocer su id
+                self.escritor.flush()
+                duplicado = self.verificar_duplicado(telefono, cliente_id)
+            
+            if modo == 'insertar' and duplicado:
+                # Ya existe: omitir
+                self.resultados['duplicados'] += 1
+                self.registro.detalle('duplicado', "⏭️ Fila %s: Duplicado omitido (tel: %s)",
+                                      indice + 2, telefono)
+                return False
+            
+            if modo == 'actualizar' and not duplicado:
+                return True
+            
+            # Un INSERT/UPDATE con campos requeridos vacíos fallaría en la BD: se descarta
+            # antes de encolarlo para que no quede como pendiente en el índice
+            faltantes = [col for col in self.COLUMNAS_REQUERIDAS if datos.get(col) is None]
+            if faltantes:
+                self.registro.rechazo(indice + 2, 'faltan_requeridos', fila,
+                                      "⚠️ Fila %s: Faltan campos requeridos (%s), omitida",
+                                      indice + 2, ', '.join(faltantes))
+                self.resultados['errores'] += 1
+                return False
+            
+            if duplicado:
+                # Modo actualizar/sobrescribir: UPDATE
+                self.escritor.agregar_update(indice, telefono, duplicado['id'], datos)
+            else:
+                # No existe: INSERT
+                # Remover ID si existe (auto_increment)
+                if 'id' in datos:
+                    del datos['id']
                 
-            elif modo == 'insertar':
-                if duplicado:
-                    # Ya existe: omitir
-                    self.resultados['duplicados'] += 1
-                    logger.info(f"⏭️ Fila {indice + 2}: Duplicado omitido (tel: {telefono})")
-                    return False
-                else:
-                    # No existe: INSERT
-                    # Remover ID si existe (auto_increment)
-                    if 'id' in datos:
-                        del datos['id']
-                    
-                    query, valores = self.construir_insert_query(datos)
-                    self.cursor.execute(query, valores)
-                    self.resultados['insertados'] += 1
-                    logger.info(f"✅ Fila {indice + 2}: Cliente insertado (tel: {telefono})")
-            
-            elif modo == 'sobrescribir':
-                if duplicado:
-                    # Sobrescribir: UPDATE
-                    query, valores = self.construir_update_query(datos, duplicado['id'])
-                    self.cursor.execute(query, valores)
-                    self.resultados['actualizados'] += 1
-                    logger.info(f"♻️ Fila {indice + 2}: Cliente sobrescrito (ID: {duplicado['id']})")
-                else:
-                    # No existe: INSERT
-                    if 'id' in datos:
-                        del datos['id']
-                    
-                    query, valores = self.construir_insert_query(datos)
-                    self.cursor.execute(query, valores)
-                    self.resultados['insertados'] += 1
-                    logger.info(f"✅ Fila {indice + 2}: Cliente insertado (tel: {telefono})")
+                self.escritor.agregar_insert(indice, telefono, datos)
             
             return True
             
         except Error as e:
-            logger.error(f"❌ Fila {indice + 2}: Error SQL - {e}")
+            self.registro.rechazo(indice + 2, 'error_sql', fila,
+                                  "❌ Fila %s: Error SQL - %s", indice + 2, e, nivel=logging.ERROR)
             self.resultados['errores'] += 1
             return False
         except Exception as e:
-            logger.error(f"❌ Fila {indice + 2}: Error - {e}")
+            self.registro.rechazo(indice + 2, 'error', fila,
+                                  "❌ Fila %s: Error - %s", indice + 2, e, nivel=logging.ERROR)
             self.resultados['errores'] += 1
             return False
     
+    def confirmar(self):
+        """
+        Confirmar la importación
+        
+        Con sesión masiva toda la carga está en una sola transacción: la integridad
+        se verifica antes del COMMIT y, si hay filas huérfanas o teléfonos repetidos,
+        se hace rollback y se lanza el error (no queda nada de la carga en la BD).
+        """
+        if not self.sesion:
+            self.conn.commit()
+            return
+        
+        problemas = self.sesion.confirmar()
+        if problemas:
+            raise RuntimeError("Carga deshecha por problemas de integridad después de la sesión masiva: " +
+                               ", ".join(f"{restriccion} ({filas} filas)" for restriccion, filas in problemas.items()))
+    
+    def mostrar_resumen(self, total_filas: int):
+        """Registrar el resumen de la importación"""
+        logger.info("=" * 60)
+        logger.info("📊 RESUMEN DE IMPORTACIÓN")
+        logger.info("=" * 60)
+        logger.info(f"✅ Insertados:   {self.resultados['insertados']}")
+        logger.info(f"♻️ Actualizados: {self.resultados['actualizados']}")
+        logger.info(f"⏭️ Duplicados:   {self.resultados['duplicados']}")
+        logger.info(f"❌ Errores:      {self.resultados['errores']}")
+        logger.info(f"📁 Total filas:  {total_filas}")
+        self.limpiador.resumen()
+        if self.colapsador:
+            self.colapsador.resumen()
+        if self.escritor:
+            self.escritor.sentencias.resumen()
+        if self.registro.contadores:
+            logger.info("📋 Eventos por fila:")
+            self.registro.resumen()
+        if self.registro.total_rechazos():
+            logger.info(f"📄 Filas rechazadas (detalle completo): {rechazos_file}")
+        logger.info("=" * 60)
+    
+    def planificar_csv(self, archivo_path: str, modo: str = 'sobrescribir',
+                       lote_size: int = 10000) -> Dict:
+        """
+        Simular la importación (dry-run) sin escribir en la BD
+        
+        Reporta cuántas filas se insertarían, actualizarían, omitirían como duplicadas
+        o se rechazarían, y guarda el detalle de cambios por columna de los clientes
+        existentes en logs/plan_clientes_YYYYMMDD_HHMMSS.csv. El archivo se procesa
+        lote por lote con el mismo colapso en SQL que la carga masiva, así que
+        requiere conectar con carga_masiva=True (LOAD DATA LOCAL).
+        
+        Returns:
+            Dict con el plan (mismas claves que resultados + cambios por columna)
+        """
+        lector = self.leer_archivo(archivo_path, tamano_lote=lote_size)
+        logger.info(f"🧪 Simulando importación (no se escribe en la BD), modo: {modo}")
+        
+        archivo_detalle = log_dir / f"plan_clientes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        plan, total_filas = PlanImportacion(self).simular(lector, modo, archivo_detalle)
+        plan['archivo_detalle'] = str(archivo_detalle)
+        
+        logger.info("=" * 60)
+        logger.info("🧪 PLAN DE IMPORTACIÓN (simulación, no se escribió nada)")
+        logger.info("=" * 60)
+        logger.info(f"✅ Se insertarían:   {plan['insertados']}")
+        logger.info(f"♻️ Se actualizarían: {plan['actualizados']}")
+        logger.info(f"⏭️ Duplicados:       {plan['duplicados']}")
+        logger.info(f"❌ Rechazadas:       {plan['errores']}")
+        logger.info(f"📁 Total filas:      {total_filas}")
+        logger.info(f"🔍 Clientes con cambios: {plan['clientes_con_cambios']}")
+        for columna, cantidad in plan['cambios_por_columna'].items():
+            logger.info(f"   • {columna}: {cantidad}")
+        self.limpiador.resumen()
+        logger.info(f"📄 Detalle de cambios: {archivo_detalle}")
+        logger.info("=" * 60)
+        
+        return plan
+    
     def importar_csv(self, archivo_path: str, modo: str = 'insertar', 
-                     lote_size: int = 100, callback=None) -> Dict:
+                     lote_size: int = 1000, callback=None,
+                     tamano_batch: int = 500, carga_masiva: bool = False,
+                     workers: int = 1, reanudar: bool = False, cancelar=None,
+                     duplicados: str = None, sesion_masiva: bool = False) -> Dict:
         """
         Importar CSV completo a la BD
         
         Args:
             archivo_path: Ruta del archivo CSV
-            modo: 'insertar' (solo nuevos), 'actualizar' (solo existentes), 'sobrescribir' (ambos)
-            lote_size: Tamaño de lote para commit
+            modo: 'insertar' (solo nuevos), 'actualizar' (solo existentes), 'sobrescribir' (ambos),
+                  'upsert' (como sobrescribir, resuelto en el servidor con ON DUPLICATE KEY UPDATE)
+            lote_size: Filas leídas, escritas y confirmadas por lote
             callback: Función para reportar progreso
+            tamano_batch: Filas por sentencia multi-fila del escritor
+            carga_masiva: Usar LOAD DATA + SQL por conjuntos (archivos de millones de filas).
+                          Requiere conectar con carga_masiva=True y local_infile=ON en el servidor
+            workers: Procesos en paralelo (cada uno con su conexión), repartidos por teléfono
+            reanudar: Continuar desde el checkpoint del archivo (si existe) en lugar del inicio
+            cancelar: threading.Event; si se activa, la importación fila por fila se detiene
+                      después de confirmar el lote en curso (el checkpoint queda para reanudar).
+                      Con sesión masiva no hay lotes confirmados: se deshace toda la carga
+            duplicados: Colapsar teléfonos repetidos en el archivo antes de escribir:
+                        'ultimo', 'primero' o 'combinar' (None: enviar todas las filas);
+                        'combinar' no admite reanudar
+            sesion_masiva: Cargar sin autocommit, UNIQUE_CHECKS ni FOREIGN_KEY_CHECKS en una sola
+                           transacción: la integridad se verifica por conjuntos antes del COMMIT
+                           (rollback si hay problemas). No guarda checkpoints, así que no admite
+                           reanudar ni workers (cada worker confirma su propia partición)
         
         Returns:
             Dict con resultados del proceso
         """
+        if reanudar and duplicados == 'combinar' and not carga_masiva and workers <= 1:
+            # Los valores combinados de teléfonos cuya fila ganadora no llegó no están en el checkpoint
+            raise ValueError("La regla de duplicados 'combinar' no admite reanudar: importa el archivo "
+                             "completo o usa 'ultimo' / 'primero'")
+        if sesion_masiva and reanudar:
+            raise ValueError("La sesión masiva no guarda checkpoints (confirma todo al final): no admite reanudar")
+        if sesion_masiva and workers > 1 and not carga_masiva:
+            raise ValueError("La sesión masiva confirma en una sola transacción: no admite workers paralelos")
+        
         try:
-            # Leer archivo (CSV o XLSX)
-            df = self.leer_archivo(archivo_path)
-            total_filas = len(df)
+            # Abrir archivo (CSV o XLSX) para leerlo por lotes de lote_size filas
+            lector = self.leer_archivo(archivo_path, tamano_lote=lote_size)
+            total_filas = lector.total_estimado()
+            self.cancelada = False
+            self.escritor = None
+            self.colapsador = None
+            
+            logger.info(f"🚀 Iniciando importación: ~{total_filas} filas, modo: {modo}")
+            
+            if sesion_masiva:
+                # El upsert necesita que el servidor detecte el teléfono repetido: mantiene UNIQUE_CHECKS
+                self.sesion = SesionMasiva(self.conn, ['clientes'], desactivar_unicos=(modo != 'upsert'))
+                self.sesion.activar()
+            
+            self.registro.reiniciar(archivo_path)
+            
+            if reanudar and (carga_masiva or workers > 1):
+                logger.warning("⚠️ Reanudar solo aplica a la importación fila por fila (sin carga masiva ni workers)")
+            
+            if duplicados and carga_masiva:
+                logger.warning("⚠️ La carga masiva ya colapsa los teléfonos repetidos con su propia regla")
+            elif duplicados:
+                # Pasada previa sobre la columna telefono de todo el archivo
+                self.colapsador = ColapsadorDuplicados(self, duplicados)
+                self.colapsador.analizar(archivo_path, lector.separador, lote_size)
             
-            logger.info(f"🚀 Iniciando importación: {total_filas} filas, modo: {modo}")
+            if carga_masiva:
+                # Cada lote limpio va directo al archivo de staging; el colapso por teléfono lo hace MySQL
+                self.resultados, total_filas = CargaMasivaClientes(self).importar(lector, modo, callback)
+                self.confirmar()
+                self.mostrar_resumen(total_filas)
+                return self.resultados
             
             # Reset resultados
             self.resultados = {
@@ -367,35 +1514,72 @@ class ImportadorCSV:
                 'duplicados': 0
             }
             
-            # Procesar filas en lotes
-            for i, (indice, fila) in enumerate(df.iterrows()):
-                # Procesar fila
-                self.procesar_fila(fila, indice, modo)
+            if workers > 1:
+                self.resultados, total_filas = ImportacionParalela(self, workers).importar(
+                    lector, modo, tamano_batch, callback
+                )
+                self.mostrar_resumen(total_filas)
+                return self.resultados
+            
+            if modo == 'upsert':
+                self.verificar_soporte_upsert()
+            else:
+                # Cargar índice de teléfonos una sola vez para toda la importación
+                self.cargar_indice_telefonos()
+            self.escritor = EscritorClientes(self, tamano_batch)
+            
+            # Checkpoint después de cada lote confirmado, para poder reanudar si se corta
+            checkpoint = CheckpointImportacion(archivo_path, 'clientes', modo, log_dir / 'checkpoints')
+            estado = checkpoint.cargar() if reanudar else None
+            if estado:
+                lector.desde = estado['siguiente_fila']
+                lector.desde_byte = estado.get('posicion_byte') or 0
+                self.resultados = estado['resultados']
+            elif checkpoint.existe():
+                logger.warning("⚠️ Hay un checkpoint de este archivo: se importará desde el inicio "
+                               "(usa reanudar / --resume para continuar donde quedó)")
+            
+            # Cada lote se limpia (vectorizado), se escribe y se confirma antes de leer el siguiente
+            procesadas = lector.desde
+            for lote in lector:
+                limpio = self.limpiador.limpiar(lote)
+                if self.colapsador:
+                    limpio = self.colapsador.aplicar(limpio)
+                for indice, fila in LimpiadorColumnas.iterar_filas(limpio):
+                    self.procesar_fila(fila, indice, modo)
                 
-                # Commit cada lote
-                if (i + 1) % lote_size == 0:
+                # Commit del lote (con sesión masiva, todo se confirma junto al final)
+                self.escritor.flush()
+                procesadas = int(lote.index[-1]) + 1
+                total_filas = max(total_filas, procesadas)
+                if not self.sesion:
                     self.conn.commit()
-                    logger.info(f"💾 Commit de lote: {i + 1}/{total_filas}")
+                    checkpoint.guardar(procesadas, self.resultados, lector.posicion)
+                    logger.info(f"💾 Commit de lote: {procesadas}/{total_filas}")
                 
                 # Reportar progreso
                 if callback:
-                    progreso = ((i + 1) / total_filas) * 100
-                    callback(progreso, i + 1, total_filas)
+                    progreso = (procesadas / total_filas) * 100
+                    callback(progreso, procesadas, total_filas)
+                
+                if cancelar is not None and cancelar.is_set():
+                    self.cancelada = True
+                    if self.sesion:
+                        self.conn.rollback()
+                        logger.warning(f"⏹️ Importación cancelada en la fila {procesadas + 2}: "
+                                       f"la sesión masiva deshizo toda la carga (rollback)")
+                    else:
+                        logger.warning(f"⏹️ Importación cancelada después del lote confirmado "
+                                       f"(fila {procesadas + 2}); se puede reanudar desde el checkpoint")
+                    break
             
-            # Commit final
-            self.conn.commit()
-            logger.info(f"💾 Commit final")
-            
-            # Resumen
-            logger.info("=" * 60)
-            logger.info("📊 RESUMEN DE IMPORTACIÓN")
-            logger.info("=" * 60)
-            logger.info(f"✅ Insertados:   {self.resultados['insertados']}")
-            logger.info(f"♻️ Actualizados: {self.resultados['actualizados']}")
-            logger.info(f"⏭️ Duplicados:   {self.resultados['duplicados']}")
-            logger.info(f"❌ Errores:      {self.resultados['errores']}")
-            logger.info(f"📁 Total filas:  {total_filas}")
-            logger.info("=" * 60)
+            total_filas = procesadas
+            if not self.cancelada:
+                if self.sesion:
+                    self.confirmar()
+                checkpoint.eliminar()
+            
+            self.mostrar_resumen(total_filas)
             
             return self.resultados
             
@@ -404,19 +1588,41 @@ class ImportadorCSV:
             if self.conn:
                 self.conn.rollback()
             raise
+        
+        finally:
+            # También si falla o se cancela: libera las sentencias preparadas en el servidor
+            if self.escritor:
+                self.escritor.cerrar()
+            if self.sesion:
+                self.sesion.restaurar()
+                self.sesion = None
 
 
 class InterfazImportador:
     """Interfaz gráfica para el importador"""
     
-    def __init__(self):
+    # Cada cuánto se consulta la cola de progreso de la importación en segundo plano
+    INTERVALO_REFRESCO_MS = 100
+    
+    # (texto en pantalla, regla de ColapsadorDuplicados)
+    OPCIONES_DUPLICADOS = [
+        ("Enviar todas las filas", None),
+        ("Gana la última aparición", 'ultimo'),
+        ("Gana la primera aparición", 'primero'),
+        ("Combinar valores no nulos", 'combinar'),
+    ]
+    
+    def __init__(self, reanudar: bool = False):
         self.root = tk.Tk()
         self.root.title("Importador de Clientes CSV → MySQL")
-        self.root.geometry("700x550")
+        self.root.geometry("760x770")
         self.root.resizable(False, False)
         
         self.importador = ImportadorCSV()
         self.archivo_seleccionado = None
+        self.reanudar_inicial = reanudar
+        self.tarea = None
+        self.medidor = None
         
         self.crear_interfaz()
     
@@ -506,6 +1712,56 @@ class InterfazImportador:
             value="sobrescribir"
         ).pack(anchor="w", pady=2)
         
+        tk.Radiobutton(
+            frame_opciones, 
+            text="Upsert en servidor (sobrescribir vía ON DUPLICATE KEY, requiere migración 009)", 
+            variable=self.modo_var, 
+            value="upsert"
+        ).pack(anchor="w", pady=2)
+        
+        self.carga_masiva_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            frame_opciones,
+            text="Carga masiva con LOAD DATA (archivos de millones de filas)",
+            variable=self.carga_masiva_var
+        ).pack(anchor="w", pady=(8, 2))
+        
+        self.sesion_masiva_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            frame_opciones,
+            text="Sesión de carga masiva (sin UNIQUE/FOREIGN_KEY_CHECKS, verifica integridad al final)",
+            variable=self.sesion_masiva_var
+        ).pack(anchor="w", pady=2)
+        
+        frame_workers = tk.Frame(frame_opciones)
+        frame_workers.pack(anchor="w", pady=2)
+        tk.Label(frame_workers, text="Workers paralelos (1 = sin paralelismo):").pack(side="left")
+        self.workers_var = tk.IntVar(value=1)
+        tk.Spinbox(
+            frame_workers,
+            from_=1,
+            to=8,
+            width=4,
+            textvariable=self.workers_var
+        ).pack(side="left", padx=5)
+        
+        frame_duplicados = tk.Frame(frame_opciones)
+        frame_duplicados.pack(anchor="w", pady=2)
+        tk.Label(frame_duplicados, text="Teléfonos repetidos en el archivo:").pack(side="left")
+        self.duplicados_var = tk.StringVar(value=self.OPCIONES_DUPLICADOS[0][0])
+        tk.OptionMenu(
+            frame_duplicados,
+            self.duplicados_var,
+            *[texto for texto, _ in self.OPCIONES_DUPLICADOS]
+        ).pack(side="left", padx=5)
+        
+        self.reanudar_var = tk.BooleanVar(value=self.reanudar_inicial)
+        tk.Checkbutton(
+            frame_opciones,
+            text="Reanudar desde el último checkpoint del archivo (si existe)",
+            variable=self.reanudar_var
+        ).pack(anchor="w", pady=2)
+        
         # Frame de progreso
         frame_progreso = tk.LabelFrame(self.root, text="📈 Progreso", padx=10, pady=10)
         frame_progreso.pack(padx=20, pady=10, fill="x")
@@ -520,6 +1776,9 @@ class InterfazImportador:
         )
         self.barra_progreso.pack(pady=5)
         
+        self.velocidad_label = tk.Label(frame_progreso, text="", fg="gray")
+        self.velocidad_label.pack()
+        
         # Frame de botones
         frame_botones = tk.Frame(self.root)
         frame_botones.pack(pady=15)
@@ -538,6 +1797,33 @@ class InterfazImportador:
         )
         self.btn_importar.pack(side="left", padx=5)
         
+        # Botón simular (dry-run, no escribe en la BD)
+        self.btn_simular = tk.Button(
+            frame_botones, 
+            text="🧪 SIMULAR",
+            command=self.iniciar_simulacion,
+            bg="#6c757d",
+            fg="white",
+            font=("Arial", 12, "bold"),
+            padx=20,
+            pady=10,
+            state="disabled"
+        )
+        self.btn_simular.pack(side="left", padx=5)
+        
+        # Botón cancelar (se detiene después de confirmar el lote en curso)
+        self.btn_cancelar = tk.Button(
+            frame_botones, 
+            text="⏹️ CANCELAR",
+            command=self.cancelar_importacion,
+            bg="#ffc107",
+            font=("Arial", 12, "bold"),
+            padx=20,
+            pady=10,
+            state="disabled"
+        )
+        self.btn_cancelar.pack(side="left", padx=5)
+        
         # Botón cerrar
         btn_cerrar = tk.Button(
             frame_botones, 
@@ -568,16 +1854,61 @@ class InterfazImportador:
             nombre_archivo = os.path.basename(archivo)
             self.archivo_label.config(text=f"✅ {nombre_archivo}", fg="green")
             self.btn_importar.config(state="normal")
+            self.btn_simular.config(state="normal")
             logger.info(f"📁 Archivo seleccionado: {archivo}")
     
     def actualizar_progreso(self, porcentaje: float, actual: int, total: int):
-        """Actualizar barra de progreso"""
+        """Actualizar barra de progreso, velocidad y tiempo restante"""
         self.barra_progreso['value'] = porcentaje
         self.progreso_label.config(
             text=f"Procesando: {actual}/{total} ({porcentaje:.1f}%)",
             fg="blue"
         )
+        self.velocidad_label.config(text=self.medidor.texto(actual, total))
+    
+    def iniciar_simulacion(self):
+        """Simular la importación con el modo elegido (no escribe en la BD)"""
+        if not self.archivo_seleccionado:
+            messagebox.showwarning("Advertencia", "Selecciona un archivo CSV primero")
+            return
+        
+        modo = self.modo_var.get()
+        self.btn_simular.config(state="disabled")
+        self.progreso_label.config(text="🧪 Simulando importación...", fg="blue")
         self.root.update_idletasks()
+        
+        try:
+            # La simulación colapsa el archivo en tablas temporales cargadas con LOAD DATA LOCAL
+            if not self.importador.conectar_bd(self.host_entry.get(), int(self.puerto_entry.get()),
+                                               self.user_entry.get(), self.password_entry.get(),
+                                               self.db_entry.get(), carga_masiva=True):
+                return
+            
+            plan = self.importador.planificar_csv(self.archivo_seleccionado, modo=modo)
+            
+            cambios = "\n".join(f"  • {columna}: {cantidad}"
+                                for columna, cantidad in plan['cambios_por_columna'].items())
+            mensaje = (
+                f"🧪 Simulación en modo '{modo}' (no se escribió nada)\n\n"
+                f"Se insertarían:   {plan['insertados']}\n"
+                f"Se actualizarían: {plan['actualizados']}\n"
+                f"Duplicados:       {plan['duplicados']}\n"
+                f"Rechazadas:       {plan['errores']}\n\n"
+                f"Clientes con cambios: {plan['clientes_con_cambios']}\n"
+                f"{cambios}\n\n"
+                f"Detalle guardado en:\n{plan['archivo_detalle']}"
+            )
+            messagebox.showinfo("Simulación Completada", mensaje)
+            self.progreso_label.config(text="🧪 Simulación completada", fg="green")
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Error durante la simulación:\n{str(e)}")
+            self.progreso_label.config(text="❌ Error en simulación", fg="red")
+            logger.error(f"❌ Error: {e}")
+        
+        finally:
+            self.importador.desconectar_bd()
+            self.btn_simular.config(state="normal")
     
     def iniciar_importacion(self):
         """Iniciar proceso de importación"""
@@ -592,6 +1923,11 @@ class InterfazImportador:
         password = self.password_entry.get()
         database = self.db_entry.get()
         modo = self.modo_var.get()
+        carga_masiva = self.carga_masiva_var.get()
+        sesion_masiva = self.sesion_masiva_var.get()
+        workers = self.workers_var.get()
+        reanudar = self.reanudar_var.get()
+        duplicados = dict(self.OPCIONES_DUPLICADOS)[self.duplicados_var.get()]
         
         # Confirmar
         respuesta = messagebox.askyesno(
@@ -604,35 +1940,93 @@ class InterfazImportador:
         if not respuesta:
             return
         
-        # Deshabilitar botón
+        # Conectar a BD
+        if not self.importador.conectar_bd(host, puerto, usuario, password, database,
+                                           carga_masiva=carga_masiva):
+            return
+        
+        # Deshabilitar botones mientras importa
         self.btn_importar.config(state="disabled")
+        self.btn_simular.config(state="disabled")
         self.barra_progreso['value'] = 0
+        self.progreso_label.config(text="🚀 Importando...", fg="blue")
+        self.velocidad_label.config(text="")
         
-        try:
-            # Conectar a BD
-            if not self.importador.conectar_bd(host, puerto, usuario, password, database):
+        # La importación corre en otro hilo; la ventana solo consulta su cola de progreso
+        self.medidor = MedidorVelocidad()
+        self.tarea = TareaImportacion(
+            self.importador.importar_csv,
+            self.archivo_seleccionado,
+            modo=modo,
+            carga_masiva=carga_masiva,
+            workers=workers,
+            reanudar=reanudar,
+            duplicados=duplicados,
+            sesion_masiva=sesion_masiva
+        )
+        self.tarea.iniciar()
+        # Cancelar entre lotes solo aplica a la importación fila por fila con commits por lote
+        if not carga_masiva and workers <= 1 and not sesion_masiva:
+            self.btn_cancelar.config(state="normal")
+        self.root.after(self.INTERVALO_REFRESCO_MS, self.revisar_importacion)
+    
+    def cancelar_importacion(self):
+        """Pedir que la importación se detenga después de confirmar el lote en curso"""
+        if self.tarea:
+            self.tarea.cancelar.set()
+            self.btn_cancelar.config(state="disabled")
+            self.progreso_label.config(text="⏹️ Cancelando al terminar el lote en curso...", fg="orange")
+    
+    def revisar_importacion(self):
+        """Procesar los mensajes de la importación en segundo plano (se reprograma con after)"""
+        progreso = None
+        for tipo, valor in self.tarea.mensajes():
+            if tipo == 'progreso':
+                # Solo importa el último reporte desde el refresco anterior
+                progreso = valor
+            elif tipo == 'fin':
+                self.finalizar_importacion(valor)
+                return
+            else:
+                self.finalizar_importacion(None, error=valor)
                 return
+        
+        if progreso and not self.tarea.cancelar.is_set():
+            self.actualizar_progreso(*progreso)
+        self.root.after(self.INTERVALO_REFRESCO_MS, self.revisar_importacion)
+    
+    def finalizar_importacion(self, resultados: Dict, error: Exception = None):
+        """Mostrar el resultado de la importación (en el hilo de la interfaz)"""
+        try:
+            if error:
+                raise error
             
-            # Importar
-            resultados = self.importador.importar_csv(
-                self.archivo_seleccionado,
-                modo=modo,
-                callback=self.actualizar_progreso
-            )
+            cancelada = self.importador.cancelada
+            if cancelada:
+                encabezado = "⏹️ Importación cancelada (lotes confirmados hasta el momento)"
+            else:
+                encabezado = "✅ Importación completada"
             
             # Mostrar resultado
             mensaje = (
-                f"✅ Importación completada\n\n"
+                f"{encabezado}\n\n"
                 f"Insertados:   {resultados['insertados']}\n"
                 f"Actualizados: {resultados['actualizados']}\n"
                 f"Duplicados:   {resultados['duplicados']}\n"
                 f"Errores:      {resultados['errores']}\n\n"
                 f"Log guardado en:\n{log_file}"
             )
+            if self.importador.registro.total_rechazos():
+                mensaje += f"\n\nFilas rechazadas en:\n{rechazos_file}"
+            if cancelada:
+                mensaje += "\n\nPara continuar, importa el mismo archivo con 'Reanudar' marcado"
             
-            messagebox.showinfo("Importación Completada", mensaje)
+            messagebox.showinfo("Importación Cancelada" if cancelada else "Importación Completada", mensaje)
             
-            self.progreso_label.config(text="✅ Importación completada", fg="green")
+            if cancelada:
+                self.progreso_label.config(text="⏹️ Importación cancelada", fg="orange")
+            else:
+                self.progreso_label.config(text="✅ Importación completada", fg="green")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error durante la importación:\n{str(e)}")
@@ -640,15 +2034,70 @@ class InterfazImportador:
             logger.error(f"❌ Error: {e}")
         
         finally:
-            # Desconectar y rehabilitar botón
+            # Desconectar y rehabilitar botones
             self.importador.desconectar_bd()
+            self.tarea = None
             self.btn_importar.config(state="normal")
+            self.btn_simular.config(state="normal")
+            self.btn_cancelar.config(state="disabled")
     
     def ejecutar(self):
         """Ejecutar la aplicación"""
         self.root.mainloop()
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Importador de clientes CSV/XLSX → MySQL")
+    parser.add_argument('archivo', nargs='?',
+                        help="Archivo a importar sin interfaz gráfica (sin él se abre la interfaz)")
+    parser.add_argument('--modo', default='insertar',
+                        choices=['insertar', 'actualizar', 'sobrescribir', 'upsert'])
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=3308)
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--database', default='albru')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--carga-masiva', action='store_true')
+    parser.add_argument('--resume', action='store_true',
+                        help="Reanudar desde el último checkpoint del archivo")
+    parser.add_argument('--sesion-masiva', action='store_true',
+                        help="Cargar sin UNIQUE/FOREIGN_KEY_CHECKS ni autocommit y verificar integridad al final")
+    parser.add_argument('--duplicados', choices=ColapsadorDuplicados.REGLAS,
+                        help="Colapsar teléfonos repetidos en el archivo antes de escribir")
+    parser.add_argument('--plan', action='store_true',
+                        help="Solo simular (dry-run): reportar qué haría la importación sin escribir")
+    args = parser.parse_args()
+    
+    # Logging asíncrono: archivo y consola se escriben desde un hilo aparte
+    global log_file, rechazos_file
+    log_file, rechazos_file = configurar_logging('import_clientes')
+    
+    if not args.archivo:
+        app = InterfazImportador(reanudar=args.resume)
+        app.ejecutar()
+        return
+    
+    importador = ImportadorCSV()
+    if not importador.conectar_bd(args.host, args.port, args.user, args.password,
+                                  args.database, carga_masiva=args.carga_masiva or args.plan):
+        raise SystemExit(1)
+    try:
+        if args.plan:
+            importador.planificar_csv(args.archivo, modo=args.modo)
+            return
+        importador.importar_csv(
+            args.archivo,
+            modo=args.modo,
+            carga_masiva=args.carga_masiva,
+            workers=args.workers,
+            reanudar=args.resume,
+            duplicados=args.duplicados,
+            sesion_masiva=args.sesion_masiva
+        )
+    finally:
+        importador.desconectar_bd()
+
+
 if __name__ == "__main__":
-    app = InterfazImportador()
-    app.ejecutar()
+    main()
@@ -6,46 +6,316 @@ Autor: Claude AI
 Fecha: 2025-11-21
 """
 
+import numpy as np
 import pandas as pd
 import mysql.connector
 from mysql.connector import Error
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+import argparse
 import os
-from datetime import datetime
 import logging
 from typing import Dict, List, Tuple
 from pathlib import Path
 
-# Configurar logging
-log_dir = Path(__file__).parent / "logs"
-log_dir.mkdir(exist_ok=True)
-log_file = log_dir / f"import_historial_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+from checkpoint_importacion import CheckpointImportacion
+from esquema_columnas import EsquemaTabla
+from lector_archivos import LectorArchivo
+from limpieza_columnas import LimpiadorColumnas
+from registro_importacion import RegistroFilas, configurar_logging
+from sentencias_preparadas import CacheSentencias, trozos
+from sesion_masiva import SesionMasiva
+from tarea_importacion import MedidorVelocidad, TareaImportacion
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file, encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+log_dir = Path(__file__).parent / "logs"
+# Archivos de log y de rechazos: los define main() con configurar_logging (no al importar el módulo)
+log_file = rechazos_file = None
 
 logger = logging.getLogger(__name__)
 
 
+class ReferenciasHistorial:
+    """
+    Ids de clientes y usuarios existentes, precargados para validar en memoria
+    
+    Una pasada previa (solo cliente_id y usuario_id) junta los ids distintos del
+    archivo y los busca con pocas consultas WHERE id IN (...) por bloques; si el
+    archivo trae demasiados ids distintos se lee directamente la columna id
+    completa de la tabla. Los ids existentes quedan en arreglos NumPy ordenados
+    (8 bytes por id).
+    
+    Cada lote pasa por filtrar(): campos requeridos, ids válidos y un anti-join
+    vectorizado contra los ids existentes. Las filas rechazadas van al archivo de
+    rechazos del RegistroFilas (el mismo que los errores SQL) con los valores
+    originales del archivo y su motivo, y procesar_fila solo recibe filas válidas.
+    """
+    
+    # Motivos de rechazo de filtrar(), en orden de prioridad: (motivo, mensaje, contador)
+    MOTIVOS = {
+        'faltan_requeridos': ("⚠️ Fila %s: Faltan campos requeridos, omitida", 'omitidos'),
+        'id_invalido': ("❌ Fila %s: cliente_id o usuario_id no es un número entero", 'errores'),
+        'cliente_inexistente': ("⚠️ Fila %s: Cliente ID %s no existe, omitida", 'omitidos'),
+        'usuario_inexistente': ("⚠️ Fila %s: Usuario ID %s no existe, omitida", 'omitidos'),
+    }
+    
+    # columna del archivo → (tabla referenciada, motivo de rechazo si el id no existe)
+    REFERENCIAS = {
+        'cliente_id': ('clientes', 'cliente_inexistente'),
+        'usuario_id': ('usuarios', 'usuario_inexistente'),
+    }
+    
+    # Ids por consulta WHERE id IN (...)
+    TAMANO_CONSULTA = 1000
+    
+    # Con más ids distintos que esto, leer toda la columna id es más barato que consultarlos
+    UMBRAL_TABLA_COMPLETA = 50000
+    
+    # Filas por lote de la pasada previa (solo se leen dos columnas)
+    TAMANO_LOTE_PREVIO = 10000
+    
+    def __init__(self, importador: 'ImportadorHistorial'):
+        self.importador = importador
+        vacio = np.array([], dtype=np.int64)
+        # columna → ids existentes y ids ya consultados (ordenados, sin repetidos)
+        self.existentes = {columna: vacio for columna in self.REFERENCIAS}
+        self.consultados = {columna: vacio for columna in self.REFERENCIAS}
+        # columnas cuya tabla se leyó completa (no hace falta consultar más ids)
+        self.completas = set()
+        self.consultas = 0
+        self.rechazadas = 0
+    
+    @staticmethod
+    def ids_numericos(serie: pd.Series) -> pd.Series:
+        """Ids como float a partir de los valores del archivo (NaN si no son numéricos, sin redondear)"""
+        return pd.to_numeric(LimpiadorColumnas.a_texto(serie), errors='coerce').astype('float64')
+    
+    @staticmethod
+    def ids_distintos(numericos: pd.Series) -> np.ndarray:
+        """Ids enteros distintos (0, los no numéricos o con decimales se rechazan en filtrar)"""
+        valores = numericos.dropna().to_numpy()
+        return np.unique(valores[(valores == np.floor(valores)) & (valores != 0)].astype(np.int64))
+    
+    def precargar(self, archivo_path: str, separador: str):
+        """Pasada previa: ids distintos del archivo y cuáles existen en la BD"""
+        columnas = list(self.REFERENCIAS)
+        distintos = {columna: [] for columna in columnas}
+        lector = LectorArchivo(archivo_path, separador, self.TAMANO_LOTE_PREVIO, solo_columnas=columnas)
+        for lote in lector:
+            for columna in columnas:
+                distintos[columna].append(self.ids_distintos(self.ids_numericos(lote[columna])))
+        
+        for columna in columnas:
+            ids = np.unique(np.concatenate(distintos[columna])) if distintos[columna] else self.consultados[columna]
+            tabla = self.REFERENCIAS[columna][0]
+            if len(ids) > self.UMBRAL_TABLA_COMPLETA:
+                self.cargar_tabla(columna)
+            else:
+                self.consultar(columna, ids)
+            logger.info(f"🗂️ {columna}: {len(ids)} ids distintos en el archivo, "
+                        f"{len(np.intersect1d(ids, self.existentes[columna]))} existen en {tabla}")
+        logger.info(f"🗂️ Referencias precargadas con {self.consultas} consultas")
+    
+    def cargar_tabla(self, columna: str):
+        """Leer todos los ids de la tabla referenciada"""
+        tabla = self.REFERENCIAS[columna][0]
+        cursor = self.importador.conn.cursor()
+        try:
+            cursor.execute(f"SELECT id FROM {tabla} ORDER BY id")
+            ids = np.fromiter((fila[0] for fila in cursor), dtype=np.int64)
+        finally:
+            cursor.close()
+        self.consultas += 1
+        self.existentes[columna] = np.unique(ids)
+        self.completas.add(columna)
+    
+    def consultar(self, columna: str, ids: np.ndarray):
+        """Buscar en la BD los ids aún no consultados, por bloques de TAMANO_CONSULTA"""
+        if columna in self.completas:
+            return
+        nuevos = np.setdiff1d(ids, self.consultados[columna], assume_unique=True)
+        if not len(nuevos):
+            return
+        
+        tabla = self.REFERENCIAS[columna][0]
+        encontrados = []
+        for inicio in range(0, len(nuevos), self.TAMANO_CONSULTA):
+            bloque = nuevos[inicio:inicio + self.TAMANO_CONSULTA].tolist()
+            placeholders = ', '.join(['%s'] * len(bloque))
+            self.importador.cursor.execute(
+                f"SELECT id FROM {tabla} WHERE id IN ({placeholders})", bloque
+            )
+            encontrados.extend(fila['id'] for fila in self.importador.cursor.fetchall())
+            self.consultas += 1
+        
+        self.consultados[columna] = np.union1d(self.consultados[columna], nuevos)
+        self.existentes[columna] = np.union1d(self.existentes[columna],
+                                              np.array(encontrados, dtype=np.int64))
+    
+    def filtrar(self, limpio: pd.DataFrame, lote: pd.DataFrame) -> pd.DataFrame:
+        """
+        Separar las filas inválidas de un lote ya limpio (todo vectorizado)
+        
+        Cada fila recibe el primer motivo que cumpla, en el orden de MOTIVOS: falta
+        un campo requerido (o el id es 0), el id no es un entero, o no hay fila en
+        clientes / usuarios con ese id (anti-join contra los ids precargados).
+        
+        Args:
+            limpio: Lote ya limpio por el LimpiadorColumnas
+            lote: El mismo lote como se leyó del archivo (para el registro de rechazos)
+        
+        Returns:
+            Las filas aceptadas de limpio
+        """
+        requeridas = [col for col in self.importador.COLUMNAS_REQUERIDAS if col not in self.REFERENCIAS]
+        motivo = pd.Series(None, index=limpio.index, dtype=object)
+        
+        def marcar(mascara: pd.Series, nombre: str):
+            motivo[mascara & motivo.isna()] = nombre
+        
+        # Los ids se validan sobre los valores del archivo: la limpieza 'entero' ya
+        # redondeó '12.7' a 13 y dejó 'abc' como nulo
+        originales = lote.loc[limpio.index]
+        textos = {columna: LimpiadorColumnas.a_texto(originales[columna]) for columna in self.REFERENCIAS}
+        ids = {columna: self.ids_numericos(originales[columna]) for columna in self.REFERENCIAS}
+        faltan = ~limpio[requeridas].notna().all(axis=1)
+        for columna, numericos in ids.items():
+            faltan |= textos[columna].isna() | numericos.eq(0)
+        marcar(faltan, 'faltan_requeridos')
+        for numericos in ids.values():
+            marcar(~numericos.eq(np.floor(numericos)), 'id_invalido')
+        
+        for columna, (_, nombre) in self.REFERENCIAS.items():
+            self.consultar(columna, self.ids_distintos(ids[columna][motivo.isna()]))
+            marcar(~ids[columna].isin(self.existentes[columna]), nombre)
+        
+        rechazada = motivo.notna()
+        if rechazada.any():
+            self.rechazar(limpio[rechazada], lote.loc[limpio.index[rechazada]], motivo[rechazada])
+        
+        # Ids ya validados como enteros ('5.0' en un archivo de texto → 5)
+        aceptadas = limpio[~rechazada].copy()
+        for columna, numericos in ids.items():
+            aceptadas[columna] = numericos[~rechazada].astype(np.int64).astype(object)
+        return aceptadas
+    
+    def rechazar(self, filas: pd.DataFrame, originales: pd.DataFrame, motivos: pd.Series):
+        """Contar y registrar las filas rechazadas de un lote (con sus valores originales)"""
+        importador = self.importador
+        # Celdas vacías como None (NaN no es JSON válido en el archivo de rechazos)
+        originales = originales.astype(object).where(originales.notna(), None)
+        for (indice, fila), (_, original), motivo in zip(LimpiadorColumnas.iterar_filas(filas),
+                                                          LimpiadorColumnas.iterar_filas(originales), motivos):
+            mensaje, _ = self.MOTIVOS[motivo]
+            referencia = [col for col, (_, nombre) in self.REFERENCIAS.items() if nombre == motivo]
+            argumentos = (indice + 2, fila[referencia[0]]) if referencia else (indice + 2,)
+            importador.registro.rechazo(indice + 2, motivo, original, mensaje, *argumentos,
+                                        nivel=logging.ERROR if motivo == 'id_invalido' else logging.WARNING)
+        for motivo, cantidad in motivos.value_counts().items():
+            importador.resultados[self.MOTIVOS[motivo][1]] += int(cantidad)
+        self.rechazadas += len(filas)
+    
+    def resumen(self):
+        if self.rechazadas:
+            logger.info(f"🚫 Filas rechazadas antes de escribir: {self.rechazadas}")
+
+
+class EscritorHistorial:
+    """
+    Escritor por lotes para la tabla historial_cliente
+    
+    Acumula las filas ya validadas y las envía como INSERT multi-fila agrupadas
+    por firma de columnas (las columnas nulas se omiten para que apliquen los
+    defaults de la BD). Cada grupo se parte con sentencias_preparadas.trozos y
+    cada sentencia se prepara y cachea por forma, igual que en EscritorClientes.
+    
+    Si una sentencia falla (InnoDB la revierte completa) se parte en dos mitades
+    y se reintenta cada una, hasta aislar las filas inválidas: una fila mala
+    cuesta unas pocas sentencias más, no el lote ni un reintento fila por fila.
+    """
+    
+    def __init__(self, importador: 'ImportadorHistorial', tamano_batch: int = 500):
+        self.importador = importador
+        self.tamano_batch = tamano_batch
+        self.sentencias = CacheSentencias(importador.conn)
+        self.filas = []  # (indice, cliente_id, datos)
+        self.biseccionadas = 0
+    
+    def agregar(self, indice: int, cliente_id: int, datos: Dict):
+        """Encolar un INSERT de historial"""
+        self.filas.append((indice, cliente_id, datos))
+        if len(self.filas) >= self.tamano_batch:
+            self.flush()
+    
+    def flush(self):
+        """Enviar a la BD todo lo pendiente (sin commit)"""
+        filas, self.filas = self.filas, []
+        grupos = {}
+        for fila in filas:
+            grupos.setdefault(tuple(fila[2]), []).append(fila)
+        for columnas, grupo_completo in grupos.items():
+            for grupo in trozos(grupo_completo):
+                self._insertar_trozo(columnas, grupo)
+    
+    @staticmethod
+    def _query_insert(columnas: Tuple[str, ...], num_filas: int) -> str:
+        fila = '(' + ', '.join(['%s'] * len(columnas)) + ')'
+        return (f"INSERT INTO historial_cliente ({', '.join(columnas)}) "
+                f"VALUES {', '.join([fila] * num_filas)}")
+    
+    def _insertar_trozo(self, columnas: Tuple[str, ...], grupo: List):
+        importador = self.importador
+        valores = [datos[col] for _, _, datos in grupo for col in columnas]
+        try:
+            self.sentencias.ejecutar(('INSERT', columnas, len(grupo)),
+                                     lambda: self._query_insert(columnas, len(grupo)), valores)
+        except Error as e:
+            if len(grupo) == 1:
+                indice, _, datos = grupo[0]
+                importador.resultados['errores'] += 1
+                importador.registro.rechazo(indice + 2, 'error_sql', datos,
+                                            "❌ Fila %s: Error SQL - %s", indice + 2, e, nivel=logging.ERROR)
+                return
+            self.biseccionadas += 1
+            logger.debug(f"Sentencia de {len(grupo)} filas falló ({e}), reintentando por mitades")
+            mitad = len(grupo) // 2
+            self._insertar_trozo(columnas, grupo[:mitad])
+            self._insertar_trozo(columnas, grupo[mitad:])
+            return
+        
+        importador.resultados['insertados'] += len(grupo)
+        for indice, cliente_id, _ in grupo:
+            importador.registro.detalle('insertado', "✅ Fila %s: Gestión insertada (cliente: %s)",
+                                        indice + 2, cliente_id)
+    
+    def resumen(self):
+        self.sentencias.resumen()
+        if self.biseccionadas:
+            logger.info(f"✂️ Sentencias partidas por error: {self.biseccionadas}")
+    
+    def cerrar(self):
+        """Cerrar las sentencias preparadas de la importación"""
+        self.sentencias.cerrar()
+
+
 class ImportadorHistorial:
     """Clase para importar CSVs de historial de gestiones a MySQL"""
     
     # Mapeo de columnas CSV a columnas de BD
     COLUMNAS_REQUERIDAS = ['cliente_id', 'usuario_id', 'accion']
     
+    # Tipos por defecto: al conectar se reemplazan por los del esquema de la tabla
     COLUMNAS_FECHA = ['created_at']
     
     def __init__(self):
         """Inicializar conexión a BD"""
         self.conn = None
         self.cursor = None
+        self.limpiador = LimpiadorColumnas(self.COLUMNAS_FECHA)
+        self.registro = RegistroFilas('historial_cliente', logger)
+        self.cancelada = False
+        self.escritor = None
+        self.referencias = ReferenciasHistorial(self)
+        self.sesion = None
         self.resultados = {
             'insertados': 0,
             'errores': 0,
@@ -67,6 +337,7 @@ class ImportadorHistorial:
             )
             self.cursor = self.conn.cursor(dictionary=True)
             logger.info(f"✅ Conectado a BD: {database} en {host}:{port}")
+            self.cargar_esquema()
             return True
         except Error as e:
             logger.error(f"❌ Error al conectar a BD: {e}")
@@ -74,6 +345,12 @@ class ImportadorHistorial:
                                f"No se pudo conectar a la base de datos:\n{str(e)}")
             return False
     
+    def cargar_esquema(self):
+        """Leer una vez las columnas de historial_cliente y configurar el plan de conversión"""
+        esquema = EsquemaTabla.leer(self.cursor, 'historial_cliente')
+        if esquema:
+            self.limpiador.configurar_esquema(esquema.tipos(), esquema.longitudes())
+    
     def desconectar_bd(self):
         """Cerrar conexión a BD"""
         if self.cursor:
@@ -82,195 +359,93 @@ class ImportadorHistorial:
             self.conn.close()
         logger.info("🔌 Desconectado de BD")
     
-    def leer_archivo(self, archivo_path: str, separador: str = ';') -> pd.DataFrame:
-        """Leer archivo CSV o XLSX con pandas"""
+    def leer_archivo(self, archivo_path: str, separador: str = ';',
+                     tamano_lote: int = 1000) -> LectorArchivo:
+        """Abrir archivo CSV o XLSX para leerlo por lotes (sin cargarlo completo)"""
         try:
-            # Detectar extensión del archivo
-            extension = archivo_path.lower().split('.')[-1]
+            lector = LectorArchivo(archivo_path, separador, tamano_lote)
+            logger.info(f"📊 Archivo abierto: ~{lector.total_estimado()} filas, lotes de {tamano_lote}")
             
-            if extension == 'xlsx' or extension == 'xls':
-                # Leer Excel
-                df = pd.read_excel(archivo_path, engine='openpyxl')
-                logger.info(f"✅ Excel leído correctamente")
-            else:
-                # Leer CSV con diferentes encodings
-                encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-                df = None
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(archivo_path, sep=separador, encoding=encoding)
-                        logger.info(f"✅ CSV leído con encoding: {encoding}")
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                
-                if df is None:
-                    raise ValueError("No se pudo leer el archivo con ningún encoding conocido")
-            
-            logger.info(f"📊 Archivo cargado: {len(df)} filas, {len(df.columns)} columnas")
-            logger.info(f"📋 Columnas encontradas: {', '.join(df.columns.tolist())}")
+            # Validar columnas requeridas y compilar el plan de conversión del encabezado
+            # (antes de procesar cualquier fila)
+            lector.validar_columnas(self.COLUMNAS_REQUERIDAS)
+            self.limpiador.reiniciar()
+            self.limpiador.validar_encabezado(lector.columnas, self.COLUMNAS_REQUERIDAS)
             
-            # Validar columnas requeridas
-            columnas_faltantes = [col for col in self.COLUMNAS_REQUERIDAS 
-                                 if col not in df.columns]
-            if columnas_faltantes:
-                raise ValueError(f"Columnas requeridas faltantes: {', '.join(columnas_faltantes)}")
-            
-            return df
+            return lector
         
         except Exception as e:
             logger.error(f"❌ Error al leer archivo: {e}")
             raise
     
-    def limpiar_valor(self, valor, tipo_columna: str = 'texto'):
-        """Limpiar y convertir valores según el tipo de columna"""
-        # Manejar valores nulos/vacíos
-        if pd.isna(valor) or valor == '' or valor == 'NULL' or valor is None:
-            return None
-        
-        # Convertir a string y limpiar espacios
-        valor_str = str(valor).strip()
-        
-        if tipo_columna == 'fecha':
-            return self.convertir_fecha(valor_str)
-        else:
-            # Texto: reemplazar valores vacíos por None
-            return valor_str if valor_str and valor_str.upper() != 'NULL' else None
-    
-    def convertir_fecha(self, fecha_str: str):
-        """Convertir string de fecha a formato MySQL (YYYY-MM-DD HH:MM:SS)"""
-        if not fecha_str or fecha_str.upper() == 'NULL':
-            return None
-        
-        # Formatos comunes de fecha
-        formatos = [
-            '%Y/%m/%d',           # 2025/01/15
-            '%Y-%m-%d',           # 2025-01-15
-            '%d/%m/%Y',           # 15/01/2025
-            '%d-%m-%Y',           # 15-01-2025
-            '%Y/%m/%d %H:%M:%S',  # 2025/01/15 14:30:00
-            '%Y-%m-%d %H:%M:%S',  # 2025-01-15 14:30:00
-        ]
-        
-        for formato in formatos:
-            try:
-                dt = datetime.strptime(fecha_str, formato)
-                return dt.strftime('%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                continue
-        
-        logger.warning(f"⚠️ No se pudo convertir fecha: {fecha_str}")
-        return None
-    
-    def verificar_cliente_existe(self, cliente_id: int) -> bool:
-        """Verificar si existe el cliente en la tabla clientes"""
-        try:
-            query = "SELECT id FROM clientes WHERE id = %s LIMIT 1"
-            self.cursor.execute(query, (cliente_id,))
-            resultado = self.cursor.fetchone()
-            return resultado is not None
-        except Error as e:
-            logger.error(f"❌ Error al verificar cliente: {e}")
-            return False
-    
-    def verificar_usuario_existe(self, usuario_id: int) -> bool:
-        """Verificar si existe el usuario en la tabla usuarios"""
-        try:
-            query = "SELECT id FROM usuarios WHERE id = %s LIMIT 1"
-            self.cursor.execute(query, (usuario_id,))
-            resultado = self.cursor.fetchone()
-            return resultado is not None
-        except Error as e:
-            logger.error(f"❌ Error al verificar usuario: {e}")
-            return False
-    
-    def procesar_fila(self, fila: pd.Series, indice: int) -> bool:
-        """Procesar una fila del CSV e insertar en historial_cliente"""
+    def procesar_fila(self, fila: Dict, indice: int) -> bool:
+        """
+        Procesar una fila ya limpia y validada (ver ReferenciasHistorial.filtrar)
+        e insertarla en historial_cliente
+        """
         try:
-            # Extraer datos y limpiar
-            datos = {}
-            
-            for columna in fila.index:
-                valor = fila[columna]
-                
-                # Determinar tipo de columna
-                if columna in self.COLUMNAS_FECHA:
-                    tipo = 'fecha'
-                else:
-                    tipo = 'texto'
-                
-                # Limpiar valor
-                valor_limpio = self.limpiar_valor(valor, tipo)
-                
-                # Agregar a datos
-                if valor_limpio is not None or columna in self.COLUMNAS_REQUERIDAS:
-                    datos[columna] = valor_limpio
-            
-            # Validar campos requeridos
-            if not all(datos.get(col) for col in self.COLUMNAS_REQUERIDAS):
-                logger.warning(f"⚠️ Fila {indice + 2}: Faltan campos requeridos, omitida")
-                self.resultados['omitidos'] += 1
-                return False
-            
-            cliente_id = int(datos['cliente_id'])
-            usuario_id = int(datos['usuario_id'])
-            
-            # Verificar que cliente y usuario existan
-            if not self.verificar_cliente_existe(cliente_id):
-                logger.warning(f"⚠️ Fila {indice + 2}: Cliente ID {cliente_id} no existe, omitida")
-                self.resultados['omitidos'] += 1
-                return False
+            # Las columnas nulas se omiten para que la BD aplique sus defaults
+            datos = {columna: valor for columna, valor in fila.items() if valor is not None}
+            for columna in ('cliente_id', 'usuario_id'):
+                datos[columna] = int(datos[columna])
+            cliente_id = datos['cliente_id']
             
-            if not self.verificar_usuario_existe(usuario_id):
-                logger.warning(f"⚠️ Fila {indice + 2}: Usuario ID {usuario_id} no existe, omitida")
-                self.resultados['omitidos'] += 1
-                return False
-            
-            # Construir INSERT
-            columnas = list(datos.keys())
-            valores = list(datos.values())
-            placeholders = ', '.join(['%s'] * len(columnas))
-            
-            query = f"""
-                INSERT INTO historial_cliente ({', '.join(columnas)})
-                VALUES ({placeholders})
-            """
-            
-            self.cursor.execute(query, valores)
-            self.resultados['insertados'] += 1
-            logger.info(f"✅ Fila {indice + 2}: Gestión insertada (cliente: {cliente_id})")
+            # El escritor la envía en un INSERT multi-fila (y cuenta insertados o errores)
+            self.escritor.agregar(indice, cliente_id, datos)
             
             return True
             
         except Error as e:
-            logger.error(f"❌ Fila {indice + 2}: Error SQL - {e}")
+            self.registro.rechazo(indice + 2, 'error_sql', fila,
+                                  "❌ Fila %s: Error SQL - %s", indice + 2, e, nivel=logging.ERROR)
             self.resultados['errores'] += 1
             return False
         except Exception as e:
-            logger.error(f"❌ Fila {indice + 2}: Error - {e}")
+            self.registro.rechazo(indice + 2, 'error', fila,
+                                  "❌ Fila %s: Error - %s", indice + 2, e, nivel=logging.ERROR)
             self.resultados['errores'] += 1
             return False
     
     def importar_csv(self, archivo_path: str, lote_size: int = 100, 
-                     callback=None) -> Dict:
+                     callback=None, reanudar: bool = False, cancelar=None,
+                     sesion_masiva: bool = False, tamano_batch: int = 500) -> Dict:
         """
         Importar CSV completo a la BD
         
         Args:
             archivo_path: Ruta del archivo CSV
-            lote_size: Tamaño de lote para commit
+            lote_size: Filas leídas, escritas y confirmadas por lote
             callback: Función para reportar progreso
+            reanudar: Continuar desde el checkpoint del archivo (si existe) en lugar del inicio
+            cancelar: threading.Event; si se activa, la importación se detiene después de
+                      confirmar el lote en curso (el checkpoint queda para reanudar).
+                      Con sesión masiva no hay lotes confirmados: se deshace toda la carga
+            sesion_masiva: Cargar sin autocommit, UNIQUE_CHECKS ni FOREIGN_KEY_CHECKS en una sola
+                           transacción: la integridad se verifica por conjuntos antes del COMMIT
+                           (rollback si hay problemas). No guarda checkpoints: no admite reanudar
+            tamano_batch: Filas pendientes del escritor antes de enviarlas (además se envían
+                          al final de cada lote, antes del commit)
         
         Returns:
             Dict con resultados del proceso
         """
+        if sesion_masiva and reanudar:
+            raise ValueError("La sesión masiva no guarda checkpoints (confirma todo al final): no admite reanudar")
+        
         try:
-            # Leer archivo (CSV o XLSX)
-            df = self.leer_archivo(archivo_path)
-            total_filas = len(df)
+            # Abrir archivo (CSV o XLSX) para leerlo por lotes de lote_size filas
+            lector = self.leer_archivo(archivo_path, tamano_lote=lote_size)
+            total_filas = lector.total_estimado()
+            self.cancelada = False
+            self.escritor = EscritorHistorial(self, tamano_batch)
             
-            logger.info(f"🚀 Iniciando importación: {total_filas} filas")
+            logger.info(f"🚀 Iniciando importación: ~{total_filas} filas")
+            
+            if sesion_masiva:
+                self.sesion = SesionMasiva(self.conn, ['historial_cliente'])
+                self.sesion.activar()
+            
+            self.registro.reiniciar(archivo_path)
             
             # Reset resultados
             self.resultados = {
@@ -279,24 +454,63 @@ class ImportadorHistorial:
                 'omitidos': 0
             }
             
-            # Procesar filas en lotes
-            for i, (indice, fila) in enumerate(df.iterrows()):
-                # Procesar fila
-                self.procesar_fila(fila, indice)
+            # Ids de clientes y usuarios del archivo resueltos antes de escribir (sin consulta por fila)
+            self.referencias = ReferenciasHistorial(self)
+            self.referencias.precargar(archivo_path, lector.separador)
+            
+            checkpoint = CheckpointImportacion(archivo_path, 'historial', 'insertar', log_dir / 'checkpoints')
+            estado = checkpoint.cargar() if reanudar else None
+            if estado:
+                lector.desde = estado['siguiente_fila']
+                lector.desde_byte = estado.get('posicion_byte') or 0
+                self.resultados = estado['resultados']
+            elif checkpoint.existe():
+                logger.warning("⚠️ Hay un checkpoint de este archivo: se importará desde el inicio "
+                               "(usa reanudar / --resume para continuar donde quedó)")
+            
+            # Cada lote se limpia (vectorizado), se escribe y se confirma antes de leer el siguiente
+            procesadas = lector.desde
+            for lote in lector:
+                limpio = self.referencias.filtrar(self.limpiador.limpiar(lote), lote)
+                for indice, fila in LimpiadorColumnas.iterar_filas(limpio):
+                    self.procesar_fila(fila, indice)
                 
-                # Commit cada lote
-                if (i + 1) % lote_size == 0:
+                # Commit del lote (con sesión masiva, todo se confirma junto al final)
+                self.escritor.flush()
+                procesadas = int(lote.index[-1]) + 1
+                total_filas = max(total_filas, procesadas)
+                if not self.sesion:
                     self.conn.commit()
-                    logger.info(f"💾 Commit de lote: {i + 1}/{total_filas}")
+                    checkpoint.guardar(procesadas, self.resultados, lector.posicion)
+                    logger.info(f"💾 Commit de lote: {procesadas}/{total_filas}")
                 
                 # Reportar progreso
                 if callback:
-                    progreso = ((i + 1) / total_filas) * 100
-                    callback(progreso, i + 1, total_filas)
+                    progreso = (procesadas / total_filas) * 100
+                    callback(progreso, procesadas, total_filas)
+                
+                if cancelar is not None and cancelar.is_set():
+                    self.cancelada = True
+                    if self.sesion:
+                        self.conn.rollback()
+                        logger.warning(f"⏹️ Importación cancelada en la fila {procesadas + 2}: "
+                                       f"la sesión masiva deshizo toda la carga (rollback)")
+                    else:
+                        logger.warning(f"⏹️ Importación cancelada después del lote confirmado "
+                                       f"(fila {procesadas + 2}); se puede reanudar desde el checkpoint")
+                    break
             
-            # Commit final
-            self.conn.commit()
-            logger.info(f"💾 Commit final")
+            total_filas = procesadas
+            if not self.cancelada:
+                if self.sesion:
+                    # Verificar antes del COMMIT: con problemas se deshace toda la carga
+                    problemas = self.sesion.confirmar()
+                    if problemas:
+                        raise RuntimeError(
+                            "Carga deshecha por problemas de integridad después de la sesión masiva: " +
+                            ", ".join(f"{restriccion} ({filas} filas)" for restriccion, filas in problemas.items())
+                        )
+                checkpoint.eliminar()
             
             # Resumen
             logger.info("=" * 60)
@@ -306,6 +520,14 @@ class ImportadorHistorial:
             logger.info(f"⏭️ Omitidos:   {self.resultados['omitidos']}")
             logger.info(f"❌ Errores:    {self.resultados['errores']}")
             logger.info(f"📁 Total:      {total_filas}")
+            self.limpiador.resumen()
+            self.referencias.resumen()
+            self.escritor.resumen()
+            if self.registro.contadores:
+                logger.info("📋 Eventos por fila:")
+                self.registro.resumen()
+            if self.registro.total_rechazos():
+                logger.info(f"📄 Filas rechazadas (detalle completo): {rechazos_file}")
             logger.info("=" * 60)
             
             return self.resultados
@@ -315,19 +537,32 @@ class ImportadorHistorial:
             if self.conn:
                 self.conn.rollback()
             raise
+        
+        finally:
+            if self.escritor:
+                self.escritor.cerrar()
+            if self.sesion:
+                self.sesion.restaurar()
+                self.sesion = None
 
 
 class InterfazImportador:
     """Interfaz gráfica para el importador de historial"""
     
-    def __init__(self):
+    # Cada cuánto se consulta la cola de progreso de la importación en segundo plano
+    INTERVALO_REFRESCO_MS = 100
+    
+    def __init__(self, reanudar: bool = False):
         self.root = tk.Tk()
         self.root.title("Importador de Historial de Gestiones CSV → MySQL")
-        self.root.geometry("700x500")
+        self.root.geometry("700x575")
         self.root.resizable(False, False)
         
         self.importador = ImportadorHistorial()
         self.archivo_seleccionado = None
+        self.reanudar_inicial = reanudar
+        self.tarea = None
+        self.medidor = None
         
         self.crear_interfaz()
     
@@ -399,6 +634,20 @@ class InterfazImportador:
         )
         info_label.pack(pady=5)
         
+        self.reanudar_var = tk.BooleanVar(value=self.reanudar_inicial)
+        tk.Checkbutton(
+            frame_archivo,
+            text="Reanudar desde el último checkpoint del archivo (si existe)",
+            variable=self.reanudar_var
+        ).pack(pady=2)
+        
+        self.sesion_masiva_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            frame_archivo,
+            text="Sesión de carga masiva (sin UNIQUE/FOREIGN_KEY_CHECKS, verifica integridad al final)",
+            variable=self.sesion_masiva_var
+        ).pack(pady=2)
+        
         # Frame de progreso
         frame_progreso = tk.LabelFrame(self.root, text="📈 Progreso", padx=10, pady=10)
         frame_progreso.pack(padx=20, pady=10, fill="x")
@@ -413,6 +662,9 @@ class InterfazImportador:
         )
         self.barra_progreso.pack(pady=5)
         
+        self.velocidad_label = tk.Label(frame_progreso, text="", fg="gray")
+        self.velocidad_label.pack()
+        
         # Frame de botones
         frame_botones = tk.Frame(self.root)
         frame_botones.pack(pady=15)
@@ -431,6 +683,19 @@ class InterfazImportador:
         )
         self.btn_importar.pack(side="left", padx=5)
         
+        # Botón cancelar (se detiene después de confirmar el lote en curso)
+        self.btn_cancelar = tk.Button(
+            frame_botones, 
+            text="⏹️ CANCELAR",
+            command=self.cancelar_importacion,
+            bg="#ffc107",
+            font=("Arial", 12, "bold"),
+            padx=20,
+            pady=10,
+            state="disabled"
+        )
+        self.btn_cancelar.pack(side="left", padx=5)
+        
         # Botón cerrar
         btn_cerrar = tk.Button(
             frame_botones, 
@@ -464,13 +729,13 @@ class InterfazImportador:
             logger.info(f"📁 Archivo seleccionado: {archivo}")
     
     def actualizar_progreso(self, porcentaje: float, actual: int, total: int):
-        """Actualizar barra de progreso"""
+        """Actualizar barra de progreso, velocidad y tiempo restante"""
         self.barra_progreso['value'] = porcentaje
         self.progreso_label.config(
             text=f"Procesando: {actual}/{total} ({porcentaje:.1f}%)",
             fg="blue"
         )
-        self.root.update_idletasks()
+        self.velocidad_label.config(text=self.medidor.texto(actual, total))
     
     def iniciar_importacion(self):
         """Iniciar proceso de importación"""
@@ -497,33 +762,86 @@ class InterfazImportador:
         if not respuesta:
             return
         
-        # Deshabilitar botón
+        # Conectar a BD
+        if not self.importador.conectar_bd(host, puerto, usuario, password, database):
+            return
+        
+        # Deshabilitar botón mientras importa
         self.btn_importar.config(state="disabled")
         self.barra_progreso['value'] = 0
+        self.progreso_label.config(text="🚀 Importando...", fg="blue")
+        self.velocidad_label.config(text="")
+        
+        # La importación corre en otro hilo; la ventana solo consulta su cola de progreso
+        self.medidor = MedidorVelocidad()
+        self.tarea = TareaImportacion(
+            self.importador.importar_csv,
+            self.archivo_seleccionado,
+            reanudar=self.reanudar_var.get(),
+            sesion_masiva=self.sesion_masiva_var.get()
+        )
+        self.tarea.iniciar()
+        # Con sesión masiva no hay lotes confirmados: cancelar desharía toda la carga
+        if not self.sesion_masiva_var.get():
+            self.btn_cancelar.config(state="normal")
+        self.root.after(self.INTERVALO_REFRESCO_MS, self.revisar_importacion)
+    
+    def cancelar_importacion(self):
+        """Pedir que la importación se detenga después de confirmar el lote en curso"""
+        if self.tarea:
+            self.tarea.cancelar.set()
+            self.btn_cancelar.config(state="disabled")
+            self.progreso_label.config(text="⏹️ Cancelando al terminar el lote en curso...", fg="orange")
+    
+    def revisar_importacion(self):
+        """Procesar los mensajes de la importación en segundo plano (se reprograma con after)"""
+        progreso = None
+        for tipo, valor in self.tarea.mensajes():
+            if tipo == 'progreso':
+                # Solo importa el último reporte desde el refresco anterior
+                progreso = valor
+            elif tipo == 'fin':
+                self.finalizar_importacion(valor)
+                return
+            else:
+                self.finalizar_importacion(None, error=valor)
+                return
         
+        if progreso and not self.tarea.cancelar.is_set():
+            self.actualizar_progreso(*progreso)
+        self.root.after(self.INTERVALO_REFRESCO_MS, self.revisar_importacion)
+    
+    def finalizar_importacion(self, resultados: Dict, error: Exception = None):
+        """Mostrar el resultado de la importación (en el hilo de la interfaz)"""
         try:
-            # Conectar a BD
-            if not self.importador.conectar_bd(host, puerto, usuario, password, database):
-                return
+            if error:
+                raise error
             
-            # Importar
-            resultados = self.importador.importar_csv(
-                self.archivo_seleccionado,
-                callback=self.actualizar_progreso
-            )
+            cancelada = self.importador.cancelada
+            if cancelada:
+                encabezado = "⏹️ Importación cancelada (lotes confirmados hasta el momento)"
+            else:
+                encabezado = "✅ Importación completada"
             
             # Mostrar resultado
             mensaje = (
-                f"✅ Importación completada\n\n"
+                f"{encabezado}\n\n"
                 f"Insertados: {resultados['insertados']}\n"
                 f"Omitidos:   {resultados['omitidos']}\n"
                 f"Errores:    {resultados['errores']}\n\n"
                 f"Log guardado en:\n{log_file}"
             )
+            if self.importador.registro.total_rechazos():
+                mensaje += f"\n\nFilas rechazadas en:\n{rechazos_file}"
+            if cancelada:
+                mensaje += "\n\nPara continuar, importa el mismo archivo con 'Reanudar' marcado"
             
-            messagebox.showinfo("Importación Completada", mensaje)
+            messagebox.showinfo("Importación Cancelada" if cancelada else "Importación Completada", mensaje)
             
-            self.progreso_label.config(text="✅ Importación completada", fg="green")
+            if cancelada:
+                self.progreso_label.config(text="⏹️ Importación cancelada", fg="orange")
+            else:
+                self.progreso_label.config(text="✅ Importación completada", fg="green")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error durante la importación:\n{str(e)}")
@@ -531,15 +849,49 @@ class InterfazImportador:
             logger.error(f"❌ Error: {e}")
         
         finally:
-            # Desconectar y rehabilitar botón
+            # Desconectar y rehabilitar botones
             self.importador.desconectar_bd()
+            self.tarea = None
             self.btn_importar.config(state="normal")
+            self.btn_cancelar.config(state="disabled")
     
     def ejecutar(self):
         """Ejecutar la aplicación"""
         self.root.mainloop()
 
 
+def main():
+    parser = argparse.ArgumentParser(description="Importador de historial de gestiones CSV/XLSX → MySQL")
+    parser.add_argument('archivo', nargs='?',
+                        help="Archivo a importar sin interfaz gráfica (sin él se abre la interfaz)")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=3308)
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--database', default='albru')
+    parser.add_argument('--resume', action='store_true',
+                        help="Reanudar desde el último checkpoint del archivo")
+    parser.add_argument('--sesion-masiva', action='store_true',
+                        help="Cargar sin UNIQUE/FOREIGN_KEY_CHECKS ni autocommit y verificar integridad al final")
+    args = parser.parse_args()
+    
+    # Logging asíncrono: archivo y consola se escriben desde un hilo aparte
+    global log_file, rechazos_file
+    log_file, rechazos_file = configurar_logging('import_historial')
+    
+    if not args.archivo:
+        app = InterfazImportador(reanudar=args.resume)
+        app.ejecutar()
+        return
+    
+    importador = ImportadorHistorial()
+    if not importador.conectar_bd(args.host, args.port, args.user, args.password, args.database):
+        raise SystemExit(1)
+    try:
+        importador.importar_csv(args.archivo, reanudar=args.resume, sesion_masiva=args.sesion_masiva)
+    finally:
+        importador.desconectar_bd()
+
+
 if __name__ == "__main__":
-    app = InterfazImportador()
-    app.ejecutar()
+    main()
@@ -0,0 +1,216 @@
+"""
+Lectura por lotes de archivos CSV/XLSX para los importadores
+Compartido por importar_csv_clientes.py e importar_csv_historial.py
+
+El archivo nunca se carga completo: el CSV se corta en lotes de registros
+completos (un salto de línea dentro de un campo entre comillas no corta el
+registro) y cada lote se parsea con read_csv; el XLSX se lee con openpyxl en
+modo read_only, fila a fila. Cada lote es un DataFrame de texto (equivalente a
+dtype=str) cuyo índice es la posición de la fila de datos en el archivo, de
+modo que 'Fila {indice + 2}' sigue apuntando a la fila correcta.
+
+Después de cada lote del CSV, posicion es el byte donde empieza el siguiente:
+el checkpoint lo guarda y al reanudar el lector hace seek ahí, sin volver a
+leer las filas ya importadas.
+"""
+
+import io
+import logging
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class LectorArchivo:
+    """Lector por lotes de un archivo CSV o XLSX"""
+
+    ENCODINGS = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
+
+    # Bytes leídos para detectar el encoding del CSV
+    TAMANO_MUESTRA = 1024 * 1024
+
+    def __init__(self, archivo_path: str, separador: str = ';', tamano_lote: int = 1000,
+                 desde: int = 0, solo_columnas: Optional[List[str]] = None, desde_byte: int = 0):
+        self.archivo_path = archivo_path
+        self.separador = separador
+        self.tamano_lote = tamano_lote
+        # Primera fila de datos a leer (para reanudar desde un checkpoint)
+        self.desde = desde
+        # Byte del CSV donde empieza la fila desde (0: se busca saltando registros)
+        self.desde_byte = desde_byte
+        # Byte donde empieza el siguiente lote del CSV (None en XLSX)
+        self.posicion = None
+        # Leer solo estas columnas (pasadas previas que no necesitan el archivo completo)
+        self.solo_columnas = solo_columnas
+        self.extension = archivo_path.lower().split('.')[-1]
+        self.es_excel = self.extension in ('xlsx', 'xls')
+        self.encoding = None if self.es_excel else self.detectar_encoding()
+        self.columnas = None
+
+    def detectar_encoding(self) -> str:
+        """Detectar el encoding del CSV con una muestra de bytes (sin leer el archivo entero)"""
+        with open(self.archivo_path, 'rb') as f:
+            muestra = f.read(self.TAMANO_MUESTRA)
+
+        if muestra.startswith(b'\xef\xbb\xbf'):
+            logger.info("✅ CSV con encoding: utf-8-sig")
+            return 'utf-8-sig'
+
+        for encoding in self.ENCODINGS:
+            try:
+                muestra.decode(encoding)
+            except UnicodeDecodeError as e:
+                # La muestra puede cortar un carácter multibyte al final
+                if e.reason == 'unexpected end of data' and e.start >= len(muestra) - 3:
+                    logger.info(f"✅ CSV con encoding: {encoding}")
+                    return encoding
+                continue
+            logger.info(f"✅ CSV con encoding: {encoding}")
+            return encoding
+
+        raise ValueError("No se pudo leer el archivo con ningún encoding conocido")
+
+    def total_estimado(self) -> int:
+        """Filas de datos estimadas (para el progreso); no carga el archivo en memoria"""
+        if self.es_excel:
+            from openpyxl import load_workbook
+            libro = load_workbook(self.archivo_path, read_only=True)
+            try:
+                return max((libro.active.max_row or 1) - 1, 0)
+            finally:
+                libro.close()
+
+        lineas = 0
+        ultimo = b'\n'
+        with open(self.archivo_path, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                lineas += bloque.count(b'\n')
+                ultimo = bloque[-1:]
+        if ultimo != b'\n':
+            lineas += 1
+        return max(lineas - 1, 0)
+
+    def validar_columnas(self, columnas_requeridas: List[str]):
+        """Leer el encabezado y verificar las columnas requeridas"""
+        if self.columnas is None:
+            self.columnas = self.leer_encabezado()
+
+        logger.info(f"📋 Columnas encontradas: {', '.join(self.columnas)}")
+        columnas_faltantes = [col for col in columnas_requeridas if col not in self.columnas]
+        if columnas_faltantes:
+            raise ValueError(f"Columnas requeridas faltantes: {', '.join(columnas_faltantes)}")
+
+    def leer_encabezado(self) -> List[str]:
+        if self.es_excel:
+            from openpyxl import load_workbook
+            libro = load_workbook(self.archivo_path, read_only=True, data_only=True)
+            try:
+                encabezado = next(libro.active.iter_rows(max_row=1, values_only=True), ())
+            finally:
+                libro.close()
+            return self.nombres_columnas(encabezado)
+
+        return pd.read_csv(self.archivo_path, sep=self.separador, encoding=self.encoding,
+                           nrows=0).columns.tolist()
+
+    @staticmethod
+    def nombres_columnas(encabezado) -> List[str]:
+        """Nombres de columna del Excel (las vacías como en pandas: 'Unnamed: n')"""
+        return [str(nombre).strip() if nombre is not None else f"Unnamed: {i}"
+                for i, nombre in enumerate(encabezado)]
+
+    @staticmethod
+    def celda_a_texto(valor) -> Optional[str]:
+        """Convertir una celda de openpyxl a texto, igual que read_excel(dtype=str)"""
+        if valor is None or isinstance(valor, str):
+            return valor
+        if isinstance(valor, float) and valor.is_integer():
+            return str(int(valor))
+        return str(valor)
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        if self.es_excel:
+            return self.lotes_excel()
+        return self.lotes_csv()
+
+    def registros(self, f, cantidad: int) -> List[bytes]:
+        """
+        Leer las líneas de los siguientes registros del CSV
+        
+        Un registro termina en un salto de línea con las comillas balanceadas
+        (los saltos dentro de un campo entre comillas siguen el mismo registro).
+        Las líneas vacías no cuentan como registro, igual que en read_csv.
+        """
+        lineas = []
+        leidos = 0
+        entre_comillas = False
+        while leidos < cantidad:
+            linea = f.readline()
+            if not linea:
+                break
+            lineas.append(linea)
+            if linea.count(b'"') % 2:
+                entre_comillas = not entre_comillas
+            if not entre_comillas and linea.strip(b'\r\n'):
+                leidos += 1
+        return lineas
+
+    def lotes_csv(self) -> Iterator[pd.DataFrame]:
+        with open(self.archivo_path, 'rb') as f:
+            encabezado = f.readline()
+            if self.desde_byte:
+                f.seek(self.desde_byte)
+            elif self.desde:
+                # Checkpoint sin byte: saltar los registros sin parsearlos
+                self.registros(f, self.desde)
+            self.posicion = f.tell()
+
+            indice = self.desde
+            while True:
+                lineas = self.registros(f, self.tamano_lote)
+                if not lineas:
+                    break
+                # encoding_errors='replace': el encoding sale de una muestra; un byte inválido
+                # más adelante no debe abortar una importación con lotes ya confirmados
+                lote = pd.read_csv(io.BytesIO(encabezado + b''.join(lineas)), sep=self.separador,
+                                   encoding=self.encoding, dtype=str, encoding_errors='replace',
+                                   usecols=self.solo_columnas)
+                self.posicion = f.tell()
+                if lote.empty:
+                    continue
+                lote.index = pd.RangeIndex(indice, indice + len(lote))
+                indice += len(lote)
+                yield lote
+
+    def lotes_excel(self) -> Iterator[pd.DataFrame]:
+        from openpyxl import load_workbook
+        libro = load_workbook(self.archivo_path, read_only=True, data_only=True)
+        try:
+            hoja = libro.active
+            columnas = self.nombres_columnas(next(hoja.iter_rows(max_row=1, values_only=True), ()))
+            posiciones = range(len(columnas))
+            if self.solo_columnas:
+                posiciones = [columnas.index(col) for col in self.solo_columnas]
+                columnas = list(self.solo_columnas)
+            filas = hoja.iter_rows(min_row=self.desde + 2, values_only=True)
+
+            # El índice es la posición de la fila en el archivo (aunque se salten filas vacías)
+            indices = []
+            buffer = []
+            for indice, fila in enumerate(filas, start=self.desde):
+                if all(valor is None for valor in fila):
+                    continue
+                valores = [self.celda_a_texto(fila[i]) if i < len(fila) else None for i in posiciones]
+                buffer.append(valores)
+                indices.append(indice)
+                if len(buffer) >= self.tamano_lote:
+                    yield pd.DataFrame(buffer, columns=columnas, index=indices, dtype=object)
+                    indices = []
+                    buffer = []
+
+            if buffer:
+                yield pd.DataFrame(buffer, columns=columnas, index=indices, dtype=object)
+        finally:
+            libro.close()
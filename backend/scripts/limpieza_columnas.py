@@ -0,0 +1,278 @@
+"""
+Limpieza vectorizada de columnas para los importadores CSV/XLSX → MySQL
+Compartido por importar_csv_clientes.py e importar_csv_historial.py
+
+Normaliza columnas completas con operaciones de pandas (sin trabajo por celda):
+recorta espacios, convierte vacíos/'NULL' a None, números con pd.to_numeric,
+booleanos con una tabla de equivalencias y fechas columna por columna.
+
+Con el esquema de la tabla (configurar_esquema) el tipo de cada columna sale de
+la BD. Para cada encabezado de archivo se compila un plan con una función de
+conversión por columna: las columnas que no existen en la tabla se descartan de
+entrada y los textos se recortan al largo de su columna.
+"""
+
+import logging
+from datetime import datetime
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=65536)
+def convertir_fecha_valor(fecha_str: str) -> Optional[str]:
+    """Convertir una fecha probando todos los formatos (memo LRU por texto original)"""
+    for formato in LimpiadorColumnas.FORMATOS_FECHA:
+        try:
+            return datetime.strptime(fecha_str, formato).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+    return None
+
+
+class LimpiadorColumnas:
+    """Limpia un DataFrame completo según el tipo de cada columna"""
+
+    MAPA_BOOLEANOS = {
+        'SI': 1, 'SÍ': 1, 'YES': 1, '1': 1, 'TRUE': 1,
+        'NO': 0, '0': 0, 'FALSE': 0
+    }
+
+    # Formatos comunes de fecha (salida MySQL: YYYY-MM-DD HH:MM:SS)
+    FORMATOS_FECHA = [
+        '%Y/%m/%d',           # 2025/01/15
+        '%Y-%m-%d',           # 2025-01-15
+        '%d/%m/%Y',           # 15/01/2025
+        '%d-%m-%Y',           # 15-01-2025
+        '%Y/%m/%d %H:%M:%S',  # 2025/01/15 14:30:00
+        '%Y-%m-%d %H:%M:%S',  # 2025-01-15 14:30:00
+    ]
+
+    # Valores distintos usados para detectar el formato de cada columna de fecha
+    TAMANO_MUESTRA_FECHA = 200
+
+    def __init__(self, columnas_fecha: Iterable[str] = (), columnas_numero: Iterable[str] = (),
+                 columnas_boolean: Iterable[str] = ()):
+        self.columnas_fecha = set(columnas_fecha)
+        self.columnas_numero = set(columnas_numero)
+        self.columnas_boolean = set(columnas_boolean)
+        # Formato detectado por columna de fecha (se reutiliza entre lotes del mismo archivo)
+        self.formatos_columna = {}
+        # Columna → {'total': n, 'ejemplos': [...]} de fechas no convertidas
+        self.fechas_no_convertidas = {}
+        # Esquema de la tabla destino: columna → tipo y columna → largo máximo
+        self.tipos_esquema = None
+        self.longitudes = {}
+        # Plan compilado para el encabezado actual: columna → función de conversión
+        self.plan = None
+        self.encabezado_plan = None
+        self.descartadas = []
+        # Columna → cantidad de textos recortados al largo de la columna
+        self.recortados = {}
+
+    def configurar_esquema(self, tipos: Dict[str, str], longitudes: Dict[str, int]):
+        """Usar los tipos y largos de la tabla destino (EsquemaTabla) en lugar de las listas fijas"""
+        self.tipos_esquema = dict(tipos)
+        self.longitudes = dict(longitudes)
+        self.plan = None
+        self.encabezado_plan = None
+
+    def reiniciar(self):
+        """Olvidar formatos detectados, fechas no convertidas y el plan compilado (nuevo archivo)"""
+        self.formatos_columna = {}
+        self.fechas_no_convertidas = {}
+        self.plan = None
+        self.encabezado_plan = None
+        self.descartadas = []
+        self.recortados = {}
+
+    def tipo_columna(self, columna: str) -> str:
+        """Determinar el tipo de limpieza de una columna"""
+        if self.tipos_esquema is not None:
+            return self.tipos_esquema[columna]
+        if columna in self.columnas_fecha:
+            return 'fecha'
+        elif columna in self.columnas_numero:
+            return 'numero'
+        elif columna in self.columnas_boolean:
+            return 'boolean'
+        return 'texto'
+
+    @staticmethod
+    def a_texto(serie: pd.Series) -> pd.Series:
+        """Convertir a texto recortado; vacíos y 'NULL' quedan como nulos"""
+        if pd.api.types.is_float_dtype(serie):
+            # 923718973.0 → '923718973' (columnas numéricas leídas con huecos)
+            no_nulos = serie.dropna()
+            if len(no_nulos) and (no_nulos % 1 == 0).all():
+                serie = serie.astype('Int64')
+
+        texto = serie.astype('string').str.strip()
+        return texto.mask(texto.eq('') | texto.str.upper().eq('NULL'))
+
+    def limpiar_columna(self, serie: pd.Series, tipo: str) -> pd.Series:
+        """Limpiar una columna completa; devuelve dtype object con None para nulos"""
+        if tipo == 'fecha':
+            resultado = self.convertir_fechas(serie)
+        elif tipo == 'numero':
+            resultado = pd.to_numeric(self.a_texto(serie), errors='coerce').astype(object)
+        elif tipo == 'entero':
+            # Igual que MySQL al guardar '12.7' en una columna INT: redondeo a la mitad
+            # alejándose de cero ('2.5' → 3, '-2.5' → -3; Series.round() daría 2 y -2)
+            numeros = pd.to_numeric(self.a_texto(serie), errors='coerce').astype('float64')
+            redondeados = np.sign(numeros) * np.floor(numeros.abs() + 0.5)
+            resultado = redondeados.astype('Int64').astype(object)
+        elif tipo == 'boolean':
+            resultado = self.a_texto(serie).str.upper().map(self.MAPA_BOOLEANOS).astype('Int64').astype(object)
+        else:
+            resultado = self.a_texto(serie).astype(object)
+
+        return resultado.where(resultado.notna(), None)
+
+    def detectar_formato_fecha(self, texto: pd.Series) -> Optional[str]:
+        """Elegir el formato que convierte más valores de una muestra de la columna"""
+        muestra = texto.dropna().drop_duplicates().head(self.TAMANO_MUESTRA_FECHA)
+        if muestra.empty:
+            return None
+
+        mejor, aciertos_mejor = None, 0
+        for formato in self.FORMATOS_FECHA:
+            aciertos = int(pd.to_datetime(muestra, format=formato, errors='coerce').notna().sum())
+            if aciertos > aciertos_mejor:
+                mejor, aciertos_mejor = formato, aciertos
+        return mejor
+
+    def convertir_fechas(self, serie: pd.Series) -> pd.Series:
+        """
+        Convertir una columna de fechas a 'YYYY-MM-DD HH:MM:SS'
+
+        1. Detecta el formato de la columna con una muestra (una vez por columna).
+        2. Convierte toda la columna con ese formato en una sola pasada.
+        3. Solo el residuo se prueba valor por valor contra todos los formatos,
+           con memo LRU (las exportaciones repiten mucho las mismas fechas).
+        Las fechas que no se pudieron convertir se acumulan en self.fechas_no_convertidas.
+        """
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie.dt.strftime('%Y-%m-%d %H:%M:%S').astype(object)
+
+        columna = serie.name
+        texto = self.a_texto(serie)
+
+        if columna not in self.formatos_columna:
+            self.formatos_columna[columna] = self.detectar_formato_fecha(texto)
+        formato = self.formatos_columna[columna]
+
+        # Cada texto distinto se convierte una sola vez y luego se mapea a la columna
+        distintos = pd.Index(texto.dropna().unique(), dtype=object)
+        convertidos = pd.Series(None, index=distintos, dtype=object)
+        if formato and len(distintos):
+            fechas = pd.Series(pd.to_datetime(distintos, format=formato, errors='coerce'), index=distintos)
+            convertidos = fechas.dt.strftime('%Y-%m-%d %H:%M:%S').astype(object)
+
+        residuo = convertidos.isna()
+        if residuo.any():
+            convertidos[residuo] = distintos[residuo].map(convertir_fecha_valor)
+
+        resultado = texto.astype(object).map(convertidos).astype(object)
+        resultado = resultado.where(resultado.notna(), None)
+        self.registrar_no_convertidas(columna, texto[texto.notna() & resultado.isna()])
+
+        return resultado
+
+    def registrar_no_convertidas(self, columna: str, valores: pd.Series):
+        """Acumular (por columna) las fechas que no se pudieron convertir"""
+        if valores.empty:
+            return
+
+        resumen = self.fechas_no_convertidas.setdefault(columna, {'total': 0, 'ejemplos': []})
+        resumen['total'] += len(valores)
+        for valor in valores.unique():
+            if len(resumen['ejemplos']) >= 5:
+                break
+            if valor not in resumen['ejemplos']:
+                resumen['ejemplos'].append(valor)
+
+    def resumen_fechas(self):
+        """Registrar un aviso por columna con las fechas no convertidas"""
+        for columna, resumen in self.fechas_no_convertidas.items():
+            logger.warning(f"⚠️ {columna}: {resumen['total']} fechas no convertidas "
+                           f"(ej: {', '.join(resumen['ejemplos'])})")
+
+    def resumen(self):
+        """Registrar avisos de fechas no convertidas, textos recortados y columnas descartadas"""
+        self.resumen_fechas()
+        for columna, cantidad in self.recortados.items():
+            logger.warning(f"⚠️ {columna}: {cantidad} valores recortados a {self.longitudes[columna]} caracteres")
+        if self.descartadas:
+            logger.warning(f"⚠️ Columnas ignoradas: {', '.join(self.descartadas)}")
+
+    def recortar(self, serie: pd.Series, longitud: int) -> pd.Series:
+        """Recortar los textos al largo de la columna (se cuentan los recortados)"""
+        largos = serie.str.len()
+        excedidos = int((largos > longitud).sum())
+        if not excedidos:
+            return serie
+        self.recortados[serie.name] = self.recortados.get(serie.name, 0) + excedidos
+        return serie.str.slice(0, longitud)
+
+    def limpiar_texto(self, serie: pd.Series, longitud: int) -> pd.Series:
+        """Limpiar una columna de texto y recortarla al largo de la columna"""
+        resultado = self.recortar(self.a_texto(serie), longitud).astype(object)
+        return resultado.where(resultado.notna(), None)
+
+    def convertidor(self, columna: str) -> Callable[[pd.Series], pd.Series]:
+        """Función de conversión de una columna según su tipo (y largo, si es texto)"""
+        tipo = self.tipo_columna(columna)
+        longitud = self.longitudes.get(columna)
+        if tipo == 'texto' and longitud:
+            return partial(self.limpiar_texto, longitud=longitud)
+        return partial(self.limpiar_columna, tipo=tipo)
+
+    def compilar(self, columnas: Iterable[str]) -> Dict[str, Callable[[pd.Series], pd.Series]]:
+        """
+        Compilar el plan de conversión para un encabezado de archivo
+
+        Las columnas que no existen en la tabla destino se descartan aquí, una sola
+        vez, en lugar de llegar a cada fila.
+        """
+        columnas = list(columnas)
+        if self.tipos_esquema is None:
+            validas, descartadas = columnas, []
+        else:
+            validas = [col for col in columnas if col in self.tipos_esquema]
+            descartadas = [col for col in columnas if col not in self.tipos_esquema]
+        if descartadas:
+            logger.warning(f"⚠️ Columnas ignoradas (no existen en la tabla o son generadas): {', '.join(descartadas)}")
+
+        self.plan = {columna: self.convertidor(columna) for columna in validas}
+        self.encabezado_plan = tuple(columnas)
+        self.descartadas = descartadas
+        return self.plan
+
+    def validar_encabezado(self, columnas: Iterable[str], columnas_requeridas: Iterable[str]):
+        """Compilar el plan del encabezado y verificar que las requeridas existan en la tabla"""
+        plan = self.compilar(columnas)
+        no_escribibles = [col for col in columnas_requeridas if col not in plan]
+        if no_escribibles:
+            raise ValueError(f"Columnas requeridas que no se pueden escribir en la tabla: {', '.join(no_escribibles)}")
+
+    def limpiar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Aplicar el plan compilado a todas las columnas del DataFrame de una vez"""
+        if self.encabezado_plan != tuple(df.columns):
+            self.compilar(df.columns)
+        return pd.DataFrame(
+            {columna: convertir(df[columna]) for columna, convertir in self.plan.items()},
+            index=df.index
+        )
+
+    @staticmethod
+    def iterar_filas(df: pd.DataFrame) -> Iterator[Tuple[object, Dict]]:
+        """Recorrer un DataFrame ya limpio como (índice, {columna: valor})"""
+        columnas = list(df.columns)
+        for indice, valores in zip(df.index, df.itertuples(index=False, name=None)):
+            yield indice, dict(zip(columnas, valores))
+
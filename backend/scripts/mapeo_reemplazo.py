@@ -0,0 +1,236 @@
+"""
+Especificación declarativa de las cargas de reemplazar_tablas_completas.py
+
+Cada carga de un archivo de mapeo (JSON, o YAML si está instalado PyYAML) dice
+de qué archivo y hoja se lee, a qué tabla va, de qué columna del archivo sale
+cada columna de la tabla y con qué tipo, y cómo se calculan los campos
+derivados (valores por defecto, concatenaciones, búsquedas de cliente o asesor).
+
+La especificación se compila una sola vez en una TransformacionCarga: un paso
+por columna destino que transforma la columna completa del DataFrame con
+operaciones de pandas (la limpieza por tipo es la de LimpiadorColumnas), en
+lugar de revisar el nombre de la columna en cada celda. Un layout nuevo del
+Excel mensual solo necesita otro archivo de mapeo.
+
+Formato de cada columna (todas las claves son opcionales):
+    "origen":      columna del archivo (por defecto, el mismo nombre que en la tabla);
+                   lista de columnas si la usa un resolver
+    "tipo":        texto | entero | numero | fecha | boolean (por defecto, el de la tabla)
+    "defecto":     valor para las filas sin dato
+    "concatenar":  [{"origen": ..., "prefijo": ...}], unidas con "separador" (' | ')
+    "resolver":    nombre de un resolutor (ej. cliente, asesor) que recibe los valores de "origen"
+    "igual_a":     copia de otra columna destino ya calculada
+    "requerida":   true descarta (y cuenta) las filas sin valor antes de calcular las siguientes
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from limpieza_columnas import LimpiadorColumnas
+
+logger = logging.getLogger(__name__)
+
+RUTA_MAPEO = Path(__file__).resolve().parent / 'mapeos' / 'reemplazo_completo.json'
+
+TIPOS = {'texto', 'entero', 'numero', 'fecha', 'boolean'}
+
+
+def cargar_mapeo(ruta) -> Dict[str, 'EspecificacionCarga']:
+    """Leer un archivo de mapeo y devolver sus cargas por nombre"""
+    ruta = Path(ruta)
+    with open(ruta, encoding='utf-8') as f:
+        if ruta.suffix.lower() in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"{ruta.name} es YAML y PyYAML no está instalado (pip install pyyaml)")
+            contenido = yaml.safe_load(f)
+        else:
+            contenido = json.load(f)
+
+    cargas = {}
+    for datos in contenido.get('cargas', []):
+        carga = EspecificacionCarga(datos)
+        cargas[carga.nombre] = carga
+    logger.info(f"🗺️ Mapeo {ruta.name}: cargas {', '.join(cargas)}")
+    return cargas
+
+
+class EspecificacionCarga:
+    """Una carga del archivo de mapeo: archivo de origen, tabla destino y columnas"""
+
+    def __init__(self, datos: Dict):
+        try:
+            self.nombre = datos['nombre']
+            self.destino = datos['destino']
+            origen = datos['origen']
+            self.archivo = origen['archivo']
+            self.columnas = dict(datos['columnas'])
+        except KeyError as e:
+            raise ValueError(f"Falta la clave {e} en una carga del mapeo")
+        self.hoja = origen.get('hoja', 0)
+        self.separador = origen.get('separador', ',')
+        self.encoding = origen.get('encoding', 'utf-8')
+        self.tamano_lote = int(datos.get('tamano_lote', 1000))
+
+        for columna, spec in self.columnas.items():
+            tipo = (spec or {}).get('tipo')
+            if tipo is not None and tipo not in TIPOS:
+                raise ValueError(f"{self.nombre}.{columna}: tipo '{tipo}' desconocido "
+                                 f"(use {', '.join(sorted(TIPOS))})")
+
+    def leer(self) -> pd.DataFrame:
+        """Leer el archivo de origen completo (Excel por hoja o CSV)"""
+        if Path(self.archivo).suffix.lower() == '.csv':
+            return pd.read_csv(self.archivo, sep=self.separador, encoding=self.encoding)
+        return pd.read_excel(self.archivo, sheet_name=self.hoja)
+
+    def compilar(self, tipos_esquema: Optional[Dict[str, str]] = None,
+                 longitudes: Optional[Dict[str, int]] = None) -> 'TransformacionCarga':
+        """
+        Compilar la carga en una transformación por columnas
+
+        Args:
+            tipos_esquema: Tipo de limpieza por columna de la tabla (EsquemaTabla.tipos());
+                           si se pasa, las columnas que no existen en la tabla se descartan
+            longitudes: Largo máximo de las columnas de texto (EsquemaTabla.longitudes())
+        """
+        return TransformacionCarga(self, tipos_esquema, longitudes or {})
+
+
+class TransformacionCarga:
+    """Pasos compilados de una carga: columna destino → función sobre el DataFrame completo"""
+
+    def __init__(self, carga: EspecificacionCarga, tipos_esquema: Optional[Dict[str, str]],
+                 longitudes: Dict[str, int]):
+        self.carga = carga
+        self.tipos_esquema = tipos_esquema
+        self.longitudes = longitudes
+        self.limpiador = LimpiadorColumnas()
+        self.limpiador.longitudes = dict(longitudes)
+        # Columnas del mapeo que no existen en la tabla destino
+        self.ignoradas = []
+        # Columnas de origen que faltan en el archivo (quedan nulas)
+        self.faltantes = []
+        # Columna requerida → filas descartadas por no tener valor
+        self.descartadas = {}
+        # [(columna destino, función, requerida)]
+        self.pasos: List[Tuple[str, Callable, bool]] = []
+
+        for columna, spec in carga.columnas.items():
+            spec = spec or {}
+            if tipos_esquema is not None and columna not in tipos_esquema:
+                self.ignoradas.append(columna)
+                continue
+            self.pasos.append((columna, self.compilar_columna(columna, spec), bool(spec.get('requerida'))))
+
+        if self.ignoradas:
+            logger.warning(f"⚠️ {carga.nombre}: columnas del mapeo que no existen en {carga.destino}: "
+                           f"{', '.join(self.ignoradas)}")
+
+    @property
+    def columnas(self) -> List[str]:
+        return [columna for columna, _, _ in self.pasos]
+
+    def tipo(self, columna: str, spec: Dict) -> str:
+        if spec.get('tipo'):
+            return spec['tipo']
+        if self.tipos_esquema is not None:
+            return self.tipos_esquema[columna]
+        return 'texto'
+
+    def origen(self, df: pd.DataFrame, columna: str) -> pd.Series:
+        """Columna del archivo (nula si el archivo no la trae)"""
+        if columna in df.columns:
+            return df[columna]
+        if columna not in self.faltantes:
+            self.faltantes.append(columna)
+        return pd.Series(None, index=df.index, dtype=object, name=columna)
+
+    def limpiar(self, serie: pd.Series, tipo: str, columna: str) -> pd.Series:
+        serie = serie.rename(columna)
+        if tipo == 'texto' and columna in self.longitudes:
+            return self.limpiador.limpiar_texto(serie, self.longitudes[columna])
+        return self.limpiador.limpiar_columna(serie, tipo)
+
+    def compilar_columna(self, columna: str, spec: Dict) -> Callable:
+        """Función (df, columnas ya calculadas, resolutores) → Series de la columna destino"""
+        tipo = self.tipo(columna, spec)
+        defecto = spec.get('defecto')
+
+        if 'resolver' in spec:
+            nombre = spec['resolver']
+            origenes = spec.get('origen', columna)
+            origenes = [origenes] if isinstance(origenes, str) else list(origenes)
+
+            def calcular(df, calculadas, resolutores):
+                if nombre not in resolutores:
+                    raise ValueError(f"{self.carga.nombre}.{columna}: no hay resolutor '{nombre}'")
+                resolver = resolutores[nombre].resolver
+                valores = zip(*(self.origen(df, origen) for origen in origenes))
+                return pd.Series([resolver(*fila) for fila in valores], index=df.index, dtype=object)
+
+        elif 'concatenar' in spec:
+            partes = [(parte['origen'], parte.get('prefijo', '')) for parte in spec['concatenar']]
+            separador = spec.get('separador', ' | ')
+
+            def calcular(df, calculadas, resolutores):
+                resultado = pd.Series(pd.NA, index=df.index, dtype='string')
+                for origen, prefijo in partes:
+                    parte = prefijo + self.limpiador.a_texto(self.origen(df, origen))
+                    # Las partes sin valor se omiten (sin separadores repetidos)
+                    unida = resultado + separador + parte
+                    resultado = unida.fillna(resultado).fillna(parte)
+                return self.limpiar(resultado, tipo, columna)
+
+        elif 'igual_a' in spec:
+            referencia = spec['igual_a']
+
+            def calcular(df, calculadas, resolutores):
+                if referencia not in calculadas:
+                    raise ValueError(f"{self.carga.nombre}.{columna}: igual_a '{referencia}' "
+                                     f"debe ir después de esa columna en el mapeo")
+                # Con el tipo y largo de esta columna (ej. accion VARCHAR(100) → estado_nuevo VARCHAR(50))
+                return self.limpiar(calculadas[referencia], tipo, columna)
+
+        else:
+            origen = spec.get('origen', columna)
+
+            def calcular(df, calculadas, resolutores):
+                return self.limpiar(self.origen(df, origen), tipo, columna)
+
+        if defecto is None:
+            return calcular
+
+        def con_defecto(df, calculadas, resolutores):
+            serie = calcular(df, calculadas, resolutores)
+            return serie.where(serie.notna(), defecto)
+        return con_defecto
+
+    def aplicar(self, df: pd.DataFrame, resolutores: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        Transformar el DataFrame del archivo en las columnas de la tabla destino
+
+        Las filas sin valor en una columna requerida se descartan en ese paso (se
+        cuentan en self.descartadas), así que las columnas siguientes ya no se
+        calculan para ellas. Devuelve dtype object con None para los nulos.
+        """
+        resolutores = resolutores or {}
+        calculadas = {}
+        for columna, calcular, requerida in self.pasos:
+            serie = calcular(df, calculadas, resolutores)
+            if requerida:
+                con_valor = serie.notna()
+                self.descartadas[columna] = self.descartadas.get(columna, 0) + int((~con_valor).sum())
+                if not con_valor.all():
+                    df = df[con_valor]
+                    serie = serie[con_valor]
+                    calculadas = {nombre: valores[con_valor] for nombre, valores in calculadas.items()}
+            calculadas[columna] = serie
+
+        resultado = pd.DataFrame(calculadas, index=df.index, columns=self.columnas).astype(object)
+        return resultado.where(resultado.notna(), None)
@@ -1,14 +1,294 @@
 import pandas as pd
 import mysql.connector
 from datetime import datetime
+from bisect import bisect_left
+from collections import Counter
+import argparse
 import os
+import re
+import unicodedata
+
+from esquema_columnas import EsquemaTabla
+from mapeo_reemplazo import RUTA_MAPEO, cargar_mapeo
+from reporte_fases import ReporteFases
+from sesion_masiva import SesionMasiva
+
+class ResolutorClientes:
+    """
+    Resolver cliente_id por DNI o teléfono en memoria (sin consultas por fila)
+    
+    Carga una sola vez dni → id y teléfono normalizado → id. Para la búsqueda por
+    sufijo (el teléfono del archivo sin prefijo de país, ej. 987654321 para
+    51987654321) mantiene los teléfonos invertidos y ordenados: los que terminan
+    en un número son los que, invertidos, empiezan por ese número invertido, y
+    se ubican con una búsqueda binaria. Un sufijo que coincide con más de un
+    cliente no se adivina: la fila queda sin cliente y el teléfono va al reporte
+    de revisión con sus candidatos.
+    """
+    
+    # Menos dígitos que esto no se buscan por sufijo (coincidirían con demasiados)
+    MINIMO_SUFIJO = 6
+    # Candidatos que se listan por teléfono ambiguo en el reporte de revisión
+    MAXIMO_CANDIDATOS = 10
+    
+    def __init__(self, cursor):
+        self.por_dni = {}
+        self.por_telefono = {}
+        cursor.execute("SELECT id, dni, telefono FROM clientes ORDER BY id")
+        for fila in cursor.fetchall():
+            dni = self.normalizar(fila['dni'])
+            if dni:
+                self.por_dni.setdefault(dni, fila['id'])
+            telefono = self.normalizar_telefono(fila['telefono'])
+            if telefono:
+                self.por_telefono.setdefault(telefono, fila['id'])
+        
+        # (teléfono invertido, id) ordenados por teléfono invertido
+        invertidos = sorted((telefono[::-1], cliente_id) for telefono, cliente_id in self.por_telefono.items())
+        self.invertidos = [telefono for telefono, _ in invertidos]
+        self.ids_invertidos = [cliente_id for _, cliente_id in invertidos]
+        self.estadisticas = Counter()
+        # Teléfono del archivo con sufijo ambiguo → (filas, ids candidatos)
+        self.ambiguos = {}
+    
+    @staticmethod
+    def normalizar(valor):
+        """Texto sin espacios en los extremos ('12345678.0' de Excel → '12345678'); None si está vacío"""
+        if valor is None or pd.isna(valor):
+            return None
+        if isinstance(valor, float) and valor.is_integer():
+            valor = int(valor)
+        texto = str(valor).strip()
+        return texto or None
+    
+    @classmethod
+    def normalizar_telefono(cls, valor):
+        """Solo los dígitos del teléfono"""
+        texto = cls.normalizar(valor)
+        if texto is None:
+            return None
+        return re.sub(r'\D', '', texto) or None
+    
+    def buscar_sufijo(self, telefono):
+        """
+        Clientes cuyo teléfono termina en el número dado (búsqueda binaria, O(log n))
+        
+        Devuelve hasta MAXIMO_CANDIDATOS + 1 ids: con más de uno, el sufijo es ambiguo.
+        """
+        if len(telefono) < self.MINIMO_SUFIJO:
+            return []
+        prefijo = telefono[::-1]
+        posicion = bisect_left(self.invertidos, prefijo)
+        candidatos = []
+        while (posicion < len(self.invertidos) and self.invertidos[posicion].startswith(prefijo)
+               and len(candidatos) <= self.MAXIMO_CANDIDATOS):
+            candidatos.append(self.ids_invertidos[posicion])
+            posicion += 1
+        return candidatos
+    
+    def resolver(self, dni, telefono):
+        """cliente_id por DNI, teléfono exacto o sufijo del teléfono (None si no se encuentra)"""
+        dni = self.normalizar(dni)
+        if dni and dni in self.por_dni:
+            self.estadisticas['dni'] += 1
+            return self.por_dni[dni]
+        
+        telefono = self.normalizar_telefono(telefono)
+        if telefono:
+            if telefono in self.por_telefono:
+                self.estadisticas['telefono'] += 1
+                return self.por_telefono[telefono]
+            candidatos = self.buscar_sufijo(telefono)
+            if len(candidatos) == 1:
+                self.estadisticas['sufijo'] += 1
+                return candidatos[0]
+            if candidatos:
+                self.estadisticas['sufijo_ambiguo'] += 1
+                filas, _ = self.ambiguos.get(telefono, (0, candidatos))
+                self.ambiguos[telefono] = (filas + 1, candidatos)
+                return None
+        
+        self.estadisticas['sin_cliente'] += 1
+        return None
+    
+    def guardar_revision(self, ruta):
+        """
+        Escribir el reporte de teléfonos con sufijo ambiguo (filas que quedaron sin cliente)
+        
+        Returns:
+            Cantidad de teléfonos distintos en el reporte
+        """
+        filas = []
+        for telefono, (cantidad, candidatos) in self.ambiguos.items():
+            mostrados = candidatos[:self.MAXIMO_CANDIDATOS]
+            filas.append({
+                'telefono_archivo': telefono,
+                'filas': cantidad,
+                'motivo': 'sufijo_ambiguo',
+                'candidatos': ' | '.join(str(cliente_id) for cliente_id in mostrados)
+                              + (' | ...' if len(candidatos) > len(mostrados) else '')
+            })
+        if filas:
+            pd.DataFrame(filas).sort_values('filas', ascending=False).to_csv(
+                ruta, sep=';', index=False, encoding='utf-8'
+            )
+        return len(filas)
+
+class ResolutorAsesores:
+    """
+    Resolver usuario_id a partir del nombre del asesor (columna AS.FINAL)
+    
+    Un archivo trae unas pocas decenas de nombres distintos, así que usuarios se
+    carga una sola vez y cada nombre distinto se compara una sola vez; el
+    resultado queda en caché para el resto del archivo. Los nombres se normalizan
+    (sin tildes, minúsculas, tokens ordenados) y se comparan por tokens y por
+    trigramas. Los nombres sin coincidencia suficiente o con más de un candidato
+    parecido no se adivinan: usan el usuario por defecto y van al reporte de
+    revisión con sus candidatos.
+    """
+    
+    # Similitud mínima (0-1) para aceptar un usuario
+    UMBRAL = 0.6
+    # Si el segundo candidato queda a menos de esto del primero, el nombre es ambiguo
+    MARGEN = 0.1
+    # Usuario que recibe las filas sin asesor reconocido (admin)
+    USUARIO_POR_DEFECTO = 1
+    
+    def __init__(self, cursor, umbral=UMBRAL, margen=MARGEN):
+        self.umbral = umbral
+        self.margen = margen
+        # (id, nombre, tokens, trigramas) por cada nombre o username
+        self.usuarios = []
+        cursor.execute("SELECT id, nombre, username FROM usuarios ORDER BY id")
+        for fila in cursor.fetchall():
+            for alias in (fila['nombre'], fila.get('username')):
+                tokens = self.tokens(alias)
+                if tokens:
+                    self.usuarios.append((fila['id'], fila['nombre'], tokens, self.trigramas(tokens)))
+        
+        # nombre del archivo → (usuario_id, motivo, candidatos)
+        self.cache = {}
+        # nombre del archivo → filas que lo usan
+        self.filas = Counter()
+        self.estadisticas = Counter()
+    
+    @staticmethod
+    def tokens(nombre):
+        """Palabras del nombre sin tildes ni mayúsculas ('Pérez  JUAN' → ('juan', 'perez'))"""
+        if nombre is None or pd.isna(nombre):
+            return ()
+        texto = unicodedata.normalize('NFKD', str(nombre))
+        texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+        return tuple(sorted(re.findall(r'[a-z0-9]+', texto)))
+    
+    @staticmethod
+    def trigramas(tokens):
+        texto = f"  {' '.join(tokens)} "
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+    
+    @staticmethod
+    def similitud(tokens, trigramas, tokens_usuario, trigramas_usuario):
+        """
+        Similitud 0-1 entre el nombre del archivo y el de un usuario
+        
+        La mayor entre la fracción de palabras del archivo que están en el usuario
+        ('juan perez' dentro de 'juan carlos perez', como el antiguo LIKE) y el
+        índice de Jaccard de los trigramas (tolera errores de tipeo).
+        """
+        contenidas = len(set(tokens) & set(tokens_usuario)) / len(tokens)
+        jaccard = len(trigramas & trigramas_usuario) / len(trigramas | trigramas_usuario)
+        return max(contenidas, jaccard)
+    
+    def comparar(self, tokens):
+        """Mejor puntaje por usuario, de mayor a menor: [(puntaje, id, nombre)]"""
+        trigramas = self.trigramas(tokens)
+        mejores = {}
+        for usuario_id, nombre, tokens_usuario, trigramas_usuario in self.usuarios:
+            puntaje = self.similitud(tokens, trigramas, tokens_usuario, trigramas_usuario)
+            if puntaje > mejores.get(usuario_id, (0, None))[0]:
+                mejores[usuario_id] = (puntaje, nombre)
+        return sorted(((puntaje, usuario_id, nombre) for usuario_id, (puntaje, nombre) in mejores.items()),
+                      key=lambda c: (-c[0], c[1]))
+    
+    def clasificar(self, nombre):
+        """(usuario_id, motivo, candidatos) de un nombre del archivo; motivo None si se aceptó"""
+        tokens = self.tokens(nombre)
+        if not tokens:
+            return self.USUARIO_POR_DEFECTO, 'sin_nombre', []
+        
+        candidatos = [c for c in self.comparar(tokens) if c[0] >= self.umbral]
+        if not candidatos:
+            return self.USUARIO_POR_DEFECTO, 'sin_coincidencia', []
+        if len(candidatos) > 1 and candidatos[0][0] - candidatos[1][0] < self.margen:
+            return self.USUARIO_POR_DEFECTO, 'ambiguo', candidatos[:5]
+        return candidatos[0][1], None, candidatos[:1]
+    
+    def resolver(self, nombre):
+        """usuario_id del asesor (el usuario por defecto si no hay nombre o no se reconoce)"""
+        if nombre is None or pd.isna(nombre):
+            self.estadisticas['sin_asesor'] += 1
+            return self.USUARIO_POR_DEFECTO
+        
+        nombre = str(nombre).strip()
+        if nombre not in self.cache:
+            self.cache[nombre] = self.clasificar(nombre)
+        usuario_id, motivo, _ = self.cache[nombre]
+        self.filas[nombre] += 1
+        self.estadisticas[motivo or 'reconocido'] += 1
+        return usuario_id
+    
+    def guardar_revision(self, ruta):
+        """
+        Escribir el reporte de nombres a revisar (sin coincidencia o ambiguos)
+        
+        Returns:
+            Cantidad de nombres distintos en el reporte
+        """
+        filas = []
+        for nombre, (_, motivo, candidatos) in self.cache.items():
+            if motivo is None:
+                continue
+            filas.append({
+                'asesor_archivo': nombre,
+                'filas': self.filas[nombre],
+                'motivo': motivo,
+                'usuario_asignado': self.USUARIO_POR_DEFECTO,
+                'candidatos': ' | '.join(f"{usuario_id}:{usuario} ({puntaje:.2f})"
+                                         for puntaje, usuario_id, usuario in candidatos)
+            })
+        if filas:
+            pd.DataFrame(filas).sort_values('filas', ascending=False).to_csv(
+                ruta, sep=';', index=False, encoding='utf-8'
+            )
+        return len(filas)
 
 class ReemplazadorTablas:
-    def __init__(self):
+    def __init__(self, sesion_masiva=False, tabla_sombra=False, mapeo=RUTA_MAPEO, permitir_errores=False):
+        if sesion_masiva and tabla_sombra:
+            # RENAME y ALTER TABLE confirman implícitamente: la tabla sombra no cabe en
+            # la transacción única de la sesión masiva
+            raise ValueError("La sesión masiva no se puede combinar con la tabla sombra")
         self.conn = None
         self.cursor = None
+        # Cargar sin autocommit, UNIQUE_CHECKS ni FOREIGN_KEY_CHECKS y verificar integridad al final
+        self.sesion_masiva = sesion_masiva
+        # Cargar clientes en clientes_new y reemplazar la tabla con un RENAME atómico
+        self.tabla_sombra = tabla_sombra
+        # Publicar la tabla sombra aunque algunas filas hayan fallado al insertarse
+        self.permitir_errores = permitir_errores
+        # Archivo de mapeo (JSON/YAML): archivos de origen, columnas, tipos y campos derivados
+        self.mapeo = mapeo
+        self.sesion = None
+        # Tabla → tabla de backup (con sesión masiva se crean todos antes de la transacción)
+        self.backups = {}
+        # Tablas que esta ejecución vuelve a cargar (sus referencias se verifican al cargarlas)
+        self.reemplazadas = set()
         self.log_file = f"logs/reemplazo_completo_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
         os.makedirs('logs', exist_ok=True)
+        # Tiempos, filas/s, bytes y viajes a la BD por fase (JSON junto al log)
+        self.reporte = ReporteFases(
+            self.log_file.replace('reemplazo_completo_', 'reporte_reemplazo_').replace('.log', '.json')
+        )
         
     def log(self, mensaje):
         """Escribir en log y consola"""
@@ -29,8 +309,21 @@ class ReemplazadorTablas:
             database='albru'
         )
         self.cursor = self.conn.cursor(dictionary=True)
+        self.reporte.conn = self.conn
         self.log("✅ Conexión exitosa")
     
+    def columnas_escribibles(self, tabla):
+        """Columnas de la tabla que admiten INSERT (excluye columnas generadas)"""
+        self.cursor.execute("""
+            SELECT COLUMN_NAME AS columna
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = %s
+              AND EXTRA NOT LIKE '%%GENERATED%%'
+            ORDER BY ORDINAL_POSITION
+        """, (tabla,))
+        return [fila['columna'] for fila in self.cursor.fetchall()]
+    
     def hacer_backup(self, tabla):
         """Crear tabla de respaldo"""
         backup_nombre = f"{tabla}_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -39,7 +332,11 @@ class ReemplazadorTablas:
         try:
             # Crear tabla de backup como copia
             self.cursor.execute(f"CREATE TABLE {backup_nombre} LIKE {tabla}")
-            self.cursor.execute(f"INSERT INTO {backup_nombre} SELECT * FROM {tabla}")
+            # Las columnas generadas (ej. clientes.telefono_normalizado) no aceptan valores
+            columnas = ', '.join(self.columnas_escribibles(tabla))
+            self.cursor.execute(
+                f"INSERT INTO {backup_nombre} ({columnas}) SELECT {columnas} FROM {tabla}"
+            )
             self.conn.commit()
             
             # Contar registros en backup
@@ -51,107 +348,375 @@ class ReemplazadorTablas:
             self.log(f"❌ Error creando backup: {e}")
             raise
     
+    def respaldar(self, carga):
+        """Backup de la tabla destino de la carga (una sola vez por ejecución)"""
+        if carga.destino not in self.backups:
+            with self.reporte.fase(f"{carga.nombre}.backup"):
+                self.backups[carga.destino] = self.hacer_backup(carga.destino)
+        return self.backups[carga.destino]
+    
     def vaciar_tabla(self, tabla):
         """Vaciar tabla completamente"""
         self.log(f"\n🗑️ Vaciando tabla {tabla}...")
         try:
+            if self.sesion:
+                # TRUNCATE confirma implícitamente: en sesión masiva se borra dentro de la
+                # transacción, para que un rollback devuelva la tabla como estaba
+                # (FOREIGN_KEY_CHECKS ya está en 0 durante toda la sesión)
+                self.cursor.execute(f"DELETE FROM {tabla}")
+                self.log(f"✅ Tabla {tabla} vaciada (se confirma al final de la sesión masiva)")
+                return
             # Deshabilitar checks de foreign key temporalmente
+            self.cursor.execute("SET @fk_checks_previo = @@FOREIGN_KEY_CHECKS")
             self.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
             self.cursor.execute(f"TRUNCATE TABLE {tabla}")
-            self.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+            self.cursor.execute("SET FOREIGN_KEY_CHECKS = @fk_checks_previo")
             self.conn.commit()
             self.log(f"✅ Tabla {tabla} vaciada")
         except Exception as e:
             self.log(f"❌ Error vaciando tabla: {e}")
             raise
     
-    def importar_clientes(self, archivo_excel):
-        """Importar clientes desde Excel"""
+    def indices_unicos(self, tabla):
+        """Índices únicos de la tabla: nombre → (columnas, definición para ADD UNIQUE INDEX)"""
+        self.cursor.execute("""
+            SELECT INDEX_NAME AS indice,
+                   GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS columnas,
+                   GROUP_CONCAT(CONCAT('`', COLUMN_NAME, '`', IF(SUB_PART IS NULL, '', CONCAT('(', SUB_PART, ')')))
+                                ORDER BY SEQ_IN_INDEX) AS definicion
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0
+            GROUP BY INDEX_NAME
+        """, (tabla,))
+        return {fila['indice']: (fila['columnas'].split(','), fila['definicion']) for fila in self.cursor.fetchall()}
+    
+    def preparar_tabla_sombra(self, tabla):
+        """
+        Crear {tabla}_new vacía con la misma estructura (índices y columnas generadas)
+        
+        Los índices únicos secundarios (ej. uk_telefono_normalizado, sobre una columna
+        generada) se quitan durante la carga: con ellos, las filas en conflicto fallarían
+        una por una en insertar_lotes y la tabla se publicaría sin esos clientes.
+        verificar_unicos busca los conflictos y vuelve a crear los índices.
+        """
+        sombra = f"{tabla}_new"
+        self.log(f"\n🪞 Preparando tabla sombra {sombra}...")
+        self.cursor.execute(f"DROP TABLE IF EXISTS {sombra}")
+        self.cursor.execute(f"CREATE TABLE {sombra} LIKE {tabla}")
+        unicos = {indice: datos for indice, datos in self.indices_unicos(sombra).items() if indice != 'PRIMARY'}
+        for indice in unicos:
+            self.cursor.execute(f"ALTER TABLE {sombra} DROP INDEX `{indice}`")
+        if unicos:
+            self.log(f"   Índices únicos diferidos hasta verificar conflictos: {', '.join(unicos)}")
+        self.log(f"✅ {sombra} creada; {tabla} sigue atendiendo mientras se carga")
+        return sombra, unicos
+    
+    def verificar_ids_repetidos(self, tabla, datos):
+        """Antes de cargar: la clave primaria no puede repetirse en el archivo"""
+        columnas, _ = self.indices_unicos(tabla).get('PRIMARY', ([], None))
+        if not columnas or not set(columnas) <= set(datos.columns):
+            return
+        claves = datos[columnas].dropna()
+        repetidos = claves[claves.duplicated(keep=False)]
+        if len(repetidos):
+            ejemplos = repetidos.drop_duplicates().head(10).to_dict('records')
+            raise RuntimeError(
+                f"{len(repetidos):,} filas repiten la clave primaria de {tabla} "
+                f"({', '.join(columnas)}), ej: {ejemplos}: no se carga la tabla sombra"
+            )
+    
+    def verificar_unicos(self, sombra, unicos):
+        """
+        Buscar valores repetidos en cada índice único diferido y volver a crearlo
+        
+        El GROUP BY usa la misma intercalación que el índice (ej. mayúsculas y acentos
+        iguales en utf8mb4_unicode_ci) y, como el índice, ignora las filas con NULL.
+        Si hay conflictos no se publica la tabla ({sombra} queda para revisarla).
+        """
+        conflictos = 0
+        for indice, (columnas, _) in unicos.items():
+            lista = ', '.join(f"`{columna}`" for columna in columnas)
+            no_nulas = ' AND '.join(f"`{columna}` IS NOT NULL" for columna in columnas)
+            self.cursor.execute(f"""
+                SELECT {lista}, COUNT(*) AS repeticiones FROM {sombra}
+                WHERE {no_nulas}
+                GROUP BY {lista} HAVING COUNT(*) > 1
+                ORDER BY repeticiones DESC
+            """)
+            repetidos = self.cursor.fetchall()
+            if repetidos:
+                conflictos += len(repetidos)
+                self.log(f"❌ {indice}: {len(repetidos):,} valores repetidos en {sombra}")
+                for fila in repetidos[:10]:
+                    valores = ', '.join(f"{columna}={fila[columna]!r}" for columna in columnas)
+                    self.log(f"   {valores} ({fila['repeticiones']} filas)")
+        if conflictos:
+            raise RuntimeError(
+                f"{sombra} tiene {conflictos:,} valores repetidos en índices únicos: "
+                f"no se reemplaza la tabla en producción ({sombra} queda para revisarla)"
+            )
+        
+        for indice, (_, definicion) in unicos.items():
+            self.cursor.execute(f"ALTER TABLE {sombra} ADD UNIQUE INDEX `{indice}` ({definicion})")
+        if unicos:
+            self.log(f"✅ Sin conflictos; índices únicos recreados: {', '.join(unicos)}")
+    
+    def verificar_conteo(self, tabla, filas_origen, errores):
+        """
+        Comprobar que la tabla tenga todas las filas del origen antes de publicarla
+        
+        Si alguna fila falló al insertarse no se publica, salvo con permitir_errores
+        (--permitir-errores); en ese caso se esperan las filas del origen menos las
+        que fallaron.
+        """
+        if errores and not self.permitir_errores:
+            raise RuntimeError(
+                f"{errores:,} de {filas_origen:,} filas fallaron al insertarse en {tabla}: "
+                f"no se reemplaza la tabla en producción ({tabla} queda para revisarla; "
+                f"--permitir-errores la publica igual)"
+            )
+        esperado = filas_origen - errores
+        self.cursor.execute(f"SELECT COUNT(*) as total FROM {tabla}")
+        total = self.cursor.fetchone()['total']
+        if total == 0 or total != esperado:
+            raise RuntimeError(
+                f"{tabla} tiene {total:,} filas y el origen {esperado:,} "
+                f"({filas_origen:,} leídas, {errores:,} con error): "
+                f"no se reemplaza la tabla en producción ({tabla} queda para revisarla)"
+            )
+        self.log(f"✅ Conteo verificado: {total:,} filas en {tabla}")
+    
+    def referencias_entrantes(self, tabla):
+        """Foreign keys de otras tablas que apuntan a la tabla (con sus reglas ON DELETE/UPDATE)"""
+        self.cursor.execute("""
+            SELECT k.TABLE_NAME AS tabla, k.CONSTRAINT_NAME AS restriccion,
+                   GROUP_CONCAT(k.COLUMN_NAME ORDER BY k.ORDINAL_POSITION) AS columnas,
+                   GROUP_CONCAT(k.REFERENCED_COLUMN_NAME ORDER BY k.ORDINAL_POSITION) AS referenciadas,
+                   r.DELETE_RULE AS al_borrar, r.UPDATE_RULE AS al_actualizar
+            FROM information_schema.KEY_COLUMN_USAGE k
+            JOIN information_schema.REFERENTIAL_CONSTRAINTS r
+              ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+             AND r.TABLE_NAME = k.TABLE_NAME
+            WHERE k.TABLE_SCHEMA = DATABASE() AND k.REFERENCED_TABLE_NAME = %s
+            GROUP BY k.TABLE_NAME, k.CONSTRAINT_NAME, r.DELETE_RULE, r.UPDATE_RULE
+        """, (tabla,))
+        return self.cursor.fetchall()
+    
+    def triggers_de(self, tabla):
+        """Sentencias CREATE TRIGGER originales de los triggers de la tabla"""
+        self.cursor.execute("""
+            SELECT TRIGGER_NAME AS nombre FROM information_schema.TRIGGERS
+            WHERE TRIGGER_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = %s
+        """, (tabla,))
+        triggers = []
+        for fila in self.cursor.fetchall():
+            self.cursor.execute(f"SHOW CREATE TRIGGER `{fila['nombre']}`")
+            triggers.append((fila['nombre'], self.cursor.fetchone()['SQL Original Statement']))
+        return triggers
+    
+    def verificar_huerfanos(self, tabla, sombra, referencias):
+        """
+        Antes del RENAME: filas de las tablas hijas que quedarían sin su fila en {sombra}
+        
+        Las foreign keys se recrean con FOREIGN_KEY_CHECKS = 0, así que sin esta
+        verificación las referencias rotas no se reportarían nunca. Las tablas hijas
+        que esta ejecución vuelve a cargar (ej. historial_cliente) se omiten: se
+        vacían después del RENAME y sus filas nuevas ya se resuelven contra {tabla}.
+        """
+        huerfanos = 0
+        verificadas = 0
+        for ref in referencias:
+            if ref['tabla'] != tabla and ref['tabla'] in self.reemplazadas:
+                self.log(f"   ⏭️ {ref['tabla']}.{ref['restriccion']}: se vuelve a cargar en esta ejecución")
+                continue
+            verificadas += 1
+            # Una FK de la tabla sobre sí misma se verifica dentro de la sombra
+            hija = sombra if ref['tabla'] == tabla else ref['tabla']
+            columnas = ref['columnas'].split(',')
+            referenciadas = ref['referenciadas'].split(',')
+            no_nulas = ' AND '.join(f"h.`{columna}` IS NOT NULL" for columna in columnas)
+            union = ' AND '.join(f"p.`{referenciada}` = h.`{columna}`"
+                                 for columna, referenciada in zip(columnas, referenciadas))
+            self.cursor.execute(f"""
+                SELECT COUNT(*) AS total FROM `{hija}` h
+                WHERE {no_nulas} AND NOT EXISTS (SELECT 1 FROM `{sombra}` p WHERE {union})
+            """)
+            total = self.cursor.fetchone()['total']
+            if total:
+                huerfanos += total
+                self.log(f"❌ {ref['tabla']}.{ref['restriccion']}: {total:,} filas sin su "
+                         f"{tabla}.{ref['referenciadas']} en {sombra}")
+        if huerfanos:
+            raise RuntimeError(
+                f"{huerfanos:,} filas de tablas hijas quedarían huérfanas: "
+                f"no se reemplaza la tabla en producción ({sombra} queda para revisarla)"
+            )
+        if verificadas:
+            self.log(f"✅ Sin huérfanos en {verificadas} tablas hijas")
+    
+    def intercambiar_tabla(self, tabla, sombra):
+        """
+        Publicar la tabla sombra con un único RENAME TABLE atómico
+        
+        La tabla anterior queda como {tabla}_old_YYYYMMDD_HHMMSS (el backup es el
+        propio RENAME, sin copiar filas). InnoDB hace que las foreign keys y los
+        triggers sigan a la tabla renombrada, así que después del RENAME se
+        vuelven a apuntar a la tabla nueva.
+        
+        Entre el RENAME y el último ALTER TABLE, las foreign keys de las tablas
+        hijas todavía apuntan a {tabla}_old_*: una fila hija escrita en esa ventana
+        se valida contra la tabla anterior. Cada RENAME/ALTER confirma
+        implícitamente, por eso la tabla sombra no admite la sesión masiva.
+        """
+        anterior = f"{tabla}_old_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        referencias = self.referencias_entrantes(tabla)
+        self.verificar_huerfanos(tabla, sombra, referencias)
+        triggers = self.triggers_de(tabla)
+        
+        self.log(f"\n🔁 RENAME TABLE {tabla} TO {anterior}, {sombra} TO {tabla}")
+        self.cursor.execute(f"RENAME TABLE {tabla} TO {anterior}, {sombra} TO {tabla}")
+        
+        # Sin verificar filas existentes: las FKs se recrean igual que estaban
+        self.cursor.execute("SET @fk_checks_previo = @@FOREIGN_KEY_CHECKS")
+        self.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            for ref in referencias:
+                self.cursor.execute(f"ALTER TABLE `{ref['tabla']}` DROP FOREIGN KEY `{ref['restriccion']}`")
+                self.cursor.execute(
+                    f"ALTER TABLE `{ref['tabla']}` ADD CONSTRAINT `{ref['restriccion']}` "
+                    f"FOREIGN KEY ({ref['columnas']}) REFERENCES `{tabla}` ({ref['referenciadas']}) "
+                    f"ON DELETE {ref['al_borrar']} ON UPDATE {ref['al_actualizar']}"
+                )
+                self.log(f"   🔗 {ref['tabla']}.{ref['restriccion']} → {tabla}")
+        finally:
+            self.cursor.execute("SET FOREIGN_KEY_CHECKS = @fk_checks_previo")
+        
+        for nombre, sentencia in triggers:
+            self.cursor.execute(f"DROP TRIGGER `{nombre}`")
+            self.cursor.execute(sentencia)
+            self.log(f"   ⚙️ Trigger {nombre} → {tabla}")
+        
+        self.log(f"✅ {tabla} reemplazada; la versión anterior quedó en {anterior}")
+        return anterior
+    
+    def leer_origen(self, carga):
+        """Leer el archivo de origen de la carga (fase '<carga>.leer')"""
+        self.log("📖 Leyendo archivo Excel...")
+        with self.reporte.fase(f"{carga.nombre}.leer", bytes_archivo=os.path.getsize(carga.archivo)) as fase:
+            df = carga.leer()
+            fase['filas'] = len(df)
+        self.log(f"✅ Archivo leído: {len(df):,} filas")
+        return df
+    
+    def compilar_carga(self, carga):
+        """Compilar la carga del mapeo con los tipos y largos de su tabla destino"""
+        esquema = EsquemaTabla.leer(self.cursor, carga.destino)
+        if esquema is None:
+            transformacion = carga.compilar()
+        else:
+            transformacion = carga.compilar(esquema.tipos(), esquema.longitudes())
+        if transformacion.ignoradas:
+            self.log(f"⚠️ Columnas del mapeo que no existen en {carga.destino}: {', '.join(transformacion.ignoradas)}")
+        return transformacion
+    
+    def transformar(self, carga, transformacion, df, resolutores=None):
+        """Aplicar la transformación por columnas y registrar sus avisos"""
+        self.log(f"🔄 Transformando {len(df):,} filas ({len(transformacion.columnas)} columnas)...")
+        datos = transformacion.aplicar(df, resolutores)
+        if transformacion.faltantes:
+            self.log(f"⚠️ Columnas que no trae {os.path.basename(carga.archivo)} (quedan vacías): "
+                     f"{', '.join(transformacion.faltantes)}")
+        for columna, resumen in transformacion.limpiador.fechas_no_convertidas.items():
+            self.log(f"⚠️ {columna}: {resumen['total']:,} fechas no convertidas "
+                     f"(ej: {', '.join(map(str, resumen['ejemplos']))})")
+        for columna, cantidad in transformacion.limpiador.recortados.items():
+            self.log(f"⚠️ {columna}: {cantidad:,} valores recortados a {transformacion.longitudes[columna]} caracteres")
+        return datos
+    
+    def insertar_lotes(self, tabla, datos, tamano_lote):
+        """
+        Insertar un DataFrame ya transformado con un INSERT multi-fila por lote
+        
+        Cada lote es una sola sentencia (executemany la reescribe como INSERT ... VALUES
+        (...), (...)) y se confirma al terminar (en sesión masiva se confirma todo al
+        final). Si un lote falla no se inserta ninguna de sus filas, así que se repite
+        fila por fila para insertar las válidas y contar las que fallan.
+        """
+        columnas = list(datos.columns)
+        query = (f"INSERT INTO {tabla} ({', '.join(f'`{columna}`' for columna in columnas)}) "
+                 f"VALUES ({', '.join(['%s'] * len(columnas))})")
+        filas = list(datos.itertuples(index=False, name=None))
+        indices = list(datos.index)
+        
+        insertados = 0
+        errores = 0
+        
+        for inicio in range(0, len(filas), tamano_lote):
+            lote = filas[inicio:inicio + tamano_lote]
+            try:
+                self.cursor.executemany(query, lote)
+                insertados += len(lote)
+            except mysql.connector.Error:
+                for idx, fila in zip(indices[inicio:inicio + tamano_lote], lote):
+                    try:
+                        self.cursor.execute(query, fila)
+                        insertados += 1
+                    except mysql.connector.Error as e:
+                        errores += 1
+                        if errores <= 10:  # Solo mostrar primeros 10 errores
+                            self.log(f"   ⚠️ Error en fila {idx}: {e}")
+            
+            if not self.sesion:
+                self.conn.commit()
+            self.log(f"   ⏳ Insertados: {insertados:,}/{len(filas):,}")
+        
+        return insertados, errores
+    
+    def importar_clientes(self, carga):
+        """Importar clientes según la carga del mapeo"""
         self.log(f"\n{'='*80}")
-        self.log(f"IMPORTANDO CLIENTES DESDE: {archivo_excel}")
+        self.log(f"IMPORTANDO CLIENTES DESDE: {carga.archivo}")
         self.log("="*80)
         
         # Leer Excel
-        self.log("📖 Leyendo archivo Excel...")
-        df = pd.read_excel(archivo_excel)
-        self.log(f"✅ Archivo leído: {len(df):,} filas")
+        df = self.leer_origen(carga)
         self.log(f"Columnas encontradas: {list(df.columns)}")
         
-        # Hacer backup
-        backup = self.hacer_backup('clientes')
+        # Columnas, tipos y conversiones salen del mapeo (se compila una vez)
+        transformacion = self.compilar_carga(carga)
         
-        # Vaciar tabla
-        self.vaciar_tabla('clientes')
+        if self.tabla_sombra:
+            # Se carga en clientes_new; el backup es el RENAME del final
+            with self.reporte.fase(f"{carga.nombre}.tabla_sombra"):
+                destino, unicos = self.preparar_tabla_sombra(carga.destino)
+        else:
+            destino = carga.destino
+            
+            # Hacer backup
+            backup = self.respaldar(carga)
+            
+            # Vaciar tabla
+            with self.reporte.fase(f"{carga.nombre}.vaciar"):
+                self.vaciar_tabla(carga.destino)
         
-        # Preparar datos
-        self.log(f"\n📝 Insertando {len(df):,} clientes...")
-        
-        # Mapeo de columnas del Excel a la BD
-        columnas_bd = [
-            'id', 'nombre', 'tipo_base', 'leads_original_telefono', 'campana', 
-            'canal_adquisicion', 'sala_asignada', 'compania', 'back_office_info',
-            'tipificacion_back', 'datos_leads', 'comentarios_back', 'ultima_fecha_gestion',
-            'telefono', 'fecha_ultimo_contacto', 'notas', 'created_at', 'updated_at',
-            'tipo_cliente_wizard', 'lead_score', 'telefono_registro', 'fecha_nacimiento',
-            'dni_nombre_titular', 'parentesco_titular', 'telefono_referencia_wizard',
-            'telefono_grabacion_wizard', 'direccion_completa', 'numero_piso_wizard',
-            'tipo_plan', 'servicio_contratado', 'velocidad_contratada', 'precio_plan',
-            'dispositivos_adicionales_wizard', 'plataforma_digital_wizard',
-            'pago_adelanto_instalacion_wizard', 'wizard_completado', 'fecha_wizard_completado',
-            'wizard_data_json', 'dni', 'asesor_asignado', 'validador_asignado',
-            'fecha_asignacion_validador', 'estatus_wizard', 'seguimiento_status',
-            'derivado_at', 'opened_at', 'last_activity', 'estatus_comercial_categoria',
-            'estatus_comercial_subcategoria', 'quality_status', 'returned_at',
-            'es_duplicado', 'telefono_principal_id', 'cantidad_duplicados', 'tipificacion_original'
-        ]
-        
-        # Construir query de inserción
-        placeholders = ', '.join(['%s'] * len(columnas_bd))
-        columnas_str = ', '.join(columnas_bd)
-        query = f"INSERT INTO clientes ({columnas_str}) VALUES ({placeholders})"
+        with self.reporte.fase(f"{carga.nombre}.transformar", filas=len(df)):
+            datos = self.transformar(carga, transformacion, df)
         
-        insertados = 0
-        errores = 0
+        if self.tabla_sombra:
+            self.verificar_ids_repetidos(destino, datos)
         
-        for idx, row in df.iterrows():
-            try:
-                # Preparar valores
-                valores = []
-                for col in columnas_bd:
-                    valor = row.get(col)
-                    
-                    # Manejar valores nulos
-                    if pd.isna(valor):
-                        valores.append(None)
-                    # Convertir fechas
-                    elif 'fecha' in col or 'created_at' in col or 'updated_at' in col or col.endswith('_at'):
-                        if pd.notna(valor):
-                            try:
-                                if isinstance(valor, str):
-                                    valores.append(pd.to_datetime(valor).strftime('%Y-%m-%d %H:%M:%S'))
-                                else:
-                                    valores.append(valor.strftime('%Y-%m-%d %H:%M:%S'))
-                            except:
-                                valores.append(None)
-                        else:
-                            valores.append(None)
-                    # Otros valores
-                    else:
-                        valores.append(str(valor) if pd.notna(valor) else None)
-                
-                self.cursor.execute(query, valores)
-                insertados += 1
-                
-                if insertados % 1000 == 0:
-                    self.conn.commit()
-                    self.log(f"   ⏳ Insertados: {insertados:,}/{len(df):,}")
-                    
-            except Exception as e:
-                errores += 1
-                if errores <= 10:  # Solo mostrar primeros 10 errores
-                    self.log(f"   ⚠️ Error en fila {idx}: {e}")
-        
-        self.conn.commit()
+        # Preparar datos
+        self.log(f"\n📝 Insertando {len(datos):,} clientes...")
+        with self.reporte.fase(f"{carga.nombre}.insertar") as fase:
+            insertados, errores = self.insertar_lotes(destino, datos, carga.tamano_lote)
+            fase['filas'] = insertados
+        
+        if self.tabla_sombra:
+            with self.reporte.fase(f"{carga.nombre}.unicos"):
+                self.verificar_unicos(destino, unicos)
+            with self.reporte.fase(f"{carga.nombre}.intercambio"):
+                self.verificar_conteo(destino, len(datos), errores)
+                backup = self.intercambiar_tabla(carga.destino, destino)
         
         self.log(f"\n✅ IMPORTACIÓN CLIENTES COMPLETADA:")
         self.log(f"   Total insertados: {insertados:,}")
@@ -160,122 +725,70 @@ class ReemplazadorTablas:
         
         return insertados, errores
     
-    def importar_historial(self, archivo_excel):
-        """Importar historial desde Excel"""
+    def importar_historial(self, carga):
+        """Importar historial según la carga del mapeo"""
         self.log(f"\n{'='*80}")
-        self.log(f"IMPORTANDO HISTORIAL DESDE: {archivo_excel}")
+        self.log(f"IMPORTANDO HISTORIAL DESDE: {carga.archivo}")
         self.log("="*80)
         
         # Leer Excel
-        self.log("📖 Leyendo archivo Excel...")
-        df = pd.read_excel(archivo_excel)
-        self.log(f"✅ Archivo leído: {len(df):,} filas")
+        df = self.leer_origen(carga)
         self.log(f"Columnas encontradas: {list(df.columns)[:10]}...")  # Primeras 10
         
+        # El archivo de historial (ej. aña2.xlsx) tiene columnas diferentes:
+        # el mapeo dice cómo se arma cada columna de historial_cliente
+        transformacion = self.compilar_carga(carga)
+        
         # Hacer backup
-        backup = self.hacer_backup('historial_cliente')
+        backup = self.respaldar(carga)
         
         # Vaciar tabla
-        self.vaciar_tabla('historial_cliente')
-        
-        # Preparar datos
-        self.log(f"\n📝 Insertando {len(df):,} registros de historial...")
+        with self.reporte.fase(f"{carga.nombre}.vaciar"):
+            self.vaciar_tabla(carga.destino)
         
-        # El archivo aña2.xlsx tiene columnas diferentes
-        # Necesitamos mapear a la estructura de historial_cliente
+        with self.reporte.fase(f"{carga.nombre}.indices") as fase:
+            # dni → id y teléfono → id de los clientes, cargados una sola vez
+            self.log("🗂️ Cargando índice de clientes por DNI y teléfono...")
+            resolutor = ResolutorClientes(self.cursor)
+            self.log(f"✅ {len(resolutor.por_dni):,} DNIs y {len(resolutor.por_telefono):,} teléfonos en memoria")
+            
+            # Nombres de asesores: cada nombre distinto se compara una sola vez contra usuarios
+            asesores = ResolutorAsesores(self.cursor)
+            fase['filas'] = len(resolutor.por_telefono) + len(asesores.usuarios)
         
-        insertados = 0
-        errores = 0
-        sin_cliente_id = 0
+        with self.reporte.fase(f"{carga.nombre}.transformar", filas=len(df)):
+            datos = self.transformar(carga, transformacion, df, {'cliente': resolutor, 'asesor': asesores})
         
-        for idx, row in df.iterrows():
-            try:
-                # Buscar cliente_id por DNI o teléfono
-                cliente_id = None
-                
-                # Buscar por DNI si existe
-                if 'DNI' in row and pd.notna(row['DNI']):
-                    dni = str(row['DNI']).strip()
-                    self.cursor.execute("SELECT id FROM clientes WHERE dni = %s LIMIT 1", (dni,))
-                    resultado = self.cursor.fetchone()
-                    if resultado:
-                        cliente_id = resultado['id']
-                
-                # Buscar por teléfono en LEADS si no encontró por DNI
-                if not cliente_id and 'LEADS' in row and pd.notna(row['LEADS']):
-                    telefono = str(row['LEADS']).strip()
-                    self.cursor.execute(
-                        "SELECT id FROM clientes WHERE telefono = %s OR telefono LIKE %s LIMIT 1",
-                        (telefono, f"%{telefono}%")
-                    )
-                    resultado = self.cursor.fetchone()
-                    if resultado:
-                        cliente_id = resultado['id']
-                
-                if not cliente_id:
-                    sin_cliente_id += 1
-                    continue
-                
-                # Usuario ID - buscar asesor
-                usuario_id = 1  # Usuario por defecto (admin)
-                if 'AS.FINAL' in row and pd.notna(row['AS.FINAL']):
-                    asesor_nombre = str(row['AS.FINAL']).strip()
-                    self.cursor.execute(
-                        "SELECT id FROM usuarios WHERE nombre LIKE %s LIMIT 1",
-                        (f"%{asesor_nombre}%",)
-                    )
-                    resultado = self.cursor.fetchone()
-                    if resultado:
-                        usuario_id = resultado['id']
-                
-                # Preparar datos de historial
-                accion = row.get('TIPIFICACION FINAL', 'Gestión importada')
-                if pd.isna(accion):
-                    accion = 'Gestión importada'
-                
-                # Preparar descripción con detalles
-                descripcion_partes = []
-                if 'COMENTARIO ASESOR' in row and pd.notna(row['COMENTARIO ASESOR']):
-                    descripcion_partes.append(f"Comentario: {row['COMENTARIO ASESOR']}")
-                if 'TIPIFICACION BACK' in row and pd.notna(row['TIPIFICACION BACK']):
-                    descripcion_partes.append(f"Tipificación Back: {row['TIPIFICACION BACK']}")
-                if 'CAMPAÑA' in row and pd.notna(row['CAMPAÑA']):
-                    descripcion_partes.append(f"Campaña: {row['CAMPAÑA']}")
-                if 'COMENTARIO GESTIÓN 2' in row and pd.notna(row['COMENTARIO GESTIÓN 2']):
-                    descripcion_partes.append(f"Gestión 2: {row['COMENTARIO GESTIÓN 2']}")
-                
-                descripcion = ' | '.join(descripcion_partes) if descripcion_partes else 'Gestión importada'
-                
-                # Estados
-                estado_anterior = row.get('TIPIFICACION BACK', 'Importado')
-                if pd.isna(estado_anterior):
-                    estado_anterior = 'Importado'
-                    
-                estado_nuevo = accion
-                
-                # Insertar (created_at se establece automáticamente)
-                self.cursor.execute("""
-                    INSERT INTO historial_cliente 
-                    (cliente_id, usuario_id, accion, descripcion, estado_anterior, estado_nuevo)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (cliente_id, usuario_id, accion, descripcion, estado_anterior, estado_nuevo))
-                
-                insertados += 1
-                
-                if insertados % 1000 == 0:
-                    self.conn.commit()
-                    self.log(f"   ⏳ Insertados: {insertados:,}/{len(df):,}")
-                    
-            except Exception as e:
-                errores += 1
-                if errores <= 10:
-                    self.log(f"   ⚠️ Error en fila {idx}: {e}")
-        
-        self.conn.commit()
+        # Preparar datos
+        self.log(f"\n📝 Insertando {len(datos):,} registros de historial...")
+        with self.reporte.fase(f"{carga.nombre}.insertar") as fase:
+            insertados, errores = self.insertar_lotes(carga.destino, datos, carga.tamano_lote)
+            fase['filas'] = insertados
         
         self.log(f"\n✅ IMPORTACIÓN HISTORIAL COMPLETADA:")
         self.log(f"   Total insertados: {insertados:,}")
-        self.log(f"   Sin cliente_id: {sin_cliente_id:,}")
+        for columna, descartadas in transformacion.descartadas.items():
+            self.log(f"   Sin {columna}: {descartadas:,}")
+        self.log(f"   Clientes resueltos por DNI: {resolutor.estadisticas['dni']:,}, "
+                 f"por teléfono exacto: {resolutor.estadisticas['telefono']:,}, "
+                 f"por sufijo del teléfono: {resolutor.estadisticas['sufijo']:,}, "
+                 f"sin asignar por sufijo ambiguo: {resolutor.estadisticas['sufijo_ambiguo']:,}")
+        self.log(f"   Asesores: {len(asesores.cache):,} nombres distintos, "
+                 f"{asesores.estadisticas['reconocido']:,} filas reconocidas, "
+                 f"{asesores.estadisticas['ambiguo']:,} ambiguas, "
+                 f"{asesores.estadisticas['sin_coincidencia']:,} sin coincidencia")
+        
+        revision_clientes = self.log_file.replace('reemplazo_completo_', 'revision_clientes_').replace('.log', '.csv')
+        ambiguos = resolutor.guardar_revision(revision_clientes)
+        if ambiguos:
+            self.log(f"   ⚠️ {ambiguos:,} teléfonos coinciden por sufijo con más de un cliente "
+                     f"(filas sin cliente); revisar {revision_clientes}")
+        
+        revision = self.log_file.replace('reemplazo_completo_', 'revision_asesores_').replace('.log', '.csv')
+        a_revisar = asesores.guardar_revision(revision)
+        if a_revisar:
+            self.log(f"   ⚠️ {a_revisar:,} nombres de asesor quedaron con el usuario "
+                     f"{ResolutorAsesores.USUARIO_POR_DEFECTO}; revisar {revision}")
         self.log(f"   Errores: {errores}")
         self.log(f"   Backup guardado en tabla: {backup}")
         
@@ -320,39 +833,107 @@ class ReemplazadorTablas:
         for gestion in self.cursor.fetchall():
             self.log(f"   ID {gestion['id']}: Cliente {gestion['cliente_id']} ({gestion['nombre']}) - {gestion['accion']} - {gestion['fecha']}")
     
+    def confirmar_sesion(self):
+        """
+        Revisar por conjuntos las foreign keys y claves únicas que la sesión masiva no
+        verificó y hacer COMMIT solo si no hay problemas (si los hay, rollback y error)
+        """
+        self.log(f"\n{'='*80}")
+        self.log("VERIFICACIÓN DE INTEGRIDAD (sesión masiva)")
+        self.log("="*80)
+        
+        problemas = self.sesion.confirmar()
+        if not problemas:
+            self.log("✅ Sin filas huérfanas ni claves repetidas: carga confirmada")
+            return
+        for restriccion, filas in problemas.items():
+            self.log(f"   ❌ {restriccion}: {filas:,} filas con problema")
+        raise RuntimeError(f"Carga deshecha (rollback): {len(problemas)} restricciones con problemas "
+                           f"de integridad; las tablas quedan como antes de la sesión masiva")
+    
+    def guardar_reporte(self, estado):
+        """Guardar el reporte de fases y mostrar las fases más lentas que en la ejecución anterior"""
+        try:
+            ruta = self.reporte.guardar(estado)
+        except OSError as e:
+            self.log(f"⚠️ No se pudo guardar el reporte de fases: {e}")
+            return
+        
+        self.log(f"\n⏱️ TIEMPOS POR FASE:")
+        for fase in self.reporte.fases:
+            detalle = f"   {fase['fase']}: {fase['segundos']:.1f}s"
+            if fase.get('filas_por_segundo'):
+                detalle += f" ({fase['filas']:,} filas, {fase['filas_por_segundo']:,.0f} filas/s)"
+            if fase.get('viajes_bd') is not None:
+                detalle += f" · {fase['viajes_bd']:,} viajes a la BD"
+            self.log(detalle)
+        
+        if self.reporte.anterior:
+            regresiones = [c for c in self.reporte.comparacion if c['regresion']]
+            self.log(f"   Comparado con {self.reporte.anterior.name}: {len(regresiones)} fases más lentas")
+            for c in regresiones:
+                self.log(f"   ⚠️ {c['fase']}: {c['segundos_anterior']:.1f}s → {c['segundos']:.1f}s "
+                         f"({c['variacion']:+.0%})")
+        self.log(f"📄 Reporte de fases: {ruta}")
+    
     def ejecutar(self):
         """Ejecutar proceso completo"""
+        estado = 'error'
         try:
             self.log("🚀 INICIANDO REEMPLAZO COMPLETO DE TABLAS")
             self.log(f"⏰ Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             
+            # Cargas del archivo de mapeo (se valida antes de tocar la BD)
+            self.log(f"🗺️ Mapeo: {self.mapeo}")
+            cargas = cargar_mapeo(self.mapeo)
+            self.reemplazadas = {carga.destino for carga in cargas.values()}
+            
             # Conectar
             self.conectar_bd()
             
+            if self.sesion_masiva:
+                # CREATE TABLE confirma implícitamente: los backups van antes de abrir la transacción
+                for nombre in ('clientes', 'historial'):
+                    self.respaldar(cargas[nombre])
+                self.sesion = SesionMasiva(self.conn, ['clientes', 'historial_cliente'])
+                self.sesion.activar()
+                self.log("⚡ Sesión de carga masiva activa (una sola transacción, sin UNIQUE_CHECKS "
+                         "ni FOREIGN_KEY_CHECKS)")
+            
             # Importar clientes
-            clientes_ok, clientes_err = self.importar_clientes(
-                "C:/Users/USER/Desktop/ARCHIVOS/clientes (updated) 2.xlsx"
-            )
+            clientes_ok, clientes_err = self.importar_clientes(cargas['clientes'])
             
             # Importar historial
-            historial_ok, historial_err = self.importar_historial(
-                "C:/Users/USER/Desktop/ARCHIVOS/aña2.xlsx"
-            )
+            historial_ok, historial_err = self.importar_historial(cargas['historial'])
             
             # Verificar
-            self.verificar_importacion()
+            with self.reporte.fase("verificacion"):
+                self.verificar_importacion()
+            if self.sesion:
+                with self.reporte.fase("integridad"):
+                    self.confirmar_sesion()
             
             self.log(f"\n{'='*80}")
             self.log("✅ PROCESO COMPLETADO EXITOSAMENTE")
             self.log("="*80)
             self.log(f"📄 Log guardado en: {self.log_file}")
+            estado = 'ok'
             
         except Exception as e:
             self.log(f"\n❌ ERROR CRÍTICO: {e}")
             import traceback
             self.log(traceback.format_exc())
+            if self.conn:
+                self.conn.rollback()
             raise
         finally:
+            self.guardar_reporte(estado)
+            
+            if self.sesion:
+                if self.sesion.restaurar():
+                    self.log("⚡ Sesión de carga masiva restaurada")
+                else:
+                    self.log("❌ No se pudo restaurar la sesión de carga masiva")
             if self.cursor:
                 self.cursor.close()
             if self.conn:
@@ -360,5 +941,20 @@ class ReemplazadorTablas:
                 self.log("\n🔌 Conexión cerrada")
 
 if __name__ == "__main__":
-    reemplazador = ReemplazadorTablas()
+    parser = argparse.ArgumentParser(description="Reemplazo completo de clientes e historial_cliente desde Excel")
+    parser.add_argument('--sesion-masiva', action='store_true',
+                        help="Cargar sin UNIQUE/FOREIGN_KEY_CHECKS ni autocommit y verificar integridad al final")
+    parser.add_argument('--tabla-sombra', action='store_true',
+                        help="Cargar clientes en clientes_new y publicarla con un RENAME atómico")
+    parser.add_argument('--permitir-errores', action='store_true',
+                        help="Con --tabla-sombra, publicar la tabla aunque algunas filas fallen al insertarse")
+    parser.add_argument('--mapeo', default=str(RUTA_MAPEO),
+                        help="Archivo de mapeo JSON/YAML con los archivos de origen y las columnas "
+                             "(por defecto mapeos/reemplazo_completo.json)")
+    args = parser.parse_args()
+    if args.sesion_masiva and args.tabla_sombra:
+        parser.error("--sesion-masiva no se puede combinar con --tabla-sombra")
+    
+    reemplazador = ReemplazadorTablas(sesion_masiva=args.sesion_masiva, tabla_sombra=args.tabla_sombra,
+                                      mapeo=args.mapeo, permitir_errores=args.permitir_errores)
     reemplazador.ejecutar()
@@ -0,0 +1,200 @@
+"""
+Logging asíncrono y muestreado para los importadores CSV/XLSX → MySQL
+Compartido por importar_csv_clientes.py e importar_csv_historial.py
+
+- Los registros pasan por un QueueHandler: el hilo que importa solo encola y un
+  QueueListener en segundo plano escribe en archivo y consola.
+- Los eventos por fila (insertado, actualizado, duplicado...) se cuentan siempre
+  pero solo se detallan los primeros y luego uno cada pocos segundos por tipo.
+- Las filas rechazadas se registran completas en un archivo JSON Lines aparte
+  (logs/rechazos_<nombre>_YYYYMMDD_HHMMSS.jsonl), una línea por fila.
+"""
+
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Dict, Tuple
+
+log_dir = Path(__file__).parent / "logs"
+
+FORMATO = '%(asctime)s - %(levelname)s - %(message)s'
+
+_handlers = []
+# Listener en marcha (None si no hay) y proceso que lo inició: un worker creado con
+# fork hereda la variable, pero el hilo del listener no existe en el proceso hijo
+_listener = None
+_pid_listener = None
+
+
+class FiltroRechazos(logging.Filter):
+    """Separar los registros de filas rechazadas del log normal"""
+
+    def __init__(self, solo_rechazos: bool):
+        super().__init__()
+        self.solo_rechazos = solo_rechazos
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return hasattr(record, 'rechazo') == self.solo_rechazos
+
+
+class FormatoRechazo(logging.Formatter):
+    """Una fila rechazada por línea, en JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        rechazo = dict(record.rechazo)
+        rechazo['fecha'] = datetime.fromtimestamp(record.created).isoformat(timespec='seconds')
+        return json.dumps(rechazo, ensure_ascii=False, default=str)
+
+
+def configurar_logging(nombre: str) -> Tuple[Path, Path]:
+    """
+    Configurar el logging de un importador (archivo + consola + rechazos)
+
+    Se llama desde el punto de entrada (main() o la interfaz), no al importar el
+    módulo: importar un importador desde otro script o desde las pruebas no crea
+    archivos de log ni hilos.
+
+    Returns:
+        (archivo de log, archivo de rechazos); se crean recién al primer registro
+    """
+    global _listener, _pid_listener
+
+    log_dir.mkdir(exist_ok=True)
+    marca = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_file = log_dir / f"{nombre}_{marca}.log"
+    rechazos_file = log_dir / f"rechazos_{nombre}_{marca}.jsonl"
+
+    formato = logging.Formatter(FORMATO)
+    archivo = logging.FileHandler(log_file, encoding='utf-8', delay=True)
+    consola = logging.StreamHandler()
+    for handler in (archivo, consola):
+        handler.setFormatter(formato)
+        handler.addFilter(FiltroRechazos(False))
+
+    rechazos = logging.FileHandler(rechazos_file, encoding='utf-8', delay=True)
+    rechazos.setFormatter(FormatoRechazo())
+    rechazos.addFilter(FiltroRechazos(True))
+
+    # Otro importador ya configuró el logging en este proceso (un script que usa ambos)
+    detener_listener()
+    _handlers[:] = [archivo, consola, rechazos]
+
+    cola = queue.SimpleQueue()
+    _listener = QueueListener(cola, *_handlers, respect_handler_level=True)
+    _listener.start()
+    _pid_listener = os.getpid()
+    atexit.register(detener_listener)
+
+    raiz = logging.getLogger()
+    raiz.setLevel(logging.INFO)
+    for handler in raiz.handlers[:]:
+        raiz.removeHandler(handler)
+    raiz.addHandler(QueueHandler(cola))
+
+    return log_file, rechazos_file
+
+
+def detener_listener():
+    """Detener el listener de este proceso (si hay uno en marcha); vacía la cola antes de salir"""
+    global _listener, _pid_listener
+
+    listener, _listener = _listener, None
+    atexit.unregister(detener_listener)
+    if listener is not None and _pid_listener == os.getpid():
+        listener.stop()
+    _pid_listener = None
+
+
+@contextmanager
+def cola_para_workers():
+    """Cola entre procesos para que los workers escriban en el mismo log y rechazos"""
+    cola = multiprocessing.Queue(-1)
+    listener = QueueListener(cola, *_handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        yield cola
+    finally:
+        listener.stop()
+        cola.close()
+
+
+def iniciar_worker(cola):
+    """Initializer de ProcessPoolExecutor: enviar los registros del worker a la cola del padre"""
+    # Con fork el worker hereda el listener del padre sin su hilo: solo se descarta
+    detener_listener()
+
+    raiz = logging.getLogger()
+    for handler in raiz.handlers[:]:
+        raiz.removeHandler(handler)
+    raiz.addHandler(QueueHandler(cola))
+
+
+class RegistroFilas:
+    """
+    Contadores por tipo de evento de fila + detalle muestreado + archivo de rechazos
+
+    Se detallan los primeros DETALLE_INICIAL eventos de cada tipo y después como
+    máximo uno cada INTERVALO_SEGUNDOS (indicando cuántos similares se omitieron).
+    Los rechazos siempre se escriben completos en el archivo de rechazos.
+    """
+
+    DETALLE_INICIAL = 20
+    INTERVALO_SEGUNDOS = 2.0
+
+    def __init__(self, tabla: str, logger: logging.Logger):
+        self.tabla = tabla
+        self.logger = logger
+        self.reiniciar()
+
+    def reiniciar(self, archivo: str = None):
+        """Empezar los contadores de una nueva importación"""
+        self.archivo = archivo
+        self.contadores = Counter()
+        self.omitidos = Counter()
+        self.ultimo_detalle = {}
+
+    def detalle(self, tipo: str, mensaje: str, *args, nivel: int = logging.INFO):
+        """Contar un evento de fila y registrarlo solo si toca según el muestreo"""
+        self.contadores[tipo] += 1
+
+        if self.contadores[tipo] > self.DETALLE_INICIAL:
+            ahora = time.monotonic()
+            if ahora - self.ultimo_detalle.get(tipo, 0.0) < self.INTERVALO_SEGUNDOS:
+                self.omitidos[tipo] += 1
+                return
+            self.ultimo_detalle[tipo] = ahora
+
+        omitidos = self.omitidos.pop(tipo, 0)
+        if omitidos:
+            mensaje += f" (+{omitidos} similares sin detalle)"
+        self.logger.log(nivel, mensaje, *args)
+
+    def rechazo(self, fila: int, motivo: str, datos: Dict, mensaje: str, *args,
+                nivel: int = logging.WARNING):
+        """Registrar una fila rechazada (detalle muestreado + línea completa en rechazos)"""
+        self.detalle(f"rechazo: {motivo}", mensaje, *args, nivel=nivel)
+        self.logger.info(motivo, extra={'rechazo': {
+            'tabla': self.tabla,
+            'archivo': self.archivo,
+            'fila': fila,
+            'motivo': motivo,
+            'mensaje': mensaje % args if args else mensaje,
+            'datos': datos,
+        }})
+
+    def total_rechazos(self) -> int:
+        return sum(n for tipo, n in self.contadores.items() if tipo.startswith('rechazo'))
+
+    def resumen(self):
+        """Registrar los contadores de eventos por tipo"""
+        for tipo, cantidad in sorted(self.contadores.items()):
+            self.logger.info(f"   • {tipo}: {cantidad}")
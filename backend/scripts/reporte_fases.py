@@ -0,0 +1,147 @@
+"""
+Tiempos por fase de reemplazar_tablas_completas.py en un reporte JSON
+
+Cada fase (leer el Excel, backup, vaciar, transformar, insertar, verificar...)
+registra su tiempo, las filas procesadas y filas/s, los bytes leídos del
+archivo y, del lado de MySQL, los viajes a la BD (variable de sesión
+Questions: sentencias enviadas) y los bytes enviados y recibidos.
+
+El reporte se guarda junto al log (logs/reporte_reemplazo_YYYYMMDD_HHMMSS.json)
+con una comparación contra el último reporte completo anterior, para ver qué
+fase se vuelve más lenta a medida que crecen las planillas.
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ReporteFases:
+    """Mediciones por fase de una ejecución y su comparación con la anterior"""
+
+    # Variables de sesión de MySQL que se restan entre el inicio y el fin de cada fase
+    ESTADO_SESION = {'Questions': 'viajes_bd', 'Bytes_sent': 'bytes_desde_bd', 'Bytes_received': 'bytes_hacia_bd'}
+
+    # Una fase que tarda más que esto respecto de la ejecución anterior se marca como regresión
+    UMBRAL_REGRESION = 0.2
+    # ...y al menos esta cantidad de segundos (las fases cortas varían mucho en proporción)
+    MINIMO_REGRESION = 1.0
+
+    def __init__(self, ruta, conn=None):
+        self.ruta = Path(ruta)
+        self.conn = conn
+        self.inicio = datetime.now()
+        self.fases: List[Dict] = []
+        self.comparacion: List[Dict] = []
+        self.anterior: Optional[Path] = None
+
+    def estado_sesion(self) -> Optional[Dict[str, int]]:
+        """Contadores de la sesión MySQL (None sin conexión o si no se pudieron leer)"""
+        if self.conn is None:
+            return None
+        try:
+            cursor = self.conn.cursor()
+            try:
+                marcadores = ', '.join(['%s'] * len(self.ESTADO_SESION))
+                cursor.execute(f"SHOW SESSION STATUS WHERE Variable_name IN ({marcadores})",
+                               tuple(self.ESTADO_SESION))
+                return {nombre: int(valor) for nombre, valor in cursor.fetchall()}
+            finally:
+                cursor.close()
+        except Exception as e:
+            logger.debug(f"No se pudo leer el estado de la sesión: {e}")
+            return None
+
+    @contextmanager
+    def fase(self, nombre: str, filas: Optional[int] = None, bytes_archivo: Optional[int] = None):
+        """
+        Medir una fase; dentro del bloque se puede completar medicion['filas']
+
+        Si la fase lanza una excepción se registra con su error y la excepción sigue.
+        """
+        medicion = {'fase': nombre, 'filas': filas, 'bytes_archivo': bytes_archivo}
+        estado_inicio = self.estado_sesion()
+        inicio = time.perf_counter()
+        try:
+            yield medicion
+        except Exception as e:
+            medicion['error'] = str(e)
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            medicion['segundos'] = round(segundos, 3)
+            if medicion['filas'] is not None and segundos > 0:
+                medicion['filas_por_segundo'] = round(medicion['filas'] / segundos, 1)
+
+            estado_fin = self.estado_sesion()
+            if estado_inicio and estado_fin:
+                for variable, clave in self.ESTADO_SESION.items():
+                    medicion[clave] = estado_fin[variable] - estado_inicio[variable]
+                # El SHOW STATUS del final también cuenta como sentencia
+                medicion['viajes_bd'] -= 1
+            self.fases.append(medicion)
+
+    def buscar_anterior(self) -> Optional[Dict]:
+        """Último reporte completo (estado 'ok') anterior a este en la misma carpeta"""
+        patron = self.ruta.name.rsplit('_', 2)[0] + '_*.json'
+        for ruta in sorted(self.ruta.parent.glob(patron), reverse=True):
+            if ruta.name >= self.ruta.name:
+                continue
+            try:
+                reporte = json.loads(ruta.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            if reporte.get('estado') == 'ok':
+                self.anterior = ruta
+                return reporte
+        return None
+
+    def comparar(self, anterior: Dict) -> List[Dict]:
+        """Variación de tiempo y filas/s por fase respecto del reporte anterior"""
+        fases_anteriores = {fase['fase']: fase for fase in anterior.get('fases', [])}
+        comparacion = []
+        for fase in self.fases:
+            previa = fases_anteriores.get(fase['fase'])
+            if previa is None or not previa.get('segundos'):
+                continue
+            variacion = (fase['segundos'] - previa['segundos']) / previa['segundos']
+            comparacion.append({
+                'fase': fase['fase'],
+                'segundos_anterior': previa['segundos'],
+                'segundos': fase['segundos'],
+                'variacion': round(variacion, 3),
+                'filas_anterior': previa.get('filas'),
+                'filas': fase.get('filas'),
+                'filas_por_segundo_anterior': previa.get('filas_por_segundo'),
+                'filas_por_segundo': fase.get('filas_por_segundo'),
+                'regresion': (variacion > self.UMBRAL_REGRESION
+                              and fase['segundos'] - previa['segundos'] >= self.MINIMO_REGRESION)
+            })
+        return comparacion
+
+    def guardar(self, estado: str = 'ok', extra: Optional[Dict] = None) -> Path:
+        """Escribir el reporte JSON (con la comparación contra la ejecución anterior)"""
+        anterior = self.buscar_anterior()
+        self.comparacion = self.comparar(anterior) if anterior else []
+
+        reporte = {
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'fin': datetime.now().isoformat(timespec='seconds'),
+            'estado': estado,
+            'segundos_total': round((datetime.now() - self.inicio).total_seconds(), 3),
+            'fases': self.fases,
+            'reporte_anterior': self.anterior.name if self.anterior else None,
+            'comparacion': self.comparacion
+        }
+        if extra:
+            reporte.update(extra)
+
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.ruta.write_text(json.dumps(reporte, indent=2, ensure_ascii=False), encoding='utf-8')
+        return self.ruta
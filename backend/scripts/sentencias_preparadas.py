@@ -0,0 +1,90 @@
+"""
+Sentencias preparadas (server-side) reutilizadas por forma de sentencia
+Compartido por importar_csv_clientes.py e importar_csv_historial.py
+
+Los importadores omiten las columnas nulas de cada fila para que la BD aplique
+sus defaults, así que el texto del INSERT depende de qué columnas trae cada
+fila. Cada forma distinta (tipo de sentencia + columnas + filas por sentencia)
+se prepara una sola vez en su propio cursor(prepared=True) y después solo se
+envían los valores. Para acotar las formas, los escritores parten cada grupo
+de filas con trozos() en sentencias de TAMANOS_SENTENCIA filas en lugar de
+una sentencia del tamaño exacto del grupo.
+"""
+
+import logging
+from collections import Counter, OrderedDict
+from typing import Callable, Iterator, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Filas por sentencia multi-fila (el último debe ser 1 para que entren todas las filas)
+TAMANOS_SENTENCIA = (256, 64, 16, 4, 1)
+
+
+def trozos(grupo: Sequence, tamanos: Sequence[int] = TAMANOS_SENTENCIA) -> Iterator[Sequence]:
+    """Partir un grupo en trozos con tamaños de TAMANOS_SENTENCIA (pocas formas distintas)"""
+    inicio = 0
+    for tamano in tamanos:
+        while len(grupo) - inicio >= tamano:
+            yield grupo[inicio:inicio + tamano]
+            inicio += tamano
+
+
+class CacheSentencias:
+    """Cursores preparados cacheados por forma de sentencia (LRU)"""
+
+    # Cada cursor mantiene una sentencia preparada en el servidor
+    # (el límite global del servidor es max_prepared_stmt_count)
+    MAXIMO_CURSORES = 64
+
+    def __init__(self, conn, maximo: int = MAXIMO_CURSORES):
+        self.conn = conn
+        self.maximo = maximo
+        # forma → (cursor preparado, texto de la sentencia)
+        self.cursores = OrderedDict()
+        # forma → ejecuciones (para reportar cuántas formas distintas produjo el archivo)
+        self.formas = Counter()
+
+    def ejecutar(self, forma: Tuple, construir_query: Callable[[], str], valores: Sequence):
+        """
+        Ejecutar la sentencia de una forma con sus valores; devuelve el cursor
+
+        forma es (tipo de sentencia, columnas, filas por sentencia).
+
+        construir_query solo se llama la primera vez que aparece la forma. El conector
+        vuelve a preparar si recibe otro objeto str, así que se reutiliza el mismo texto.
+        """
+        entrada = self.cursores.pop(forma, None)
+        if entrada is None:
+            entrada = (self.conn.cursor(prepared=True), construir_query())
+            if len(self.cursores) >= self.maximo:
+                _, (cursor_viejo, _) = self.cursores.popitem(last=False)
+                cursor_viejo.close()
+        self.cursores[forma] = entrada
+        self.formas[forma] += 1
+
+        cursor, query = entrada
+        cursor.execute(query, valores)
+        return cursor
+
+    @property
+    def formas_distintas(self) -> int:
+        return len(self.formas)
+
+    def resumen(self):
+        """Registrar cuántas formas distintas produjo el archivo y las más usadas"""
+        if not self.formas:
+            return
+        logger.info(f"🧩 Formas de sentencia distintas: {self.formas_distintas} "
+                    f"({sum(self.formas.values())} ejecuciones)")
+        for (tipo, columnas, filas), ejecuciones in self.formas.most_common(3):
+            logger.info(f"   • {tipo} de {len(columnas)} columnas x {filas} filas: {ejecuciones}")
+
+    def cerrar(self):
+        """Cerrar los cursores (libera las sentencias preparadas en el servidor)"""
+        for cursor, _ in self.cursores.values():
+            try:
+                cursor.close()
+            except Exception as e:
+                logger.debug(f"No se pudo cerrar un cursor preparado: {e}")
+        self.cursores.clear()
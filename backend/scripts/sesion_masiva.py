@@ -0,0 +1,226 @@
+"""
+Modo de sesión para cargas masivas (opcional)
+Compartido por importar_csv_clientes.py, importar_csv_historial.py y
+reemplazar_tablas_completas.py
+
+Mientras dura la carga, la sesión MySQL trabaja sin autocommit y sin verificar
+claves únicas ni foreign keys fila por fila. Toda la carga queda en una sola
+transacción: como el servidor no revisó nada, confirmar() revisa las tablas
+cargadas por conjuntos (un anti-join por cada foreign key y un GROUP BY por
+cada clave única) antes del COMMIT y hace rollback si encuentra problemas.
+Por eso el importador no debe confirmar por lotes ni guardar checkpoints
+mientras la sesión está activa. Los valores originales de la sesión se
+restauran siempre (restaurar() se llama desde un finally).
+"""
+
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SesionMasiva:
+    """Ajustes de sesión para carga masiva que se restauran al terminar"""
+
+    def __init__(self, conn, tablas: Sequence[str], desactivar_unicos: bool = True):
+        """
+        Args:
+            conn: Conexión mysql.connector de la carga
+            tablas: Tablas que se cargan (las que revisa verificar_integridad)
+            desactivar_unicos: False mantiene UNIQUE_CHECKS (ej. INSERT ... ON DUPLICATE KEY,
+                               que necesita que el servidor detecte la clave repetida)
+        """
+        self.conn = conn
+        self.tablas = list(tablas)
+        self.desactivar_unicos = desactivar_unicos
+        self.originales = None
+
+    def activar(self):
+        """Guardar los valores actuales de la sesión y aplicar los de carga masiva"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SELECT @@SESSION.unique_checks, @@SESSION.foreign_key_checks")
+            unicos, foreign_keys = cursor.fetchone()
+            self.originales = {
+                'autocommit': self.conn.autocommit,
+                'unique_checks': int(unicos),
+                'foreign_key_checks': int(foreign_keys)
+            }
+
+            self.conn.autocommit = False
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            if self.desactivar_unicos:
+                cursor.execute("SET SESSION unique_checks = 0")
+        finally:
+            cursor.close()
+
+        logger.info(f"⚡ Sesión de carga masiva activa: sin autocommit, "
+                    f"{'sin' if self.desactivar_unicos else 'con'} UNIQUE_CHECKS, sin FOREIGN_KEY_CHECKS "
+                    f"(una sola transacción hasta confirmar())")
+
+    def restaurar(self) -> bool:
+        """
+        Volver a los valores originales de la sesión (True si se restauraron)
+
+        Se llama desde un finally: no lanza excepciones para no ocultar el error
+        original de la carga. Debe llamarse después del commit o rollback de la
+        carga, porque volver a autocommit=1 confirma la transacción abierta.
+        """
+        if self.originales is None:
+            return True
+        originales, self.originales = self.originales, None
+
+        try:
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("SET SESSION unique_checks = %s", (originales['unique_checks'],))
+                cursor.execute("SET SESSION foreign_key_checks = %s", (originales['foreign_key_checks'],))
+            finally:
+                cursor.close()
+            self.conn.autocommit = originales['autocommit']
+            logger.info("⚡ Sesión de carga masiva restaurada")
+            return True
+        except Exception as e:
+            # Los valores son de sesión: al cerrar la conexión tampoco quedan activos
+            logger.error(f"❌ No se pudo restaurar la sesión de carga masiva: {e} "
+                         f"(cierre la conexión antes de reutilizarla)")
+            return False
+
+    def foreign_keys(self) -> List[Tuple[str, str, str, List[str], List[str]]]:
+        """
+        Foreign keys que salen de las tablas cargadas o llegan a ellas
+
+        Returns:
+            [(restricción, tabla hija, tabla padre, columnas hija, columnas padre)]
+        """
+        marcadores = ', '.join(['%s'] * len(self.tablas))
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT CONSTRAINT_NAME, TABLE_NAME, REFERENCED_TABLE_NAME,
+                       COLUMN_NAME, REFERENCED_COLUMN_NAME
+                FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE()
+                  AND REFERENCED_TABLE_NAME IS NOT NULL
+                  AND (TABLE_NAME IN ({marcadores}) OR REFERENCED_TABLE_NAME IN ({marcadores}))
+                ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+            """, (*self.tablas, *self.tablas))
+            filas = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        restricciones = {}
+        for restriccion, hija, padre, columna, columna_padre in filas:
+            _, _, _, columnas, columnas_padre = restricciones.setdefault(
+                (hija, restriccion), (restriccion, hija, padre, [], [])
+            )
+            columnas.append(columna)
+            columnas_padre.append(columna_padre)
+        return list(restricciones.values())
+
+    def claves_unicas(self) -> List[Tuple[str, str, List[str]]]:
+        """
+        Claves únicas (sin contar la PRIMARY) de las tablas cargadas
+
+        Returns:
+            [(tabla, índice, columnas)]
+        """
+        marcadores = ', '.join(['%s'] * len(self.tablas))
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME
+                FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = DATABASE()
+                  AND TABLE_NAME IN ({marcadores})
+                  AND NON_UNIQUE = 0
+                  AND INDEX_NAME <> 'PRIMARY'
+                ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+            """, tuple(self.tablas))
+            filas = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        claves = {}
+        for tabla, indice, columna in filas:
+            claves.setdefault((tabla, indice), (tabla, indice, []))[2].append(columna)
+        return list(claves.values())
+
+    def contar(self, query: str) -> int:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query)
+            return int(cursor.fetchone()[0])
+        finally:
+            cursor.close()
+
+    def verificar_integridad(self) -> Dict[str, int]:
+        """
+        Revisar por conjuntos lo que el servidor no verificó durante la carga
+
+        Un LEFT JOIN ... IS NULL por foreign key cuenta las filas hijas sin padre y
+        un GROUP BY ... HAVING COUNT(*) > 1 por clave única cuenta los valores
+        repetidos: una consulta por restricción, no una por fila.
+
+        Returns:
+            Dict restricción → filas con problema (solo las que tienen alguno)
+        """
+        logger.info(f"🔎 Verificando integridad de {', '.join(self.tablas)}...")
+        problemas = {}
+
+        for restriccion, hija, padre, columnas, columnas_padre in self.foreign_keys():
+            union = ' AND '.join(f"p.`{cp}` = h.`{c}`" for c, cp in zip(columnas, columnas_padre))
+            # Las columnas hijas en NULL no referencian nada (igual que en la FK)
+            no_nulas = ' AND '.join(f"h.`{c}` IS NOT NULL" for c in columnas)
+            huerfanas = self.contar(f"""
+                SELECT COUNT(*)
+                FROM `{hija}` h
+                LEFT JOIN `{padre}` p ON {union}
+                WHERE {no_nulas} AND p.`{columnas_padre[0]}` IS NULL
+            """)
+            if huerfanas:
+                problemas[restriccion] = huerfanas
+                logger.error(f"❌ {restriccion}: {huerfanas} filas de {hija}.{', '.join(columnas)} "
+                             f"sin su {padre}")
+
+        for tabla, indice, columnas in self.claves_unicas():
+            lista = ', '.join(f"`{c}`" for c in columnas)
+            no_nulas = ' AND '.join(f"`{c}` IS NOT NULL" for c in columnas)
+            repetidos = self.contar(f"""
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM `{tabla}`
+                    WHERE {no_nulas}
+                    GROUP BY {lista}
+                    HAVING COUNT(*) > 1
+                ) repetidos
+            """)
+            if repetidos:
+                problemas[f"{tabla}.{indice}"] = repetidos
+                logger.error(f"❌ {tabla}.{indice}: {repetidos} valores repetidos en "
+                             f"({', '.join(columnas)})")
+
+        if problemas:
+            logger.error(f"❌ Integridad: {len(problemas)} restricciones con problemas después de la carga masiva")
+        else:
+            logger.info("✅ Integridad verificada: sin filas huérfanas ni claves repetidas")
+        return problemas
+
+    def confirmar(self) -> Dict[str, int]:
+        """
+        Verificar la integridad y hacer COMMIT solo si no hay problemas
+
+        La verificación corre dentro de la transacción de la carga, antes de
+        confirmarla: si encuentra filas huérfanas o claves repetidas hace rollback
+        y no queda nada de la carga en las tablas.
+
+        Returns:
+            Dict restricción → filas con problema (vacío si se confirmó)
+        """
+        problemas = self.verificar_integridad()
+        if problemas:
+            self.conn.rollback()
+            logger.error("❌ Carga masiva deshecha (rollback) por problemas de integridad")
+        else:
+            self.conn.commit()
+            logger.info("✅ Carga masiva confirmada (commit)")
+        return problemas
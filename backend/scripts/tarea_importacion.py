@@ -0,0 +1,88 @@
+"""
+Importación en segundo plano para las interfaces tkinter de los importadores
+Compartido por importar_csv_clientes.py e importar_csv_historial.py
+
+La importación corre en un hilo aparte y solo publica mensajes en una cola
+(progreso, fin o error); la interfaz la consulta con root.after() a intervalo
+fijo, así la ventana no se congela y no se redibuja por cada lote. Tkinter no
+es seguro entre hilos: el hilo de la importación nunca toca widgets.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+
+class TareaImportacion:
+    """Hilo que ejecuta una importación y comunica su avance por una cola"""
+
+    def __init__(self, funcion: Callable, *args, **kwargs):
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        self.cola = queue.Queue()
+        # Se revisa después de confirmar cada lote: cancelar no deja lotes a medias
+        self.cancelar = threading.Event()
+        self.hilo = threading.Thread(target=self._ejecutar, daemon=True)
+
+    def iniciar(self):
+        self.hilo.start()
+
+    def progreso(self, porcentaje: float, actual: int, total: int):
+        """Callback de progreso del importador (se llama desde el hilo de la importación)"""
+        self.cola.put(('progreso', (porcentaje, actual, total)))
+
+    def _ejecutar(self):
+        try:
+            resultados = self.funcion(*self.args, callback=self.progreso,
+                                      cancelar=self.cancelar, **self.kwargs)
+            self.cola.put(('fin', resultados))
+        except Exception as e:
+            self.cola.put(('error', e))
+
+    def mensajes(self) -> Iterator[Tuple[str, object]]:
+        """Mensajes pendientes de la cola (sin bloquear)"""
+        while True:
+            try:
+                yield self.cola.get_nowait()
+            except queue.Empty:
+                return
+
+
+class MedidorVelocidad:
+    """Filas por segundo y tiempo restante estimado a partir de los reportes de progreso"""
+
+    def __init__(self):
+        self.inicio = None
+        self.filas_inicio = 0
+
+    def texto(self, actual: int, total: int) -> str:
+        ahora = time.monotonic()
+        if self.inicio is None:
+            # Primer reporte: al reanudar, 'actual' ya incluye las filas del checkpoint
+            self.inicio = ahora
+            self.filas_inicio = actual
+            return "calculando velocidad..."
+
+        velocidad = self.velocidad(actual, ahora)
+        if not velocidad:
+            return "calculando velocidad..."
+        restante = max(total - actual, 0) / velocidad
+        return f"{velocidad:,.0f} filas/s · quedan {self.formatear_duracion(restante)}"
+
+    def velocidad(self, actual: int, ahora: float) -> Optional[float]:
+        transcurrido = ahora - self.inicio
+        if transcurrido <= 0 or actual <= self.filas_inicio:
+            return None
+        return (actual - self.filas_inicio) / transcurrido
+
+    @staticmethod
+    def formatear_duracion(segundos: float) -> str:
+        minutos, segundos = divmod(int(segundos), 60)
+        horas, minutos = divmod(minutos, 60)
+        if horas:
+            return f"{horas}h {minutos:02d}m"
+        if minutos:
+            return f"{minutos}m {segundos:02d}s"
+        return f"{segundos}s"
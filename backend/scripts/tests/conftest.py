@@ -0,0 +1,6 @@
+"""Los scripts se importan entre sí por nombre (se ejecutan desde backend/scripts)"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,39 @@
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+
+from importar_csv_clientes import CargaMasivaClientes, ImportadorCSV
+
+
+class LimpiadorIdentidad:
+    def limpiar(self, lote):
+        return lote
+
+
+def test_cada_lote_se_escribe_al_leerlo():
+    importador = SimpleNamespace(limpiador=LimpiadorIdentidad(),
+                                 COLUMNAS_REQUERIDAS=ImportadorCSV.COLUMNAS_REQUERIDAS)
+    carga = CargaMasivaClientes(importador)
+    lotes = [
+        pd.DataFrame({'telefono': ['999 888-777', None], 'nombre': ['Ana\tMaría', 'Sin tel'], 'extra': [1, 2]}),
+        pd.DataFrame({'telefono': ['111'], 'nombre': [None], 'extra': [3]}),
+    ]
+    progreso = []
+    columnas_bd = {'telefono': {}, 'nombre': {}}
+
+    ruta, columnas, filas, sin_telefono = carga.escribir_filas(iter(lotes), columnas_bd, progreso.append)
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            lineas = f.read().splitlines()
+    finally:
+        os.remove(ruta)
+
+    assert columnas == ['telefono', 'nombre']
+    assert (filas, sin_telefono) == (3, 1)
+    # Un aviso de progreso por lote: el archivo no se junta en memoria antes de escribirlo
+    assert progreso == [2, 3]
+    assert lineas == [
+        '0\t999888777\t1\t999 888-777\tAna\\tMaría',
+        '2\t111\t0\t111\t\\N',
+    ]
@@ -0,0 +1,55 @@
+from collections import Counter
+from types import SimpleNamespace
+
+from importar_csv_clientes import EscritorClientes
+
+
+class CursorFalso:
+    def __init__(self, ejecutadas):
+        self.ejecutadas = ejecutadas
+
+    def execute(self, query, valores):
+        self.ejecutadas.append((query, list(valores)))
+
+    def close(self):
+        pass
+
+
+class ConexionFalsa:
+    def __init__(self):
+        self.ejecutadas = []
+
+    def cursor(self, prepared=False):
+        return CursorFalso(self.ejecutadas)
+
+
+class RegistroFalso:
+    def detalle(self, *args, **kwargs):
+        pass
+
+
+def crear_escritor():
+    importador = SimpleNamespace(conn=ConexionFalsa(), resultados=Counter(), registro=RegistroFalso(),
+                                 registrar_en_indice=lambda *args: None)
+    return EscritorClientes(importador, tamano_batch=1000), importador
+
+
+def test_updates_en_lote_son_update_join_por_id():
+    escritor, importador = crear_escritor()
+    for cliente_id in (10, 11, 12, 13, 14):
+        escritor.agregar_update(cliente_id, f'11{cliente_id}', cliente_id,
+                                {'nombre': f'Cliente {cliente_id}', 'dni': None})
+    escritor.flush()
+
+    ejecutadas = importador.conn.ejecutadas
+    # 5 filas → un trozo de 4 y uno de 1 (sentencias_preparadas.TAMANOS_SENTENCIA)
+    assert len(ejecutadas) == 2
+    query, valores = ejecutadas[0]
+    assert query.startswith('UPDATE clientes c JOIN (SELECT CAST(%s AS UNSIGNED) AS id, %s AS nombre, %s AS dni')
+    assert query.count('UNION ALL') == 3
+    assert query.endswith('v ON v.id = c.id SET c.nombre = v.nombre, c.dni = v.dni, c.updated_at = NOW()')
+    assert 'DUPLICATE' not in query
+    assert valores[:6] == [10, 'Cliente 10', None, 11, 'Cliente 11', None]
+    assert query.count('%s') == len(valores)
+    assert ejecutadas[1][1] == [14, 'Cliente 14', None]
+    assert importador.resultados['actualizados'] == 5
@@ -0,0 +1,46 @@
+from importar_csv_clientes import ImportadorCSV
+
+
+class CursorIndice:
+    def __init__(self, filas):
+        self.filas = filas
+        self.consultas = []
+
+    def execute(self, query, valores=None):
+        self.consultas.append((' '.join(query.split()), valores))
+
+    def __iter__(self):
+        return iter(self.filas)
+
+    def close(self):
+        pass
+
+
+class ConexionIndice:
+    def __init__(self, filas):
+        self.ultimo = CursorIndice(filas)
+
+    def cursor(self):
+        return self.ultimo
+
+
+def test_particion_se_filtra_en_la_consulta():
+    importador = ImportadorCSV()
+    importador.conn = ConexionIndice([(5, 'Ana', '999 888-777', None, None), (6, 'Sin', '', None, None)])
+
+    assert importador.cargar_indice_telefonos(particion=(1, 4)) == 1
+
+    query, valores = importador.conn.ultimo.consultas[0]
+    assert "WHERE MOD(CRC32(REPLACE(REPLACE(telefono, ' ', ''), '-', '')), %s) = %s" in query
+    assert valores == (4, 1)
+    assert importador.indice_telefonos == {'999888777': [(5, 'Ana', None, None)]}
+
+
+def test_sin_particion_lee_todos_los_clientes():
+    importador = ImportadorCSV()
+    importador.conn = ConexionIndice([])
+    importador.cargar_indice_telefonos()
+
+    query, valores = importador.conn.ultimo.consultas[0]
+    assert 'WHERE' not in query
+    assert valores == ()
@@ -0,0 +1,32 @@
+import pandas as pd
+
+from lector_archivos import LectorArchivo
+
+
+def escribir(tmp_path, texto):
+    ruta = tmp_path / 'clientes.csv'
+    ruta.write_bytes(texto.encode('utf-8'))
+    return str(ruta)
+
+
+def test_lotes_respetan_saltos_de_linea_entre_comillas(tmp_path):
+    ruta = escribir(tmp_path, 'telefono;nombre\n1;"Ana\nMaría"\n\n2;"dice ""hola"""\n3;Luis\n')
+
+    lotes = list(LectorArchivo(ruta, tamano_lote=2))
+
+    assert [lote.index.tolist() for lote in lotes] == [[0, 1], [2]]
+    assert pd.concat(lotes).equals(pd.read_csv(ruta, sep=';', dtype=str))
+
+
+def test_reanudar_desde_el_byte_del_checkpoint(tmp_path):
+    ruta = escribir(tmp_path, 'telefono;nombre\n1;"Ana\nMaría"\n2;Eva\n3;Luis\n4;Rosa\n')
+    lector = LectorArchivo(ruta, tamano_lote=2)
+    primero = next(iter(lector))
+    siguiente, posicion = int(primero.index[-1]) + 1, lector.posicion
+
+    por_byte = pd.concat(LectorArchivo(ruta, tamano_lote=2, desde=siguiente, desde_byte=posicion))
+    por_fila = pd.concat(LectorArchivo(ruta, tamano_lote=2, desde=siguiente))
+
+    assert por_byte.index.tolist() == [2, 3]
+    assert por_byte['nombre'].tolist() == ['Luis', 'Rosa']
+    assert por_byte.equals(por_fila)
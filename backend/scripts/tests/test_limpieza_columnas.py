@@ -0,0 +1,46 @@
+import pandas as pd
+
+from limpieza_columnas import LimpiadorColumnas
+
+
+def limpiar(valores, tipo):
+    return list(LimpiadorColumnas().limpiar_columna(pd.Series(valores, name='col'), tipo))
+
+
+def test_entero_redondea_la_mitad_alejandose_de_cero_como_mysql():
+    assert limpiar(['12.7', '2.5', '-2.5', '0.5', '7'], 'entero') == [13, 3, -3, 1, 7]
+    assert limpiar([2.5, 3.5, None], 'entero') == [3, 4, None]
+
+
+def test_entero_no_numerico_queda_nulo():
+    assert limpiar(['abc', '', 'NULL', None], 'entero') == [None, None, None, None]
+
+
+def test_texto_recorta_y_normaliza_vacios():
+    assert limpiar(['  hola ', '', 'null', None], 'texto') == ['hola', None, None, None]
+
+
+def test_texto_de_columna_float_sin_decimales():
+    assert limpiar([923718973.0, None], 'texto') == ['923718973', None]
+
+
+def test_boolean():
+    assert limpiar(['si', 'Sí', 'NO', '1', 'quizás', None], 'boolean') == [1, 1, 0, 1, None, None]
+
+
+def test_fechas_con_formato_detectado_y_residuo():
+    limpiador = LimpiadorColumnas()
+    serie = pd.Series(['2025/01/15', '2025/02/01', '15/01/2025', 'mañana', None], name='fecha')
+    assert list(limpiador.limpiar_columna(serie, 'fecha')) == [
+        '2025-01-15 00:00:00', '2025-02-01 00:00:00', '2025-01-15 00:00:00', None, None
+    ]
+    assert limpiador.fechas_no_convertidas['fecha']['total'] == 1
+
+
+def test_plan_descarta_columnas_que_no_existen_y_recorta_textos():
+    limpiador = LimpiadorColumnas()
+    limpiador.configurar_esquema({'nombre': 'texto', 'id': 'entero'}, {'nombre': 3})
+    limpio = limpiador.limpiar(pd.DataFrame({'id': ['1'], 'nombre': ['abcdef'], 'extra': ['x']}))
+    assert list(limpio.columns) == ['id', 'nombre']
+    assert limpio.iloc[0].tolist() == [1, 'abc']
+    assert limpiador.recortados == {'nombre': 1}
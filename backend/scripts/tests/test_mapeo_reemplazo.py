@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+from mapeo_reemplazo import EspecificacionCarga
+
+
+class ResolutorFalso:
+    def __init__(self, valores):
+        self.valores = valores
+
+    def resolver(self, *origenes):
+        return self.valores.get(origenes)
+
+
+def crear_carga(columnas):
+    return EspecificacionCarga({
+        'nombre': 'historial', 'destino': 'historial_cliente',
+        'origen': {'archivo': 'historial.xlsx'}, 'columnas': columnas
+    })
+
+
+def test_aplicar_calcula_cada_columna_y_descarta_requeridas():
+    carga = crear_carga({
+        'cliente_id': {'resolver': 'cliente', 'origen': ['DNI', 'LEADS'], 'requerida': True},
+        'accion': {'origen': 'ESTADO', 'defecto': 'sin_estado'},
+        'descripcion': {'concatenar': [{'origen': 'OBS'}, {'origen': 'CAMPANA', 'prefijo': 'Campaña: '}]},
+        'estado_nuevo': {'igual_a': 'accion'},
+        'no_existe': {'origen': 'X'},
+        'notas': {'origen': 'NOTAS'},
+    })
+    transformacion = carga.compilar(
+        {'cliente_id': 'entero', 'accion': 'texto', 'descripcion': 'texto', 'estado_nuevo': 'texto', 'notas': 'texto'},
+        {'accion': 100, 'estado_nuevo': 5}
+    )
+    df = pd.DataFrame({
+        'DNI': ['1', '2', '3'],
+        'LEADS': ['900', '901', '902'],
+        'ESTADO': ['  Interesado ', None, 'Venta'],
+        'OBS': ['llamar', None, None],
+        'CAMPANA': ['MASIVO', 'C8', None],
+    })
+    resolutor = ResolutorFalso({('1', '900'): 10, ('3', '902'): 30})
+
+    resultado = transformacion.aplicar(df, {'cliente': resolutor})
+
+    assert transformacion.ignoradas == ['no_existe']
+    assert transformacion.faltantes == ['NOTAS']
+    assert transformacion.descartadas == {'cliente_id': 1}
+    assert list(resultado.columns) == ['cliente_id', 'accion', 'descripcion', 'estado_nuevo', 'notas']
+    assert resultado.to_dict('records') == [
+        {'cliente_id': 10, 'accion': 'Interesado', 'descripcion': 'llamar | Campaña: MASIVO',
+         'estado_nuevo': 'Inter', 'notas': None},
+        {'cliente_id': 30, 'accion': 'Venta', 'descripcion': None, 'estado_nuevo': 'Venta', 'notas': None},
+    ]
+
+
+def test_defecto_rellena_filas_sin_valor():
+    transformacion = crear_carga({'accion': {'origen': 'ESTADO', 'defecto': 'sin_estado'}}).compilar()
+    resultado = transformacion.aplicar(pd.DataFrame({'ESTADO': ['Venta', None]}))
+    assert resultado['accion'].tolist() == ['Venta', 'sin_estado']
+
+
+def test_resolutor_inexistente_es_error():
+    transformacion = crear_carga({'usuario_id': {'resolver': 'asesor', 'origen': 'AS.FINAL'}}).compilar()
+    with pytest.raises(ValueError, match="no hay resolutor 'asesor'"):
+        transformacion.aplicar(pd.DataFrame({'AS.FINAL': ['Ana']}))
+
+
+def test_tipo_desconocido_se_rechaza_al_leer_el_mapeo():
+    with pytest.raises(ValueError, match="tipo 'fechas' desconocido"):
+        crear_carga({'fecha': {'tipo': 'fechas'}})
@@ -0,0 +1,63 @@
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from importar_csv_historial import ImportadorHistorial, ReferenciasHistorial
+from limpieza_columnas import LimpiadorColumnas
+
+
+class RegistroFalso:
+    def __init__(self):
+        self.rechazos = []
+        self.datos = []
+
+    def rechazo(self, fila, motivo, datos, *args, **kwargs):
+        self.rechazos.append((fila, motivo))
+        self.datos.append(datos)
+
+
+def crear_referencias(clientes, usuarios):
+    importador = SimpleNamespace(COLUMNAS_REQUERIDAS=ImportadorHistorial.COLUMNAS_REQUERIDAS,
+                                 registro=RegistroFalso(), resultados=Counter())
+    referencias = ReferenciasHistorial(importador)
+    # Tablas "leídas completas": filtrar no consulta la BD
+    referencias.existentes = {'cliente_id': np.array(clientes), 'usuario_id': np.array(usuarios)}
+    referencias.completas = {'cliente_id', 'usuario_id'}
+    return referencias, importador
+
+
+def filtrar(referencias, lote):
+    limpiador = LimpiadorColumnas()
+    limpiador.configurar_esquema({'cliente_id': 'entero', 'usuario_id': 'entero', 'accion': 'texto'}, {})
+    return referencias.filtrar(limpiador.limpiar(lote), lote)
+
+
+def test_ids_con_decimales_o_no_numericos_son_error():
+    referencias, importador = crear_referencias(clientes=[7, 13], usuarios=[1])
+    lote = pd.DataFrame({
+        'cliente_id': ['12.7', 'abc', '7', '7.0', '', '0'],
+        'usuario_id': ['1', '1', '1', '1', '1', '1'],
+        'accion': ['a', 'a', 'a', 'a', 'a', 'a']
+    })
+
+    aceptadas = filtrar(referencias, lote)
+
+    assert aceptadas['cliente_id'].tolist() == [7, 7]
+    assert importador.registro.rechazos == [
+        (2, 'id_invalido'), (3, 'id_invalido'), (6, 'faltan_requeridos'), (7, 'faltan_requeridos')
+    ]
+    assert importador.resultados == {'errores': 2, 'omitidos': 2}
+
+
+def test_ids_inexistentes_se_omiten():
+    referencias, importador = crear_referencias(clientes=[7], usuarios=[1])
+    lote = pd.DataFrame({'cliente_id': [7, 8, 7], 'usuario_id': [1, 1, 2], 'accion': ['a', 'a', None]})
+
+    aceptadas = filtrar(referencias, lote)
+
+    assert aceptadas.index.tolist() == [0]
+    assert importador.registro.rechazos == [(3, 'cliente_inexistente'), (4, 'faltan_requeridos')]
+    # El registro de rechazos recibe los valores como venían en el archivo
+    assert importador.registro.datos[1] == {'cliente_id': 7, 'usuario_id': 2, 'accion': None}
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from reporte_fases import ReporteFases
+
+
+def test_comparar_marca_regresiones_por_proporcion_y_segundos(tmp_path):
+    reporte = ReporteFases(tmp_path / 'reporte_reemplazo_20261018_120000.json')
+    reporte.fases = [
+        {'fase': 'clientes.insertar', 'segundos': 13.0, 'filas': 1000, 'filas_por_segundo': 76.9},
+        {'fase': 'clientes.leer', 'segundos': 0.5, 'filas': 1000},
+        {'fase': 'clientes.backup', 'segundos': 2.0, 'filas': None},
+        {'fase': 'historial.insertar', 'segundos': 1.0, 'filas': 10},
+    ]
+    anterior = {'fases': [
+        {'fase': 'clientes.insertar', 'segundos': 10.0, 'filas': 1000, 'filas_por_segundo': 100.0},
+        # +150% pero menos de MINIMO_REGRESION segundos: no es regresión
+        {'fase': 'clientes.leer', 'segundos': 0.2, 'filas': 1000},
+        {'fase': 'clientes.backup', 'segundos': 0},
+    ]}
+
+    comparacion = {fila['fase']: fila for fila in reporte.comparar(anterior)}
+
+    # Sin fase anterior o con 0 segundos no hay contra qué comparar
+    assert set(comparacion) == {'clientes.insertar', 'clientes.leer'}
+    assert comparacion['clientes.insertar']['variacion'] == pytest.approx(0.3)
+    assert comparacion['clientes.insertar']['regresion'] is True
+    assert comparacion['clientes.insertar']['filas_por_segundo_anterior'] == 100.0
+    assert comparacion['clientes.leer']['variacion'] == pytest.approx(1.5)
+    assert comparacion['clientes.leer']['regresion'] is False
+
+
+def test_guardar_compara_con_el_ultimo_reporte_completo(tmp_path):
+    def escribir(nombre, estado, segundos):
+        (tmp_path / nombre).write_text(json.dumps({
+            'estado': estado, 'fases': [{'fase': 'leer', 'segundos': segundos}]
+        }), encoding='utf-8')
+
+    escribir('reporte_reemplazo_20261017_090000.json', 'ok', 4.0)
+    escribir('reporte_reemplazo_20261017_100000.json', 'error', 1.0)
+    escribir('reporte_reemplazo_20261019_090000.json', 'ok', 1.0)
+
+    reporte = ReporteFases(tmp_path / 'reporte_reemplazo_20261018_120000.json')
+    with reporte.fase('leer', filas=10) as medicion:
+        medicion['filas'] = 20
+    ruta = reporte.guardar('ok', {'archivo': 'x.xlsx'})
+
+    guardado = json.loads(ruta.read_text(encoding='utf-8'))
+    assert guardado['reporte_anterior'] == 'reporte_reemplazo_20261017_090000.json'
+    assert guardado['fases'][0]['filas'] == 20
+    assert guardado['comparacion'][0]['segundos_anterior'] == 4.0
+    assert guardado['archivo'] == 'x.xlsx'
+
+
+def test_fase_con_error_se_registra_y_relanza(tmp_path):
+    reporte = ReporteFases(tmp_path / 'reporte_reemplazo_20261018_120000.json')
+    with pytest.raises(RuntimeError):
+        with reporte.fase('vaciar'):
+            raise RuntimeError('sin permisos')
+    assert reporte.fases[0]['error'] == 'sin permisos'
+    assert 'segundos' in reporte.fases[0]
@@ -0,0 +1,64 @@
+import pytest
+
+from reemplazar_tablas_completas import ResolutorAsesores
+
+
+class CursorUsuarios:
+    def execute(self, query, valores=None):
+        pass
+
+    def fetchall(self):
+        return [
+            {'id': 2, 'nombre': 'Juan Carlos Pérez', 'username': 'jcperez'},
+            {'id': 3, 'nombre': 'María López', 'username': 'mlopez'},
+            {'id': 4, 'nombre': 'Juan Pérez Soto', 'username': None},
+        ]
+
+
+@pytest.fixture
+def asesores():
+    return ResolutorAsesores(CursorUsuarios())
+
+
+def test_tokens_sin_tildes_mayusculas_ni_orden():
+    assert ResolutorAsesores.tokens('Pérez  JUAN') == ('juan', 'perez')
+    assert ResolutorAsesores.tokens(None) == ()
+
+
+@pytest.mark.parametrize('nombre, esperado', [
+    ('PEREZ juan carlos', 2),  # mismas palabras en otro orden
+    ('Juan Carlos', 2),        # palabras contenidas en el usuario (como el antiguo LIKE)
+    ('mlopez', 3),             # username
+    ('Marai Lopez', 3),        # error de tipeo: trigramas
+])
+def test_nombres_reconocidos(asesores, nombre, esperado):
+    assert asesores.clasificar(nombre)[:2] == (esperado, None)
+
+
+def test_puntajes_ordenados_de_mayor_a_menor(asesores):
+    puntajes = asesores.comparar(ResolutorAsesores.tokens('Juan Carlos'))
+    # Los usuarios sin nada en común (puntaje 0) no aparecen
+    assert [usuario_id for _, usuario_id, _ in puntajes] == [2, 4]
+    assert puntajes[0][0] == 1.0
+    assert puntajes[1][0] == pytest.approx(0.5)
+
+
+def test_ambiguo_y_sin_coincidencia_usan_el_usuario_por_defecto(asesores):
+    usuario_id, motivo, candidatos = asesores.clasificar('Juan Perez')
+    assert (usuario_id, motivo) == (ResolutorAsesores.USUARIO_POR_DEFECTO, 'ambiguo')
+    assert [c[1] for c in candidatos] == [2, 4]
+
+    assert asesores.clasificar('Pedro')[:2] == (ResolutorAsesores.USUARIO_POR_DEFECTO, 'sin_coincidencia')
+
+
+def test_resolver_cachea_y_reporta(asesores, tmp_path):
+    for nombre in ['Juan Perez', ' Juan Perez ', 'mlopez', None]:
+        asesores.resolver(nombre)
+
+    assert list(asesores.cache) == ['Juan Perez', 'mlopez']
+    assert asesores.filas['Juan Perez'] == 2
+    assert dict(asesores.estadisticas) == {'ambiguo': 2, 'reconocido': 1, 'sin_asesor': 1}
+
+    ruta = tmp_path / 'revision_asesores.csv'
+    assert asesores.guardar_revision(ruta) == 1
+    assert 'Juan Perez;2;ambiguo;1;2:Juan Carlos Pérez (1.00) | 4:Juan Pérez Soto (1.00)' in ruta.read_text(encoding='utf-8')
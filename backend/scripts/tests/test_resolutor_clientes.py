@@ -0,0 +1,50 @@
+import pandas as pd
+
+from reemplazar_tablas_completas import ResolutorClientes
+
+
+class CursorClientes:
+    def __init__(self, filas):
+        self.filas = filas
+
+    def execute(self, query, valores=None):
+        pass
+
+    def fetchall(self):
+        return self.filas
+
+
+def crear_resolutor():
+    return ResolutorClientes(CursorClientes([
+        {'id': 1, 'dni': 12345678.0, 'telefono': '51 987-654-321'},
+        {'id': 2, 'dni': None, 'telefono': '999111222'},
+        {'id': 3, 'dni': '87654321', 'telefono': '51111222333'},
+        {'id': 4, 'dni': None, 'telefono': '52111222333'},
+    ]))
+
+
+def test_resuelve_por_dni_telefono_y_sufijo():
+    resolutor = crear_resolutor()
+
+    assert resolutor.resolver('12345678', None) == 1
+    assert resolutor.resolver(None, '999-111-222') == 2
+    assert resolutor.resolver(None, '987654321') == 1
+    # Sufijos cortos no se buscan
+    assert resolutor.resolver(None, '54321') is None
+    assert dict(resolutor.estadisticas) == {'dni': 1, 'telefono': 1, 'sufijo': 1, 'sin_cliente': 1}
+
+
+def test_sufijo_ambiguo_queda_sin_cliente_y_va_a_revision(tmp_path):
+    resolutor = crear_resolutor()
+
+    assert resolutor.resolver(None, '111222333') is None
+    assert resolutor.resolver(None, '111 222 333') is None
+    assert resolutor.estadisticas['sufijo_ambiguo'] == 2
+    assert resolutor.estadisticas['sufijo'] == 0
+
+    ruta = tmp_path / 'revision_clientes.csv'
+    assert resolutor.guardar_revision(ruta) == 1
+    revision = pd.read_csv(ruta, sep=';', dtype=str)
+    assert revision.to_dict('records') == [
+        {'telefono_archivo': '111222333', 'filas': '2', 'motivo': 'sufijo_ambiguo', 'candidatos': '3 | 4'}
+    ]
@@ -0,0 +1,55 @@
+import pytest
+
+from importar_csv_clientes import ImportadorCSV
+from sesion_masiva import SesionMasiva
+
+
+class ConexionFalsa:
+    """Conexión que solo registra commit/rollback; la verificación se reemplaza en cada prueba"""
+
+    def __init__(self):
+        self.confirmada = False
+        self.deshecha = False
+
+    def commit(self):
+        self.confirmada = True
+
+    def rollback(self):
+        self.deshecha = True
+
+
+def test_sin_problemas_se_confirma(monkeypatch):
+    conn = ConexionFalsa()
+    sesion = SesionMasiva(conn, ['historial_cliente'])
+    monkeypatch.setattr(sesion, 'verificar_integridad', lambda: {})
+
+    assert sesion.confirmar() == {}
+    assert conn.confirmada and not conn.deshecha
+
+
+def test_con_huerfanas_se_deshace_antes_del_commit(monkeypatch):
+    conn = ConexionFalsa()
+    sesion = SesionMasiva(conn, ['historial_cliente'])
+    monkeypatch.setattr(sesion, 'verificar_integridad', lambda: {'historial_cliente_ibfk_1': 3})
+
+    assert sesion.confirmar() == {'historial_cliente_ibfk_1': 3}
+    assert conn.deshecha and not conn.confirmada
+
+
+def test_importador_lanza_error_si_la_carga_se_deshace(monkeypatch):
+    importador = ImportadorCSV()
+    importador.conn = ConexionFalsa()
+    importador.sesion = SesionMasiva(importador.conn, ['clientes'])
+    monkeypatch.setattr(importador.sesion, 'verificar_integridad', lambda: {'clientes.uk_telefono_normalizado': 2})
+
+    with pytest.raises(RuntimeError, match=r'clientes.uk_telefono_normalizado \(2 filas\)'):
+        importador.confirmar()
+    assert importador.conn.deshecha and not importador.conn.confirmada
+
+
+def test_sesion_masiva_no_admite_reanudar_ni_workers():
+    importador = ImportadorCSV()
+    with pytest.raises(ValueError, match='no admite reanudar'):
+        importador.importar_csv('clientes.csv', reanudar=True, sesion_masiva=True)
+    with pytest.raises(ValueError, match='no admite workers'):
+        importador.importar_csv('clientes.csv', workers=4, sesion_masiva=True)
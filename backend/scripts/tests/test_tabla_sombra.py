@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+
+from reemplazar_tablas_completas import ReemplazadorTablas
+
+
+class CursorGuionado:
+    """Cursor que devuelve, en orden, los resultados preparados para cada consulta"""
+
+    def __init__(self, resultados):
+        self.resultados = list(resultados)
+        self.ejecutadas = []
+        self.actual = []
+
+    def execute(self, query, valores=None):
+        self.ejecutadas.append(' '.join(query.split()))
+        if not query.lstrip().startswith(('ALTER', 'SET', 'RENAME', 'DROP', 'CREATE')):
+            self.actual = self.resultados.pop(0)
+
+    def fetchall(self):
+        return self.actual
+
+    def fetchone(self):
+        return self.actual[0] if self.actual else None
+
+
+@pytest.fixture
+def reemplazador(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return ReemplazadorTablas(tabla_sombra=True)
+
+
+def test_ids_repetidos_se_detectan_antes_de_cargar(reemplazador):
+    reemplazador.cursor = CursorGuionado([[{'indice': 'PRIMARY', 'columnas': 'id', 'definicion': '`id`'}]] * 2)
+    datos = pd.DataFrame({'id': [1, 2, 2, None, None], 'nombre': list('abcde')}, dtype=object)
+    with pytest.raises(RuntimeError, match='2 filas repiten la clave primaria'):
+        reemplazador.verificar_ids_repetidos('clientes_new', datos)
+
+    reemplazador.verificar_ids_repetidos('clientes_new', datos.iloc[[0, 1, 3, 4]])
+
+
+def test_unicos_con_conflictos_no_se_recrean(reemplazador):
+    unicos = {'uk_telefono_normalizado': (['telefono_normalizado'], '`telefono_normalizado`')}
+    reemplazador.cursor = CursorGuionado([[{'telefono_normalizado': '999888777', 'repeticiones': 2}]])
+    with pytest.raises(RuntimeError, match='valores repetidos en índices únicos'):
+        reemplazador.verificar_unicos('clientes_new', unicos)
+    assert not any(q.startswith('ALTER') for q in reemplazador.cursor.ejecutadas)
+
+    reemplazador.cursor = CursorGuionado([[]])
+    reemplazador.verificar_unicos('clientes_new', unicos)
+    assert reemplazador.cursor.ejecutadas[-1] == (
+        'ALTER TABLE clientes_new ADD UNIQUE INDEX `uk_telefono_normalizado` (`telefono_normalizado`)'
+    )
+
+
+def test_huerfanos_en_tablas_hijas_cancelan_el_rename(reemplazador):
+    referencias = [
+        {'tabla': 'historial_cliente', 'restriccion': 'historial_cliente_ibfk_1',
+         'columnas': 'cliente_id', 'referenciadas': 'id'},
+        {'tabla': 'clientes', 'restriccion': 'fk_principal',
+         'columnas': 'telefono_principal_id', 'referenciadas': 'id'},
+    ]
+    reemplazador.cursor = CursorGuionado([[{'total': 3}], [{'total': 0}]])
+    with pytest.raises(RuntimeError, match='3 filas de tablas hijas quedarían huérfanas'):
+        reemplazador.verificar_huerfanos('clientes', 'clientes_new', referencias)
+
+    historial, propia = reemplazador.cursor.ejecutadas
+    assert 'FROM `historial_cliente` h' in historial
+    assert 'NOT EXISTS (SELECT 1 FROM `clientes_new` p WHERE p.`id` = h.`cliente_id`)' in historial
+    # La FK de clientes sobre sí misma se verifica dentro de la tabla sombra
+    assert 'FROM `clientes_new` h' in propia
+
+
+def test_historial_recargado_no_se_verifica_contra_la_sombra(reemplazador):
+    reemplazador.reemplazadas = {'clientes', 'historial_cliente'}
+    referencias = [
+        {'tabla': 'historial_cliente', 'restriccion': 'historial_cliente_ibfk_1',
+         'columnas': 'cliente_id', 'referenciadas': 'id'},
+        {'tabla': 'clientes', 'restriccion': 'fk_principal',
+         'columnas': 'telefono_principal_id', 'referenciadas': 'id'},
+    ]
+    reemplazador.cursor = CursorGuionado([[{'total': 0}]])
+    reemplazador.verificar_huerfanos('clientes', 'clientes_new', referencias)
+
+    assert len(reemplazador.cursor.ejecutadas) == 1
+    assert 'FROM `clientes_new` h' in reemplazador.cursor.ejecutadas[0]
+
+
+def test_filas_con_error_impiden_publicar(reemplazador):
+    reemplazador.cursor = CursorGuionado([])
+    with pytest.raises(RuntimeError, match='2 de 100 filas fallaron'):
+        reemplazador.verificar_conteo('clientes_new', 100, 2)
+
+    reemplazador.permitir_errores = True
+    reemplazador.cursor = CursorGuionado([[{'total': 98}]])
+    reemplazador.verificar_conteo('clientes_new', 100, 2)
+
+    reemplazador.cursor = CursorGuionado([[{'total': 97}]])
+    with pytest.raises(RuntimeError, match='tiene 97 filas y el origen 98'):
+        reemplazador.verificar_conteo('clientes_new', 100, 2)
+
+
+def test_tabla_sombra_no_admite_sesion_masiva(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match='tabla sombra'):
+        ReemplazadorTablas(sesion_masiva=True, tabla_sombra=True)
@@ -0,0 +1,76 @@
+import pandas as pd
+
+from verificar_importacion import TELEFONO_BD, extraer_claves, resolver_claves
+
+
+def test_extraer_claves_de_columnas_del_excel():
+    df = pd.DataFrame({
+        'LEADS': ['987654321', '51 987-654-321', None, ' - '],
+        'DNI': ['12345678', None, '00123', 'X' * 60],
+        'NOMBRE': ['  Ana  ', 'Luis', None, 'Eva'],
+    }, index=[10, 11, 12, 13])
+
+    claves = extraer_claves(df)
+
+    assert claves.index.tolist() == [10, 11, 12, 13]
+    assert claves['fila'].tolist() == [1, 2, 3, 4]
+    assert claves['telefono'].tolist() == ['987654321', '51987654321', None, None]
+    assert claves['dni'].tolist() == ['12345678', None, '00123', 'X' * 50]
+    assert claves['nombre'].tolist() == ['Ana', 'Luis', None, 'Eva']
+
+
+def test_columnas_numericas_con_huecos_no_quedan_con_decimales():
+    # Así llega de read_excel una columna de números con celdas vacías
+    df = pd.DataFrame({'LEADS': [987654321.0, None], 'DNI': [12345678.0, 87654321.0]})
+
+    claves = extraer_claves(df)
+
+    assert claves['telefono'].tolist() == ['987654321', None]
+    assert claves['dni'].tolist() == ['12345678', '87654321']
+
+
+def test_columnas_de_la_bd_tienen_preferencia_y_faltantes_quedan_nulas():
+    df = pd.DataFrame({'telefono': ['900'], 'LEADS': ['111']})
+
+    claves = extraer_claves(df)
+
+    assert claves.loc[0, 'telefono'] == '900'
+    assert claves.loc[0, 'dni'] is None
+    assert claves.loc[0, 'nombre'] is None
+
+
+class CursorFalso:
+    """Cursor que registra las sentencias y responde la consulta a information_schema"""
+
+    def __init__(self, tiene_columna):
+        self.tiene_columna = tiene_columna
+        self.sentencias = []
+
+    def execute(self, sql, params=None):
+        self.sentencias.append((' '.join(sql.split()), params))
+
+    def fetchone(self):
+        return (int(self.tiene_columna),)
+
+
+class ConexionFalsa:
+    def commit(self):
+        pass
+
+
+def test_resolver_claves_usa_telefono_normalizado_si_existe():
+    cursor = CursorFalso(tiene_columna=True)
+    resolver_claves(cursor, ConexionFalsa())
+
+    sentencias = [sql for sql, _ in cursor.sentencias[1:]]
+    assert 'JOIN clientes c ON c.telefono_normalizado = t.telefono' in sentencias[0]
+    assert not any(TELEFONO_BD in sql for sql in sentencias)
+    assert [params for _, params in cursor.sentencias[2:]] == [('dni',), ('nombre',)]
+
+
+def test_resolver_claves_agrupa_por_replace_sin_la_columna():
+    cursor = CursorFalso(tiene_columna=False)
+    resolver_claves(cursor, ConexionFalsa())
+
+    assert TELEFONO_BD in cursor.sentencias[1][0]
+    assert [params for _, params in cursor.sentencias[1:]] == [('telefono',), ('dni',), ('nombre',)]
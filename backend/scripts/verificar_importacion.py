@@ -1,6 +1,27 @@
 import pandas as pd
 import mysql.connector
 from datetime import datetime
+import os
+import re
+import time
+
+from limpieza_columnas import LimpiadorColumnas
+
+# Columnas del Excel que se usan como clave, en orden de preferencia
+COLUMNAS_CLAVE = {
+    'telefono': ['telefono', 'LEADS'],
+    'dni': ['dni', 'DNI'],
+    'nombre': ['nombre', 'NOMBRE']
+}
+
+# Largo de las columnas de la tabla temporal (los valores se recortan al cargarlos)
+LARGOS_CLAVE = {'telefono': 20, 'dni': 50, 'nombre': 100}
+
+# Filas por INSERT multi-fila al cargar la tabla temporal
+TAMANO_LOTE_CLAVES = 5000
+
+# Normalización del teléfono igual a la del importador (sin espacios ni guiones)
+TELEFONO_BD = "REPLACE(REPLACE(c.telefono, ' ', ''), '-', '')"
 
 def conectar_bd():
     """Conectar a la base de datos MySQL"""
@@ -32,80 +53,194 @@ def analizar_excel():
     
     return f1, f2
 
+def extraer_claves(df):
+    """Teléfono, DNI y nombre de todas las filas del Excel, normalizados por columna"""
+    claves = pd.DataFrame({'fila': range(1, len(df) + 1)}, index=df.index)
+    for clave, candidatas in COLUMNAS_CLAVE.items():
+        columna = next((c for c in candidatas if c in df.columns), None)
+        if columna is None:
+            claves[clave] = None
+            continue
+        valores = LimpiadorColumnas.a_texto(df[columna])
+        if clave == 'telefono':
+            valores = valores.str.replace(r'[\s-]', '', regex=True)
+            valores = valores.mask(valores.eq(''))
+        claves[clave] = valores.str.slice(0, LARGOS_CLAVE[clave])
+    claves = claves.astype(object)
+    return claves.where(claves.notna(), None)
+
+def cargar_claves(cursor, conn, claves):
+    """Crear la tabla temporal de claves y cargarla con INSERT multi-fila por lotes"""
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_verificacion")
+    # Misma collation que clientes para comparar sin mezclar collations
+    cursor.execute("""
+        CREATE TEMPORARY TABLE tmp_verificacion (
+            fila INT PRIMARY KEY,
+            telefono VARCHAR(20),
+            dni VARCHAR(50),
+            nombre VARCHAR(100),
+            cliente_id INT NULL,
+            via VARCHAR(10) NULL,
+            candidatos INT NULL,
+            KEY idx_telefono (telefono),
+            KEY idx_dni (dni),
+            KEY idx_nombre (nombre)
+        ) DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    
+    filas = list(claves[['fila', 'telefono', 'dni', 'nombre']].itertuples(index=False, name=None))
+    for inicio in range(0, len(filas), TAMANO_LOTE_CLAVES):
+        # executemany envía el lote como un solo INSERT ... VALUES (...), (...)
+        cursor.executemany(
+            "INSERT INTO tmp_verificacion (fila, telefono, dni, nombre) VALUES (%s, %s, %s, %s)",
+            filas[inicio:inicio + TAMANO_LOTE_CLAVES]
+        )
+    conn.commit()
+
+def tiene_telefono_normalizado(cursor):
+    """Si clientes ya tiene la columna telefono_normalizado (migración 009)"""
+    cursor.execute("""
+        SELECT COUNT(*)
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = 'clientes'
+          AND COLUMN_NAME = 'telefono_normalizado'
+    """)
+    return bool(cursor.fetchone()[0])
+
+def resolver_claves(cursor, conn):
+    """
+    Buscar el cliente de cada fila por teléfono, luego DNI y luego nombre
+    
+    Un UPDATE por clave para todo el archivo: clientes se agrupa por la clave
+    (menor id y cantidad de candidatos) y se une con la tabla temporal. La tabla
+    temporal aparece una sola vez por sentencia (MySQL no permite reabrirla).
+    
+    Con la columna telefono_normalizado (migración 009) el teléfono se busca
+    directo en su índice único: cada teléfono tiene un solo cliente principal.
+    Sin ella se agrupa por la normalización REPLACE, que no usa ningún índice.
+    """
+    pasos = [
+        ('dni', 'c.dni', "c.dni IS NOT NULL AND c.dni <> ''"),
+        ('nombre', 'c.nombre', "c.nombre IS NOT NULL AND c.nombre <> ''")
+    ]
+    if tiene_telefono_normalizado(cursor):
+        cursor.execute("""
+            UPDATE tmp_verificacion t
+            JOIN clientes c ON c.telefono_normalizado = t.telefono
+            SET t.cliente_id = c.id, t.via = 'telefono', t.candidatos = 1
+            WHERE t.cliente_id IS NULL
+        """)
+    else:
+        pasos.insert(0, ('telefono', TELEFONO_BD, 'c.telefono IS NOT NULL'))
+    for via, expresion, no_vacia in pasos:
+        cursor.execute(f"""
+            UPDATE tmp_verificacion t
+            JOIN (
+                SELECT {expresion} AS clave, MIN(c.id) AS id, COUNT(*) AS candidatos
+                FROM clientes c
+                WHERE {no_vacia}
+                GROUP BY clave
+            ) c ON c.clave = t.{via}
+            SET t.cliente_id = c.id, t.via = %s, t.candidatos = c.candidatos
+            WHERE t.cliente_id IS NULL
+        """, (via,))
+    conn.commit()
+
+def reporte_conciliacion(cursor):
+    """Estado de cada fila (encontrado / discrepante / faltante / sin_clave) en una sola consulta"""
+    cursor.execute(f"""
+        SELECT t.fila, t.telefono, t.dni, t.nombre, t.via, t.candidatos,
+               c.id AS cliente_id, c.telefono AS telefono_bd, c.dni AS dni_bd, c.nombre AS nombre_bd,
+               CONCAT_WS(',',
+                   IF(t.telefono IS NOT NULL AND {TELEFONO_BD} <> t.telefono, 'telefono', NULL),
+                   IF(t.dni IS NOT NULL AND c.dni IS NOT NULL AND c.dni <> t.dni, 'dni', NULL),
+                   IF(t.nombre IS NOT NULL AND c.nombre <> t.nombre, 'nombre', NULL)
+               ) AS diferencias
+        FROM tmp_verificacion t
+        LEFT JOIN clientes c ON c.id = t.cliente_id
+        ORDER BY t.fila
+    """)
+    reporte = pd.DataFrame(cursor.fetchall(), columns=[
+        'fila', 'telefono', 'dni', 'nombre', 'via', 'candidatos',
+        'cliente_id', 'telefono_bd', 'dni_bd', 'nombre_bd', 'diferencias'
+    ], dtype=object)
+    # Sin cliente las columnas numéricas quedan nulas: enteros con nulos (no 7.0)
+    reporte[['cliente_id', 'candidatos']] = reporte[['cliente_id', 'candidatos']].astype('Int64')
+    
+    sin_clave = reporte['telefono'].isna() & reporte['dni'].isna() & reporte['nombre'].isna()
+    faltante = reporte['cliente_id'].isna()
+    discrepante = reporte['diferencias'].fillna('').ne('')
+    reporte.insert(1, 'estado', 'encontrado')
+    reporte.loc[discrepante, 'estado'] = 'discrepante'
+    reporte.loc[faltante, 'estado'] = 'faltante'
+    reporte.loc[sin_clave, 'estado'] = 'sin_clave'
+    return reporte
+
 def verificar_en_bd(df, nombre_archivo):
-    """Verificar si los registros del Excel están en la BD"""
+    """
+    Conciliar todas las filas del Excel contra clientes
+    
+    Las claves del archivo (teléfono, DNI, nombre) se cargan en una tabla temporal
+    y se cruzan con clientes por conjuntos: unas pocas consultas para todo el
+    archivo en lugar de una por fila. El detalle queda en
+    logs/verificacion_<archivo>_YYYYMMDD_HHMMSS.csv.
+    """
     print(f"\n{'='*80}")
     print(f"VERIFICACIÓN EN BASE DE DATOS: {nombre_archivo}")
     print("="*80)
     
+    inicio = time.perf_counter()
     conn = conectar_bd()
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
     
     # Mostrar muestra del Excel
     print("\n📊 MUESTRA DEL EXCEL (primeras 5 filas):")
     print(df.head(5).to_string())
     
-    encontrados = 0
-    no_encontrados = 0
-    
-    # Verificar algunos registros clave
-    print(f"\n🔍 VERIFICANDO REGISTROS EN BD...")
-    
-    for idx, row in df.head(10).iterrows():  # Verificar primeros 10
-        # Buscar por teléfono si existe
-        if 'telefono' in row and pd.notna(row['telefono']):
-            telefono = str(row['telefono']).strip()
-            cursor.execute("""
-                SELECT id, nombre, telefono, dni, estado 
-                FROM clientes 
-                WHERE telefono = %s OR telefono LIKE %s
-                LIMIT 1
-            """, (telefono, f"%{telefono}%"))
-            
-            resultado = cursor.fetchone()
-            if resultado:
-                encontrados += 1
-                print(f"   ✅ Fila {idx+1}: Encontrado en BD - ID: {resultado['id']}, Nombre: {resultado['nombre']}")
-            else:
-                no_encontrados += 1
-                print(f"   ❌ Fila {idx+1}: NO encontrado - Tel: {telefono}")
-        
-        # Si no hay teléfono, buscar por nombre y DNI
-        elif 'nombre' in row and pd.notna(row['nombre']):
-            nombre = str(row['nombre']).strip()
-            dni = str(row.get('dni', '')).strip() if 'dni' in row else ''
-            
-            if dni:
-                cursor.execute("""
-                    SELECT id, nombre, telefono, dni 
-                    FROM clientes 
-                    WHERE nombre LIKE %s AND dni = %s
-                    LIMIT 1
-                """, (f"%{nombre}%", dni))
-            else:
-                cursor.execute("""
-                    SELECT id, nombre, telefono, dni 
-                    FROM clientes 
-                    WHERE nombre LIKE %s
-                    LIMIT 1
-                """, (f"%{nombre}%",))
-            
-            resultado = cursor.fetchone()
-            if resultado:
-                encontrados += 1
-                print(f"   ✅ Fila {idx+1}: Encontrado en BD - ID: {resultado['id']}, Nombre: {resultado['nombre']}")
-            else:
-                no_encontrados += 1
-                print(f"   ❌ Fila {idx+1}: NO encontrado - Nombre: {nombre}")
+    try:
+        print(f"\n🔍 CONCILIANDO {len(df):,} FILAS CONTRA LA BD...")
+        claves = extraer_claves(df)
+        cargar_claves(cursor, conn, claves)
+        resolver_claves(cursor, conn)
+        reporte = reporte_conciliacion(cursor)
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_verificacion")
+    finally:
+        cursor.close()
+        conn.close()
     
-    print(f"\n📊 RESUMEN:")
-    print(f"   Encontrados: {encontrados}/10")
-    print(f"   No encontrados: {no_encontrados}/10")
+    conteo = reporte['estado'].value_counts()
+    encontrados = int(conteo.get('encontrado', 0))
+    discrepantes = int(conteo.get('discrepante', 0))
+    no_encontrados = int(conteo.get('faltante', 0))
+    sin_clave = int(conteo.get('sin_clave', 0))
     
-    cursor.close()
-    conn.close()
+    vias = reporte.loc[reporte['cliente_id'].notna(), 'via'].value_counts()
+    for estado, icono in (('faltante', '❌'), ('discrepante', '⚠️')):
+        muestra = reporte[reporte['estado'] == estado].head(10)
+        for fila in muestra.itertuples(index=False):
+            detalle = f"Tel: {fila.telefono} | DNI: {fila.dni} | Nombre: {fila.nombre}"
+            if estado == 'discrepante':
+                detalle += f" → ID {fila.cliente_id} difiere en {fila.diferencias}"
+            print(f"   {icono} Fila {fila.fila}: {estado.upper()} - {detalle}")
+    
+    os.makedirs('logs', exist_ok=True)
+    base = re.sub(r'\W+', '_', os.path.splitext(os.path.basename(nombre_archivo))[0]).strip('_')
+    ruta = f"logs/verificacion_{base}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    reporte.to_csv(ruta, sep=';', index=False, encoding='utf-8')
+    
+    total = len(reporte)
+    print(f"\n📊 RESUMEN:")
+    print(f"   Encontrados: {encontrados:,}/{total:,}")
+    print(f"   Con diferencias: {discrepantes:,}/{total:,}")
+    print(f"   No encontrados: {no_encontrados:,}/{total:,}")
+    print(f"   Sin teléfono, DNI ni nombre: {sin_clave:,}/{total:,}")
+    print(f"   Resueltos por teléfono: {int(vias.get('telefono', 0)):,}, por DNI: {int(vias.get('dni', 0)):,}, "
+          f"por nombre: {int(vias.get('nombre', 0)):,}")
+    print(f"   Detalle por fila: {ruta}")
+    print(f"   ⏱️ {time.perf_counter() - inicio:.1f}s")
     
-    return encontrados, no_encontrados
+    return encontrados + discrepantes, no_encontrados
 
 def verificar_total_bd():
     """Verificar total de clientes en BD"""
@@ -0,0 +1,95 @@
+-- Migración 009: Teléfono normalizado persistido para importación con UPSERT
+-- Fecha: 2026-10-18
+-- Descripción: Agrega la columna generada clientes.telefono_normalizado (teléfono sin
+--              espacios ni guiones) con índice único, para que el importador pueda usar
+--              INSERT ... ON DUPLICATE KEY UPDATE y MySQL resuelva insertar vs actualizar.
+--              Solo los registros principales participan del índice único: los marcados
+--              como duplicados (es_duplicado = TRUE) quedan con NULL, igual que en el
+--              sistema de duplicados de la migración 007.
+-- Requiere: migración 007 (columnas es_duplicado, telefono_principal_id y
+--           cantidad_duplicados; init.sql no las crea). El paso 0 corta el script si faltan.
+-- Antes de aplicarla: ejecutar solo los pasos 0 y 1 y revisar los clientes que el
+--           backfill va a marcar como duplicados (dejan de verse en las vistas de asesor).
+--           El paso 2 los respalda en clientes_backup_009 para poder deshacerlo.
+
+-- 0. Dependencia de la migración 007: falla con "Unknown column" si no está aplicada
+SELECT es_duplicado, telefono_principal_id, cantidad_duplicados
+FROM clientes
+LIMIT 0;
+
+-- 1. Simulación: principales que el backfill marcará como duplicados
+--    (varios principales con el mismo teléfono normalizado; se conserva el de menor id)
+SELECT c.id, c.nombre, c.telefono, c.asesor_asignado,
+       d.principal_id AS quedara_como_duplicado_de,
+       d.total AS principales_con_el_telefono
+FROM clientes c
+JOIN (
+  SELECT REPLACE(REPLACE(telefono, ' ', ''), '-', '') AS tel,
+         MIN(id) AS principal_id,
+         COUNT(*) AS total
+  FROM clientes
+  WHERE es_duplicado = FALSE OR es_duplicado IS NULL
+  GROUP BY tel
+  HAVING COUNT(*) > 1
+) d ON REPLACE(REPLACE(c.telefono, ' ', ''), '-', '') = d.tel
+WHERE (c.es_duplicado = FALSE OR c.es_duplicado IS NULL)
+  AND c.id <> d.principal_id
+ORDER BY d.principal_id, c.id;
+
+-- 2. Respaldo de los registros que toca el backfill (principales y marcados)
+--    Para deshacer el paso 3:
+--      UPDATE clientes c JOIN clientes_backup_009 b ON b.id = c.id
+--      SET c.es_duplicado = b.es_duplicado,
+--          c.telefono_principal_id = b.telefono_principal_id,
+--          c.cantidad_duplicados = b.cantidad_duplicados;
+--    (antes hay que quitar el índice del paso 5 y la columna del paso 4)
+DROP TABLE IF EXISTS clientes_backup_009;
+CREATE TABLE clientes_backup_009 AS
+SELECT c.id, c.telefono, c.es_duplicado, c.telefono_principal_id, c.cantidad_duplicados,
+       NOW() AS respaldado_en
+FROM clientes c
+JOIN (
+  SELECT REPLACE(REPLACE(telefono, ' ', ''), '-', '') AS tel
+  FROM clientes
+  WHERE es_duplicado = FALSE OR es_duplicado IS NULL
+  GROUP BY tel
+  HAVING COUNT(*) > 1
+) d ON REPLACE(REPLACE(c.telefono, ' ', ''), '-', '') = d.tel
+WHERE c.es_duplicado = FALSE OR c.es_duplicado IS NULL;
+
+-- 3. Backfill: si hay varios principales con el mismo teléfono normalizado,
+--    conservar el de menor id y marcar el resto como duplicados (requisito del índice único)
+UPDATE clientes c
+JOIN (
+  SELECT REPLACE(REPLACE(telefono, ' ', ''), '-', '') AS tel,
+         MIN(id) AS principal_id,
+         COUNT(*) AS total
+  FROM clientes
+  WHERE es_duplicado = FALSE OR es_duplicado IS NULL
+  GROUP BY tel
+  HAVING COUNT(*) > 1
+) d ON REPLACE(REPLACE(c.telefono, ' ', ''), '-', '') = d.tel
+SET c.es_duplicado = (c.id <> d.principal_id),
+    c.telefono_principal_id = IF(c.id = d.principal_id, c.telefono_principal_id, d.principal_id),
+    c.cantidad_duplicados = GREATEST(COALESCE(c.cantidad_duplicados, 1), d.total)
+WHERE c.es_duplicado = FALSE OR c.es_duplicado IS NULL;
+
+-- 4. Columna generada STORED (se calcula para todas las filas existentes al agregarla)
+ALTER TABLE clientes
+ADD COLUMN telefono_normalizado VARCHAR(20)
+  GENERATED ALWAYS AS (IF(es_duplicado, NULL, REPLACE(REPLACE(telefono, ' ', ''), '-', ''))) STORED
+  COMMENT 'Teléfono sin espacios ni guiones (NULL en duplicados). Clave del UPSERT del importador';
+
+-- 5. Índice único para INSERT ... ON DUPLICATE KEY UPDATE
+ALTER TABLE clientes
+ADD UNIQUE INDEX uk_telefono_normalizado (telefono_normalizado);
+
+-- Verificación
+SELECT COUNT(*) AS principales_con_telefono_normalizado
+FROM clientes
+WHERE telefono_normalizado IS NOT NULL;
+
+SELECT COUNT(*) AS marcados_como_duplicados_por_009
+FROM clientes_backup_009 b
+JOIN clientes c ON c.id = b.id
+WHERE c.es_duplicado = TRUE;